@@ -6,7 +6,8 @@
 """
 
 from .src.depthflow import Depthflow
-from .src.effects.depthflow_effects import DepthflowEffectDOF, DepthflowEffectVignette, DepthflowEffectInpaint, DepthflowEffectColor
+from .src.depthflow_remap import DepthflowRemap
+from .src.effects.depthflow_effects import DepthflowEffectDOF, DepthflowEffectVignette, DepthflowEffectInpaint, DepthflowEffectColor, DepthflowEffectVariants
 from .src.motion.depthflow_motion_components import (
     DepthflowMotionArc,
     DepthflowMotionCosine,
@@ -14,6 +15,7 @@ from .src.motion.depthflow_motion_components import (
     DepthflowMotionSetTarget,
     DepthflowMotionSine,
     DepthflowMotionTriangle,
+    DepthflowMotionVariants,
 )
 from .src.motion.depthflow_motion_presets import (
     DepthflowMotionPresetCircle,
@@ -50,6 +52,7 @@ NODE_CONFIG = {
         "name": "🌊 Depthflow Motion Preset Orbital",
     },
     "Depthflow": {"class": Depthflow, "name": "🌊 Depthflow"},
+    "DepthflowRemap": {"class": DepthflowRemap, "name": "🌊 Depthflow Remap"},
     "DepthflowEffectVignette": {
         "class": DepthflowEffectVignette,
         "name": "🌊 Depthflow Effect Vignette",
@@ -66,6 +69,10 @@ NODE_CONFIG = {
         "class": DepthflowEffectColor,
         "name": "🌊 Depthflow Effect Color",
     },
+    "DepthflowEffectVariants": {
+        "class": DepthflowEffectVariants,
+        "name": "🌊 Depthflow Effect Variants",
+    },
     "DepthflowMotionSine": {
         "class": DepthflowMotionSine,
         "name": "🌊 Depthflow Motion Sine",
@@ -90,6 +97,10 @@ NODE_CONFIG = {
         "class": DepthflowMotionArc,
         "name": "🌊 Depthflow Motion Arc",
     },
+    "DepthflowMotionVariants": {
+        "class": DepthflowMotionVariants,
+        "name": "🌊 Depthflow Motion Variants",
+    },
 }
 
 
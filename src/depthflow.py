@@ -1,22 +1,160 @@
+import contextlib
 import gc
+import json
+import time
 from collections import deque
 import copy
+import functools
+import math
 from pathlib import Path
+from types import SimpleNamespace
 
 import cv2
+import folder_paths
 import numpy as np
 import torch
 from broken.core.extra.loaders import LoadImage
 from comfy.utils import ProgressBar
+import comfy.model_management
 
 from depthflow.scene import DepthScene
 from depthflow.animation import DepthAnimation
-from depthflow.state import DepthState
+from depthflow.state import ColorState, DepthState
+from shaderflow.message import ShaderMessage
+from shaderflow.shader import ShaderProgram
+from shaderflow.texture import ShaderTexture
+from shaderflow.variable import Uniform
 
 from .custom_state import CustomInpaintState
+from .utils.render_plan import STRATEGIES, plan_render, record_throughput
+from .utils.frame_sinks import SEQUENCE_SINKS, EncoderPipeSink, FrameSink
+from .utils.frame_accumulator import FrameAccumulator
+from .utils.frame_atlas import FrameAtlas
+from .utils.frame_store import CompressedFrameStore
+from .utils.headless_backend import HEADLESS_BACKENDS, headless_environment, select_headless_backend
+from .utils.auxiliary_utils import read_auxiliary, split_auxiliary
+from .utils.depth_pyramid import (
+    build_depth_pyramid,
+    depth_gradient,
+    depth_scale_psnr,
+    downsample_depth,
+    pack_depth_pyramid,
+)
+from .utils.shader_cache import enable_driver_shader_cache, program_key, record_first_frame
+from .utils.shader_utils import specialization_defines, specialize_source, specialized_uniforms
+from .utils.motion_blur import subframe_offsets
+from .utils.post_effects import apply_variant
+from .utils.quality_tuner import representative_frames, tune_quality
+from .utils.cpu_renderer import render_frames
+from .utils.resolution_utils import (
+    FIT_MODES,
+    crop_view,
+    output_resolution,
+    parse_crop_positions,
+    proxy_resolution,
+)
+from .utils.loop_utils import describe_reuse, flatten_values, frame_reuse_map, render_count
 
 DEPTH_SHADER = Path(__file__).parent / "shaders" / "depthflow.glsl"
 
+# Post effect states whose uniforms can be baked into a specialized shader
+EFFECT_STATES = ("inpaint", "lens", "blur", "vignette", "colors")
+
+# Scene attributes each camera keeps for itself, see CustomDepthflowScene.add_camera
+CAMERA_ATTRIBUTES = ("state", "effects", "custom_animation_frames", "camera_offset", "sink", "first_frame")
+
+# Map old effect keys to new state structure
+EFFECT_MAPPING = {
+    # Vignette
+    'vignette_enable': ('vignette', 'enable'),
+    'vignette_intensity': ('vignette', 'intensity'),
+    'vignette_decay': ('vignette', 'decay'),
+    # DOF (Blur)
+    'dof_enable': ('blur', 'enable'),
+    'dof_start': ('blur', 'start'),
+    'dof_end': ('blur', 'end'),
+    'dof_exponent': ('blur', 'exponent'),
+    'dof_intensity': ('blur', 'intensity'),
+    'dof_quality': ('blur', 'quality'),
+    'dof_directions': ('blur', 'directions'),
+    # Inpaint
+    'inpaint_enable': ('inpaint', 'enable'),
+    'inpaint_black': ('inpaint', 'black'),
+    'inpaint_limit': ('inpaint', 'limit'),
+    'inpaint_color_r': ('inpaint', 'color_r'),
+    'inpaint_color_g': ('inpaint', 'color_g'),
+    'inpaint_color_b': ('inpaint', 'color_b'),
+    'inpaint_color_a': ('inpaint', 'color_a'),
+    # Colors
+    'color_enable': ('colors', 'enable'),
+    'color_saturation': ('colors', 'saturation'),
+    'color_contrast': ('colors', 'contrast'),
+    'color_brightness': ('colors', 'brightness'),
+    'color_gamma': ('colors', 'gamma'),
+    'color_grayscale': ('colors', 'grayscale'),
+    'color_sepia': ('colors', 'sepia'),
+}
+
+
+class TensorSink(FrameSink):
+    """Default sink: accumulate uint8 frames, then stack them into a float tensor"""
+
+    def __init__(self):
+        self.frames = deque()
+
+    def write(self, frame):
+        self.frames.append(torch.from_numpy(frame))
+
+    def close(self, index_map=None):
+        # Convert the deque of frames to a tensor
+        video = torch.stack(list(self.frames))
+        self.frames.clear()
+        if index_map is not None:
+            video = video[torch.as_tensor(index_map)]
+        # Normalize the video frames to [0, 1] in place, holding one float copy as planned
+        video = video.float()
+        video.div_(255.0)
+        return video
+
+    def abort(self):
+        self.frames.clear()
+
+
+class PreallocatedTensorSink(FrameSink):
+    """Convert each frame straight into a preallocated float tensor"""
+
+    def __init__(self, num_frames, height, width, channels=3):
+        self.output = torch.zeros((num_frames, height, width, channels), dtype=torch.float32)
+        self.count = 0
+
+    def write(self, frame):
+        if self.count < len(self.output):
+            self.output[self.count].copy_(torch.from_numpy(frame)).div_(255.0)
+        self.count += 1
+
+    def close(self, index_map=None):
+        video, self.output = self.output, None
+        if index_map is None:
+            # A cancelled render only fills the leading frames
+            video = video[:min(self.count, len(video))]
+        else:
+            for index, source in enumerate(index_map):
+                if index != source:
+                    video[index] = video[source]
+        return video
+
+    def abort(self):
+        self.output = None
+
+
+class CompressedTensorSink(CompressedFrameStore):
+    """Keep frames compressed in RAM, then decompress them into a float tensor"""
+
+    def close(self, index_map=None):
+        # Remember the ratio, the compressed frames are released on close
+        self.ratio = self.compression_ratio
+        return torch.from_numpy(super().close(index_map))
+
 
 class CustomDepthflowScene(DepthScene):
     def __init__(
@@ -24,15 +162,22 @@ class CustomDepthflowScene(DepthScene):
         state=None,
         effects=None,
         progress_callback=None,
+        interrupt_callback=None,
         num_frames=30,
         input_fps=30.0,
         output_fps=30.0,
         animation_speed=1.0,
+        sink=None,
         **kwargs,
     ):
         DepthScene.__init__(self, **kwargs)
-        self.frames = deque()
+        # Where rendered frames go, defaults to an in-memory tensor
+        self.sink = sink or TensorSink()
+        self.first_frame = None
         self.progress_callback = progress_callback
+        # Polled between frames, returning True cancels the render
+        self.interrupt_callback = interrupt_callback
+        self.cancelled = False
         self.custom_animation_frames = deque()
         self._set_effects(effects)
         # Override state with keywords in state
@@ -45,16 +190,235 @@ class CustomDepthflowScene(DepthScene):
         self.output_fps = output_fps
         self.animation_speed = animation_speed
         self.num_frames = num_frames
+        # Stop rendering after this many frames (None renders the whole clip)
+        self.frame_limit = None
+        self.frame_count = 0
         self.video_time = 0.0
         self.frame_index = 0
+        # Skip empty space with the max-depth pyramid, rebuilt only when the depth frame changes
+        self.use_depth_pyramid = True
+        self.pyramid_frame = None
+        # Read the surface normal from a precomputed gradient instead of two extra depth samples
+        self.use_depth_gradient = True
+        self.gradient_frame = None
+        # Start each pixel's march around its previous hit, unless the depth frame changed or
+        # any state value moved more than the tolerance since the last frame (camera cuts)
+        self.use_warm_start = False
+        self.warm_start_tolerance = 0.05
+        self.warm_start_valid = False
+        self.warm_start_key = None
+        # Reduced resolution intersection pass, see set_intersection_scale
+        self.intersect = None
+        # Second render target of the main pass and its per-frame readbacks, see enable_auxiliary_outputs
+        self.auxiliary = None
+        self.auxiliary_frames = deque()
+        # Extra cameras rendered at every time step from the same uploads, see add_camera
+        self.cameras = []
+        self.camera_offset = 0.0
+        # Input frame currently uploaded to the image and depth textures
+        self.texture_frame = None
+        # Motion blur: average this many sub-frames over the shutter fraction of each frame
+        # interval on the GPU, see _render_subframes
+        self.motion_blur_samples = 1
+        self.motion_blur_shutter = 0.5
+        self.accumulator = None
+        self.subframe = 0
+        # Collect this many frames in the tiles of one texture before reading them back, main
+        # camera only (extra cameras, auxiliary and proxy outputs read back every frame)
+        self.atlas_frames = 1
+        self.atlas = None
+        # Largest texture side of the context, from the headless backend probe
+        self.max_texture_size = 16384
+        # Render the base parallax only, post effects are applied per variant afterwards
+        self.post_effects = True
+        # Effect uniforms baked into the shader as constants, see specialize_effects
+        self.effect_defines = ()
+        # Defines of the main pass, part of the compiled program's cache key
+        self.shader_defines = ()
+        # Seconds from main() to the first rendered frame, compiling and linking included
+        self.main_started = None
+        self.first_frame_seconds = None
+        # Blur DOF and lens from a mipmapped copy of the image instead of brute force sampling
+        self.use_mip_blur = True
+        self.blur_frame = None
+        # Repeat flag last applied to the input textures, None before the first frame
+        self.repeat_textures = None
+        # Supersample only the pixels on depth edges, see DepthAntialias
+        self.use_edge_antialias = False
+        # Zoom covering an output wider than the input, see output_resolution
+        self.fill_zoom = 1.0
+        # Region of interest: gluv scale and per-frame offsets of the rendered window, see crop_view,
+        # and the full frame's aspect ratio the vignette and lens distortion are relative to
+        self.view_scale = 1.0
+        self.view_offsets = [(0.0, 0.0)]
+        self.view_aspect = None
+        # Also read back this mipmap level of every main camera frame, 0 disables the proxy
+        self.proxy_level = 0
+        self.proxy_frames = deque()
         # Initialize animation with empty DepthAnimation
         self.config.animation = DepthAnimation()
         self.state.inpaint = CustomInpaintState()
         
     def build(self):
         DepthScene.build(self)
+        self.pyramid = ShaderTexture(scene=self, name="pyramid").repeat(False)
+        self.gradient = ShaderTexture(scene=self, name="gradient").repeat(False)
+        self.warmstart = ShaderTexture(scene=self, name="warmstart", track=1.0).repeat(False)
+        self.imageblur = ShaderTexture(scene=self, name="imageblur", mipmaps=True).repeat(False)
         self.shader.fragment = DEPTH_SHADER
 
+    def pipeline(self):
+        yield from DepthScene.pipeline(self)
+        yield Uniform("bool", "iDepthPyramid", self.use_depth_pyramid and self.pyramid_frame is not None)
+        yield Uniform("bool", "iDepthGradient", self.use_depth_gradient and self.gradient_frame is not None)
+        yield Uniform("bool", "iWarmStart", self.warm_start_valid)
+        yield Uniform("bool", "iBlurMip", self.use_mip_blur and self.blur_frame is not None)
+        yield Uniform("bool", "iAntialias", self.use_edge_antialias)
+        yield Uniform("float", "iViewScale", self.view_scale)
+        view_offset = self.view_offsets[min(self.frame_count, len(self.view_offsets) - 1)]
+        yield Uniform("vec2", "iViewOffset", view_offset)
+        yield Uniform("float", "iViewAspect", self.view_aspect or 1.0)
+
+    def _load_blur_source(self):
+        # Only needed while DOF or lens distortion is enabled
+        if (not self.use_mip_blur) or (self.images is None):
+            return
+        if not (self.state.blur.enable or self.state.lens.enable):
+            return
+        frame_index = min(self.frame_index, len(self.images) - 1)
+        if self.blur_frame != frame_index:
+            self.imageblur.from_image(LoadImage(self.images[frame_index]))
+            # from_image builds the mip chain before writing the data, build it from the image
+            self.imageblur.texture.build_mipmaps()
+            self.blur_frame = frame_index
+
+    def set_intersection_scale(self, scale):
+        """
+        Search intersections at a fraction of the render resolution into a float target,
+        then upsample them depth-aware before the full resolution color fetch and effects.
+        """
+        if scale >= 1.0 or self.intersect is not None:
+            return
+        self.intersect = ShaderProgram(scene=self, name="iIntersect")
+        self.intersect.texture.dtype = np.float32
+        self.intersect.texture.track = scale
+        self.intersect.texture.repeat(False)
+        self._update_fragments()
+
+    def enable_auxiliary_outputs(self):
+        """
+        Write the parallaxed depth, inpaint mask and sampled image coordinates to a second
+        color attachment of the main pass, read back after every frame.
+        """
+        if self.auxiliary is not None:
+            return
+        # Unnamed, so it's never bound as a sampler while being rendered to
+        self.auxiliary = ShaderTexture(scene=self, track=1.0, dtype=np.float32).repeat(False)
+        self._update_fragments()
+
+    def add_camera(self, motion=None, offset=0.0, sink=None):
+        """
+        Render another camera at every time step, sharing the main camera's texture uploads.
+
+        The camera follows its own motion, or a copy of the main camera's one, displaced
+        horizontally by offset (stereo eyes). Its frames go to their own sink.
+        """
+        camera = {
+            "state": self.state.model_copy(deep=True),
+            "effects": copy.copy(self.effects),
+            "custom_animation_frames": copy.copy(self.custom_animation_frames),
+            "camera_offset": offset,
+            "sink": sink or TensorSink(),
+            "first_frame": None,
+            "animation": copy.deepcopy(self.config.animation),
+        }
+        if motion is not None:
+            camera["custom_animation_frames"] = deque()
+            camera["animation"] = DepthAnimation()
+            self._swap_camera(camera)
+            self.custom_animation(motion)
+            self._swap_camera(camera)
+        self.cameras.append(camera)
+        return camera
+
+    def _swap_camera(self, camera):
+        # Exchange the scene's per-camera attributes with a camera's, calling twice restores them
+        for name in CAMERA_ATTRIBUTES:
+            value = getattr(self, name)
+            setattr(self, name, camera[name])
+            camera[name] = value
+        self.config.animation, camera["animation"] = camera["animation"], self.config.animation
+
+    def _bind_auxiliary(self):
+        # Resizes recreate the main pass framebuffer with a single attachment
+        box = self.shader.texture.get_box()
+        if len(box.fbo.color_attachments) < 2:
+            box.fbo.release()
+            box.fbo = self.opengl.framebuffer(color_attachments=[box.texture, self.auxiliary.texture])
+
+    @staticmethod
+    def effect_uniforms(state):
+        """The post effect uniforms of a state as (type, name, value) tuples"""
+        return tuple(
+            (uniform.type, uniform.name, uniform.value)
+            for name in EFFECT_STATES
+            for uniform in getattr(state, name).pipeline()
+        )
+
+    def specialize_effects(self, uniforms):
+        """Compile the effects as constants, only valid while they stay the same on every frame"""
+        self.effect_defines = specialization_defines(uniforms)
+        self._update_fragments()
+
+    def _update_fragments(self):
+        source = DEPTH_SHADER.read_text(encoding="utf-8")
+        defines = self.effect_defines
+        if self.auxiliary is not None:
+            defines = ("DEPTHFLOW_AUXILIARY",) + defines
+        if self.intersect is not None:
+            self.intersect.fragment = specialize_source(source, ("DEPTHFLOW_INTERSECT",) + self.effect_defines)
+            defines = ("DEPTHFLOW_UPSAMPLE",) + defines
+        self.shader_defines = defines
+        if self.shader_defines:
+            self.shader.fragment = specialize_source(source, self.shader_defines)
+        else:
+            self.shader.fragment = DEPTH_SHADER
+
+    def program_key(self):
+        """Key of the main program: the assembled sources, with shaderflow's headers and includes, and driver"""
+        info = self.opengl.info
+        return program_key(
+            self.shader.vertex + self.shader.fragment,
+            renderer=f"{info.get('GL_RENDERER', '')} {info.get('GL_VERSION', '')}",
+        )
+
+    def _validate_warm_start(self):
+        # The reduced intersection target has no room for the per-pixel hits, and
+        # extra cameras would overwrite the main camera's ones
+        if (not self.use_warm_start) or (self.intersect is not None) or self.cameras:
+            return
+        frame, signature = self.warm_start_key or (None, None)
+        current = np.array(flatten_values(self.state.model_dump()))
+        self.warm_start_valid = (
+            frame == self.frame_index
+            and signature is not None
+            and signature.shape == current.shape
+            and np.max(np.abs(current - signature), initial=0.0) <= self.warm_start_tolerance
+        )
+        self.warm_start_key = (self.frame_index, current)
+
+    def _load_depth_textures(self, frame_index, depth):
+        """Precompute the textures derived from the depthmap, once per depth frame"""
+        # Built in OpenGL's bottom-up row order, from_numpy flips what it uploads
+        flipped = np.flipud(np.asarray(depth))
+        if self.use_depth_pyramid and (self.pyramid_frame != frame_index):
+            atlas, _ = pack_depth_pyramid(build_depth_pyramid(flipped))
+            self.pyramid.from_numpy(np.flipud(atlas))
+            self.pyramid_frame = frame_index
+        if self.use_depth_gradient and (self.gradient_frame != frame_index):
+            self.gradient.from_numpy(np.flipud(depth_gradient(flipped)))
+            self.gradient_frame = frame_index
+
     def input(self, image, depth):
         # TODO: maybe put this somewhere else?
         # self.shader.fragment = DEPTH_SHADER
@@ -119,22 +483,44 @@ class CustomDepthflowScene(DepthScene):
             self.video_time += frame_duration
             self.frame_index += 1
 
-        # Set the current image and depth map based on self.frame
+        # Set the current image and depth map based on self.frame, uploading them only
+        # when the input frame changes (extra cameras reuse the upload)
         if self.images is not None and self.depth_maps is not None:
             frame_index = min(self.frame_index, len(self.images) - 1)
-            current_image = self.images[frame_index]
-            current_depth = self.depth_maps[frame_index]
+            if frame_index != self.texture_frame:
+                current_image = self.images[frame_index]
+                current_depth = self.depth_maps[frame_index]
+
+                # Convert to appropriate format if necessary
+                image = LoadImage(current_image) #self.upscayl(LoadImage(current_image))
+                depth = LoadImage(current_depth)
+
+                # Set the current image and depth map
+                self.image.from_image(image)
+                self.depth.from_image(depth)
+                self._load_depth_textures(frame_index, depth)
+                self.texture_frame = frame_index
 
-            # Convert to appropriate format if necessary
-            image = LoadImage(current_image) #self.upscayl(LoadImage(current_image))
-            depth = LoadImage(current_depth)
+        self._apply_frame_state()
+        self.state.offset_x += self.camera_offset
+        self.state.zoom *= self.fill_zoom
+        self._validate_warm_start()
+        self._load_blur_source()
 
-            # Set the current image and depth map
-            self.image.from_image(image)
-            self.depth.from_image(depth)
+        # Uploads recreate the textures with the current flags, only changes need applying
+        if self.override_state and "tiling_mode" in self.override_state:
+            repeat = (self.override_state["tiling_mode"] == "repeat")
+            if repeat != self.repeat_textures:
+                self.image.repeat(repeat)
+                self.depth.repeat(repeat)
+                self.imageblur.repeat(repeat)
+                self.repeat_textures = repeat
 
+    def _apply_frame_state(self):
+        """Advance the motion and effects by one frame and apply them to self.state"""
         # If there are custom animation frames present, use them instead of the normal animation frames
-        if self.custom_animation_frames:
+        # Sub-frames of a motion blurred frame share its motion and effects frame
+        if self.custom_animation_frames and not self.subframe:
             # Clear current animation and add the new frame
             self.config.animation.clear()
             frame = self.custom_animation_frames.popleft()
@@ -146,52 +532,12 @@ class CustomDepthflowScene(DepthScene):
 
         DepthScene.update(self)
 
-        def set_effects_helper(effects):
-            # Map old effect keys to new state structure
-            effect_mapping = {
-                # Vignette
-                'vignette_enable': ('vignette', 'enable'),
-                'vignette_intensity': ('vignette', 'intensity'),
-                'vignette_decay': ('vignette', 'decay'),
-                # DOF (Blur)
-                'dof_enable': ('blur', 'enable'),
-                'dof_start': ('blur', 'start'),
-                'dof_end': ('blur', 'end'),
-                'dof_exponent': ('blur', 'exponent'),
-                'dof_intensity': ('blur', 'intensity'),
-                'dof_quality': ('blur', 'quality'),
-                'dof_directions': ('blur', 'directions'),
-                # Inpaint
-                'inpaint_enable': ('inpaint', 'enable'),
-                'inpaint_black': ('inpaint', 'black'),
-                'inpaint_limit': ('inpaint', 'limit'),
-                'inpaint_color_r': ('inpaint', 'color_r'),
-                'inpaint_color_g': ('inpaint', 'color_g'),
-                'inpaint_color_b': ('inpaint', 'color_b'),
-                'inpaint_color_a': ('inpaint', 'color_a'),
-                # Colors
-                'color_enable': ('colors', 'enable'),
-                'color_saturation': ('colors', 'saturation'),
-                'color_contrast': ('colors', 'contrast'),
-                'color_brightness': ('colors', 'brightness'),
-                'color_gamma': ('colors', 'gamma'),
-                'color_grayscale': ('colors', 'grayscale'),
-                'color_sepia': ('colors', 'sepia'),
-            }
-            
-            for key, value in effects.items():
-                if key in effect_mapping:
-                    state_obj, attr = effect_mapping[key]
-                    if hasattr(self.state, state_obj):
-                        setattr(getattr(self.state, state_obj), attr, value)
-                elif hasattr(self.state, key):
-                    setattr(self.state, key, value)
-
         if self.effects:
             if isinstance(self.effects, deque):
-                set_effects_helper(self.effects.popleft())
+                if not self.subframe:
+                    self._set_effects_state(self.effects.popleft())
             else:
-                set_effects_helper(self.effects)
+                self._set_effects_state(self.effects)
 
         if self.override_state:
             for key, value in self.override_state.items():
@@ -199,44 +545,454 @@ class CustomDepthflowScene(DepthScene):
                     setattr(self.state, key, value)
 
             if "tiling_mode" in self.override_state:
-                if self.override_state["tiling_mode"] == "repeat":
-                    self.image.repeat(True)
-                    self.depth.repeat(True)
-                    self.state.mirror = False
-                elif self.override_state["tiling_mode"] == "mirror":
-                    self.image.repeat(False)
-                    self.depth.repeat(False)
-                    self.state.mirror = True
-                else:
-                    self.image.repeat(False)
-                    self.depth.repeat(False)
-                    self.state.mirror = False
+                self.state.mirror = (self.override_state["tiling_mode"] == "mirror")
+
+        if not self.post_effects:
+            self.state.blur.enable = False
+            self.state.lens.enable = False
+            self.state.vignette.enable = False
+            self.state.colors = ColorState()
+
+    def _set_effects_state(self, effects, state=None):
+        state = state or self.state
+        for key, value in effects.items():
+            if key in EFFECT_MAPPING:
+                state_obj, attr = EFFECT_MAPPING[key]
+                if hasattr(state, state_obj):
+                    setattr(getattr(state, state_obj), attr, value)
+            elif hasattr(state, key):
+                setattr(state, key, value)
+
+    def variant_uniforms(self, effects, count):
+        """
+        Post effect uniforms of an effects variant on each of count frames. Like the render,
+        a list of effects sets one frame each and the last one holds for the remaining frames.
+        """
+        state = DepthState()
+        state.inpaint = CustomInpaintState()
+        frames = list(effects) if isinstance(effects, (list, deque)) else [effects]
+        uniforms = []
+        for index in range(count):
+            if index < len(frames):
+                self._set_effects_state(frames[index], state)
+            uniforms.append(self.effect_uniforms(state))
+        return uniforms
+
+    def frame_signatures(self, total_frames, fps, duration, signature=None):
+        """
+        Evaluate the per-frame state for the whole clip without rendering anything.
+
+        Each frame's state is reduced with `signature` (by default all of its values
+        flattened). The motion, effects and state are restored afterwards, so the real
+        render replays exactly the same sequence.
+        """
+        signature = signature or (lambda state: flatten_values(state.model_dump()))
+        saved_state = self.state.model_copy(deep=True)
+        saved_animation = copy.deepcopy(self.config.animation)
+        saved_motion = copy.copy(self.custom_animation_frames)
+        saved_effects = copy.copy(self.effects)
+        saved_time, saved_runtime = self.time, self.runtime
+
+        signatures = []
+        try:
+            self.runtime = duration
+            for index in range(total_frames):
+                self.time = index / fps
+                self._apply_frame_state()
+                signatures.append(signature(self.state))
+        finally:
+            self.state = saved_state
+            self.config.animation = saved_animation
+            self.custom_animation_frames = saved_motion
+            self.effects = saved_effects
+            self.time, self.runtime = saved_time, saved_runtime
+
+        return signatures
+
+    def sample_frames(self, indices, fps, duration):
+        """
+        Input frames, uniforms and view offsets of some frames of the clip, for CPU renders.
+
+        Evaluated like frame_signatures, so the real render is unaffected. Returns lists
+        in the order of `indices`, with the same input frame selection as update.
+        """
+        def uniforms(state):
+            state.zoom *= self.fill_zoom
+            values = {uniform.name: uniform.value for uniform in state.pipeline()}
+            state.zoom /= self.fill_zoom
+            return values
+
+        last = max(indices)
+        per_frame = self.frame_signatures(last + 1, fps, duration, signature=uniforms)
+        sources, video_time, frame_index = [], 0.0, 0
+        for index in range(last + 1):
+            while index / fps > video_time:
+                video_time += 1.0 / self.input_fps
+                frame_index += 1
+            sources.append(min(frame_index, len(self.images) - 1))
+
+        return (
+            [np.asarray(self.images[sources[index]], dtype=np.float32) / 255.0 for index in indices],
+            [np.asarray(self.depth_maps[sources[index]][..., 0], dtype=np.float32) / 255.0 for index in indices],
+            [per_frame[index] for index in indices],
+            [self.view_offsets[min(index, len(self.view_offsets) - 1)] for index in indices],
+        )
+
+    def prepare_samples(self, width, height, duration):
+        """Compile the shader and set the modules, duration and resolution up like main, before render_samples"""
+        self.relay(ShaderMessage.Shader.Compile)
+        for module in self.modules:
+            module.setup()
+        self.set_duration(duration)
+        self.resize(width=width, height=height, ratio=width / height, scale=1.0)
+
+    def render_samples(self, indices, fps, duration, quality, ssaa):
+        """
+        Render some frames of the clip at a quality and ssaa, without sending them to the sinks.
+
+        Every frame up to the last index is evaluated in order like frame_signatures, the
+        ones in `indices` are rendered and read back. The motion, effects, state and counters
+        are restored afterwards, so the real render replays exactly the same sequence.
+        """
+        saved_state = self.state.model_copy(deep=True)
+        saved_animation = copy.deepcopy(self.config.animation)
+        saved_motion = copy.copy(self.custom_animation_frames)
+        saved_effects = copy.copy(self.effects)
+        saved_time, saved_runtime = self.time, self.runtime
+        saved_counters = (self.video_time, self.frame_index, self.frame_count)
+        saved_warm_start = self.use_warm_start
+
+        # Sampled frames aren't consecutive, they march from scratch like a first frame
+        self.use_warm_start = False
+        self.quality = quality
+        if ssaa != self.ssaa:
+            self.resize(ssaa=ssaa)
+
+        frames = []
+        try:
+            self.runtime = duration
+            for index in range(max(indices) + 1):
+                self.time = index / fps
+                if index not in indices:
+                    self._apply_frame_state()
+                    continue
+                # Selects this frame's view offset
+                self.frame_count = index
+                self._draw_camera(1.0 / fps, advance=False)
+                frames.append(self.screenshot().copy())
+        finally:
+            self.state = saved_state
+            self.config.animation = saved_animation
+            self.custom_animation_frames = saved_motion
+            self.effects = saved_effects
+            self.time, self.runtime = saved_time, saved_runtime
+            self.video_time, self.frame_index, self.frame_count = saved_counters
+            self.use_warm_start = saved_warm_start
+            # main rebuilds the textures, upload the inputs again on its first frame
+            self.texture_frame = self.pyramid_frame = self.gradient_frame = None
+            self.blur_frame = self.repeat_textures = None
+
+        return frames
 
     @property
     def tau(self) -> float:
         return super().tau * self.animation_speed
 
+    def _render_subframes(self, dt, advance=True):
+        """Render the sub-frames of a motion blurred frame, averaging them before the final pass"""
+        if self.accumulator is None:
+            self.accumulator = FrameAccumulator(self.opengl)
+        self.accumulator.reset(self.shader.texture.size)
+        offsets = subframe_offsets(self.motion_blur_samples, self.motion_blur_shutter)
+        start = self.time
+        try:
+            for subframe, offset in enumerate(offsets):
+                self.subframe = subframe
+                self.time = start + offset * dt
+                DepthScene.next(self, 0.0)
+                self.accumulator.add(self.shader.texture.texture, 1.0 / len(offsets))
+        finally:
+            self.subframe = 0
+            self.time = start + (dt if advance else 0.0)
+
+        # Replace the last sub-frame with the average, then downsample it again
+        self.accumulator.resolve(self.shader.texture.texture)
+        self._final.render()
+
+    def _draw_camera(self, dt, advance=True):
+        if self.auxiliary is not None:
+            self._bind_auxiliary()
+        if self.motion_blur_samples > 1:
+            self._render_subframes(dt, advance)
+        else:
+            DepthScene.next(self, dt if advance else 0.0)
+        # The offset and zoom are applied on every update, don't let them accumulate
+        self.state.offset_x -= self.camera_offset
+        self.state.zoom /= self.fill_zoom
+
+    def _render_camera(self, dt, advance=True):
+        self._draw_camera(dt, advance)
+        if self.atlas_frames > 1:
+            self._add_to_atlas()
+            return None
+        frame = self.screenshot().copy()
+        self.sink.write(frame)
+        if self.first_frame is None:
+            self.first_frame = frame
+        return frame
+
+    def _add_to_atlas(self):
+        # Created on the first frame, once the final resolution is known
+        if self.atlas is None:
+            self.atlas = FrameAtlas(
+                self.opengl, self.width, self.height, self.atlas_frames, self.components, self.max_texture_size
+            )
+        self.atlas.add(self._final.texture.texture)
+        if self.atlas.full:
+            self.flush_atlas()
+
+    def flush_atlas(self):
+        """Read back the frames collected in the atlas in one transfer and send them to the sink"""
+        if (self.atlas is None) or (not self.atlas.count):
+            return
+        for frame in self.atlas.read():
+            if self.first_frame is None:
+                self.first_frame = frame
+            self.sink.write(frame)
+
+    def _read_proxy(self):
+        # Downsample the final frame on the GPU and read back only the smaller level
+        texture = self._final.texture.texture
+        texture.build_mipmaps(0, self.proxy_level)
+        width, height = proxy_resolution(self.width, self.height, self.proxy_level)
+        data = texture.read(level=self.proxy_level, alignment=1)
+        return np.flipud(np.frombuffer(data, dtype=np.uint8).reshape(height, width, -1)[..., :3]).copy()
+
     def next(self, dt):
-        DepthScene.next(self, dt)
-        tensor = torch.from_numpy(self.screenshot().copy())
+        # Extra cameras render the same time step first, only the main camera advances the time
+        for camera in self.cameras:
+            self._swap_camera(camera)
+            self._render_camera(dt, advance=False)
+            self._swap_camera(camera)
+
+        self._render_camera(dt)
+        if self.proxy_level:
+            self.proxy_frames.append(self._read_proxy())
+        if self.auxiliary is not None:
+            self.auxiliary_frames.append(read_auxiliary(
+                self.auxiliary.texture.read(), self.width, self.height, self.auxiliary.size
+            ))
 
-        # Accumulate the frame
-        self.frames.append(tensor)
+        # Keep this frame's per-pixel hits (alpha channel) for the next frame's warm start
+        if self.use_warm_start:
+            self.opengl.copy_framebuffer(self.warmstart.fbo, self.shader.texture.fbo)
+
+        if self.first_frame_seconds is None and self.main_started is not None:
+            self.first_frame_seconds = time.perf_counter() - self.main_started
+        self.frame_count += 1
 
         if self.progress_callback:
             self.progress_callback()
 
+        if self.frame_limit and self.frame_count >= self.frame_limit:
+            self.quit()
+
+        if self.interrupt_callback and self.interrupt_callback():
+            self.cancelled = True
+            self.quit()
+
         return self
 
-    def get_accumulated_frames(self):
-        # Convert the deque of frames to a tensor
-        return torch.stack(list(self.frames))
+    def get_accumulated_frames(self, index_map=None):
+        # Let the sink assemble its result, repeating frames from the index map
+        return self.sink.close(index_map)
+
+    def get_auxiliary_outputs(self, index_map=None):
+        """The depth, inpaint mask and uv outputs as tensors, repeating frames from the index map"""
+        depth, mask, uv = split_auxiliary(self.auxiliary_frames, index_map)
+        self.auxiliary_frames.clear()
+        return torch.from_numpy(depth), torch.from_numpy(mask), torch.from_numpy(uv)
+
+    def get_proxy_output(self, index_map=None):
+        """The proxy frames as a float tensor, repeating frames from the index map"""
+        proxy = torch.from_numpy(np.stack(self.proxy_frames))
+        self.proxy_frames.clear()
+        if index_map is not None:
+            proxy = proxy[torch.as_tensor(index_map)]
+        return proxy.float() / 255.0
 
     def clear_frames(self):
-        self.frames.clear()
+        self.sink = TensorSink()
+        self.first_frame = None
+        self.auxiliary_frames.clear()
+        self.proxy_frames.clear()
+        gc.collect()
+
+    def teardown(self):
+        """Discard pending frames and release the OpenGL context now instead of on gc"""
+        self.sink.abort()
+        for camera in self.cameras:
+            camera["sink"].abort()
+        if self.accumulator is not None:
+            self.accumulator.release()
+            self.accumulator = None
+        if self.atlas is not None:
+            self.atlas.release()
+            self.atlas = None
+        self.clear_frames()
+        for module in self.modules:
+            module.destroy()
+        with contextlib.suppress(AttributeError):
+            self.opengl.release()
+        with contextlib.suppress(AttributeError):
+            self.window.destroy()
         gc.collect()
 
 
+class CpuDepthflowScene:
+    """
+    Render the parallax with NumPy on a thread pool, for hosts without any OpenGL context.
+
+    Evaluates the same motion, effects and state per frame as CustomDepthflowScene, then
+    renders batches of frames with utils.cpu_renderer. Stands in for the OpenGL scene in
+    the node's render flow, without the GPU only features.
+    """
+
+    custom_animation = CustomDepthflowScene.custom_animation
+    _set_effects = CustomDepthflowScene._set_effects
+    _apply_frame_state = CustomDepthflowScene._apply_frame_state
+    _set_effects_state = CustomDepthflowScene._set_effects_state
+    frame_signatures = CustomDepthflowScene.frame_signatures
+    sample_frames = CustomDepthflowScene.sample_frames
+    effect_uniforms = staticmethod(CustomDepthflowScene.effect_uniforms)
+    get_accumulated_frames = CustomDepthflowScene.get_accumulated_frames
+
+    def __init__(
+        self,
+        state=None,
+        effects=None,
+        progress_callback=None,
+        interrupt_callback=None,
+        num_frames=30,
+        input_fps=30.0,
+        output_fps=30.0,
+        animation_speed=1.0,
+        sink=None,
+        max_workers=4,
+    ):
+        self.sink = sink or TensorSink()
+        self.first_frame = None
+        self.progress_callback = progress_callback
+        self.interrupt_callback = interrupt_callback
+        self.cancelled = False
+        self.custom_animation_frames = deque()
+        self._set_effects(effects)
+        self.override_state = state
+        self.images = None
+        self.depth_maps = None
+        self.input_fps = input_fps
+        self.animation_speed = animation_speed
+        self.max_workers = max_workers
+        self.frame_limit = None
+        self.frame_count = 0
+        self.subframe = 0
+        self.post_effects = True
+        self.fill_zoom = 1.0
+        self.view_scale = 1.0
+        self.view_offsets = [(0.0, 0.0)]
+        self.view_aspect = None
+        # Same size limit as the OpenGL scene's default, inputs and outputs are checked against it
+        self.max_texture_size = 16384
+        self.cameras = []
+        self.auxiliary = None
+        self.proxy_frames = deque()
+        self.atlas_frames = 1
+        self.main_started = None
+        self.first_frame_seconds = None
+        self.time = 0.0
+        self.runtime = 10.0
+        self.config = SimpleNamespace(animation=DepthAnimation())
+        self.state = DepthState()
+        self.state.inpaint = CustomInpaintState()
+
+    @property
+    def tau(self) -> float:
+        return ((self.time / self.runtime) % 1.0) * self.animation_speed
+
+    @property
+    def cycle(self) -> float:
+        return self.tau * math.tau
+
+    def input(self, image, depth):
+        self.images = image
+        self.depth_maps = depth
+
+    def specialize_effects(self, uniforms):
+        """Nothing to compile, effects are evaluated per frame"""
+
+    def flush_atlas(self):
+        """Frames are read back as they are rendered"""
+
+    def _frame_uniforms(self, quality):
+        uniforms = {uniform.name: uniform.value for uniform in self.state.pipeline()}
+        uniforms["iQuality"] = quality / 100
+        return uniforms
+
+    def main(self, fps, time, quality, ssaa, width, height, **kwargs):
+        """Render the clip at the given size, in batches of a few frames per worker"""
+        self.runtime = time
+        total = self.frame_limit or max(1, round(time * fps))
+        repeat = bool(self.override_state) and (self.override_state.get("tiling_mode") == "repeat")
+        batch = 2 * self.max_workers
+        video_time, frame_index = 0.0, 0
+
+        for start in range(0, total, batch):
+            images, depths, uniforms, offsets = [], [], [], []
+            for index in range(start, min(start + batch, total)):
+                # Same input frame selection and state as the OpenGL scene's update
+                self.time = index / fps
+                while self.time > video_time:
+                    video_time += 1.0 / self.input_fps
+                    frame_index += 1
+                self._apply_frame_state()
+                self.state.zoom *= self.fill_zoom
+                frame_uniforms = self._frame_uniforms(quality)
+                self.state.zoom /= self.fill_zoom
+
+                source = min(frame_index, len(self.images) - 1)
+                images.append(np.asarray(self.images[source], dtype=np.float32) / 255.0)
+                depths.append(np.asarray(self.depth_maps[source][..., 0], dtype=np.float32) / 255.0)
+                uniforms.append(frame_uniforms)
+                offsets.append(self.view_offsets[min(index, len(self.view_offsets) - 1)])
+
+            frames = render_frames(
+                images, depths, uniforms, width, height, max_workers=self.max_workers,
+                ssaa=ssaa, view_scale=self.view_scale, view_offsets=offsets, view_aspect=self.view_aspect,
+                repeat=repeat,
+            )
+
+            for frame in frames:
+                if self.first_frame is None:
+                    self.first_frame = frame
+                self.sink.write(frame)
+                self.frame_count += 1
+                if self.progress_callback:
+                    self.progress_callback()
+
+            if self.interrupt_callback and self.interrupt_callback():
+                self.cancelled = True
+                break
+
+    def clear_frames(self):
+        self.sink = TensorSink()
+        self.first_frame = None
+        gc.collect()
+
+    def teardown(self):
+        self.sink.abort()
+        self.clear_frames()
+
+
 class Depthflow:
     @classmethod
     def INPUT_TYPES(cls):
@@ -266,12 +1022,83 @@ class Depthflow:
             },
             "optional": {
                 "effects": ("DEPTHFLOW_EFFECTS",),  # DepthState object
+                "loop_detection": ("BOOLEAN", {"default": True}),
+                "memory_budget_gb": (
+                    "FLOAT",
+                    {"default": 0.0, "min": 0.0, "max": 1024.0, "step": 0.5},
+                ),
+                "output_strategy": (["auto"] + STRATEGIES, {"default": "auto"}),
+                "output_sink": (["tensor"] + list(SEQUENCE_SINKS) + ["ffmpeg"], {"default": "tensor"}),
+                "output_directory": ("STRING", {"default": "depthflow"}),
+                "sink_workers": ("INT", {"default": 4, "min": 1, "max": 32, "step": 1}),
+                "return_partial_on_cancel": ("BOOLEAN", {"default": False}),
+                "depth_pyramid": ("BOOLEAN", {"default": True}),
+                "warm_start": ("BOOLEAN", {"default": False}),
+                "intersection_scale": (
+                    "FLOAT",
+                    {"default": 1.0, "min": 0.25, "max": 1.0, "step": 0.05},
+                ),
+                "mip_blur": ("BOOLEAN", {"default": True}),
+                "specialize_shader": ("BOOLEAN", {"default": True}),
+                "depth_gradient": ("BOOLEAN", {"default": True}),
+                "auxiliary_outputs": ("BOOLEAN", {"default": False}),
+                "effect_variants": ("DEPTHFLOW_EFFECT_VARIANTS",),
+                "camera_motions": ("DEPTHFLOW_MOTION_VARIANTS",),
+                "stereo_baseline": (
+                    "FLOAT",
+                    {"default": 0.0, "min": 0.0, "max": 0.5, "step": 0.005},
+                ),
+                "motion_blur_samples": ("INT", {"default": 1, "min": 1, "max": 64, "step": 1}),
+                "motion_blur_shutter": (
+                    "FLOAT",
+                    {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.05},
+                ),
+                "antialiasing": (["none", "edge"], {"default": "none"}),
+                "output_width": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 8}),
+                "output_height": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 8}),
+                "output_scale": (
+                    "FLOAT",
+                    {"default": 1.0, "min": 0.05, "max": 4.0, "step": 0.05},
+                ),
+                "output_fit": (FIT_MODES, {"default": "fit"}),
+                "proxy_level": ("INT", {"default": 0, "min": 0, "max": 4, "step": 1}),
+                "depth_scale": (
+                    "FLOAT",
+                    {"default": 1.0, "min": 0.1, "max": 1.0, "step": 0.05},
+                ),
+                "crop_x": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1}),
+                "crop_y": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1}),
+                "crop_width": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 8}),
+                "crop_height": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 8}),
+                "crop_positions": ("STRING", {"default": "", "multiline": True}),
+                "atlas_frames": ("INT", {"default": 1, "min": 1, "max": 256, "step": 1}),
+                "backend": (["opengl", "cpu"], {"default": "opengl"}),
+                "headless_backend": (["auto", *HEADLESS_BACKENDS], {"default": "auto"}),
+                "tune_min_psnr": (
+                    "FLOAT",
+                    {"default": 0.0, "min": 0.0, "max": 100.0, "step": 0.5},
+                ),
+                "tune_min_ssim": (
+                    "FLOAT",
+                    {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.005},
+                ),
+                "tune_frames": ("INT", {"default": 3, "min": 1, "max": 16, "step": 1}),
+                "driver_shader_cache": ("BOOLEAN", {"default": False}),
             },
         }
 
     RETURN_TYPES = (
         "IMAGE",
-    )  # Output is a batch of images (torch.Tensor with shape [B,H,W,C])
+        "STRING",
+        "IMAGE",
+        "MASK",
+        "IMAGE",
+        "IMAGE",
+        "IMAGE",
+        "IMAGE",
+    )  # Output is a batch of images (torch.Tensor with shape [B,H,W,C]), the render plan, the auxiliary outputs, the effect variants, the extra cameras and the proxy
+    RETURN_NAMES = ("image", "plan", "depth", "inpaint_mask", "uv", "variants", "cameras", "proxy")
+    OUTPUT_IS_LIST = (False, False, False, False, False, True, True, False)
     FUNCTION = "apply_depthflow"
     CATEGORY = "🌊 Depthflow"
     DESCRIPTION = """
@@ -289,6 +1116,88 @@ class Depthflow:
     - ssaa: Super sampling anti-aliasing samples.
     - invert: Invert the depthmap.
     - tiling_mode: Tiling mode for the image.
+    - loop_detection: Render a single period of repeating motions over a still image and reuse it.
+    - memory_budget_gb: Host memory budget for the render. 0 only warns when the available memory looks short.
+    - output_strategy: How frames are collected, auto picks the fastest one within the budget.
+      compressed keeps rendered frames losslessly compressed in RAM and reports the ratio.
+    - output_sink: Keep frames in memory (tensor) or stream them to disk as an image sequence
+      (png, exr, npy) or to an FFmpeg encoded video (even frame sides only), returning only the first
+      frame as a preview.
+    - output_directory: Directory for disk sinks, relative to the ComfyUI output directory.
+    - sink_workers: Number of threads writing image sequences or compressing frames.
+    - return_partial_on_cancel: When the prompt is cancelled mid-render, output the frames rendered
+      so far instead of stopping the workflow.
+    - depth_pyramid: Skip empty space in the ray march with a max-depth pyramid, disable to compare
+      against the plain fixed-step march.
+    - warm_start: Start each pixel's ray march near its hit in the previous frame, falling back to the
+      full search on camera cuts or input frame changes. The skipped span is re-checked every 4 probe
+      steps, so surfaces moving in front of the hint are still found.
+    - intersection_scale: Resolution of the intersection search relative to the render, upsampled with
+      depth-aware filtering below 1.0. Much faster at high resolutions, softer at depth edges. Warm start
+      is not available below 1.0.
+    - mip_blur: Depth of field and lens distortion sample a mipmapped image with a few taps instead of
+      up to directions x quality brute force samples, disable for the original effect.
+    - specialize_shader: Compile the effects' enable flags and loop counts into the shader when they stay
+      constant over the clip, removing disabled effects and fixing loop bounds. Intensities and other values
+      stay uniforms, so tweaking them reuses the same program.
+    - depth_gradient: Read surface normals (inpaint steepness) from a gradient precomputed once per depth
+      frame instead of two extra depth samples per pixel.
+    - auxiliary_outputs: Also write the parallaxed depth, the inpaint (disocclusion) mask and the uv
+      coordinates of the input image each pixel sampled (u right, v up) in the same draw. They are kept
+      in memory and returned on the depth, inpaint_mask and uv outputs, which are blank when disabled.
+    - effect_variants: Render the parallax once without DOF, lens, vignette and color effects, then
+      apply each variant's DOF, vignette and colors over the frames on the CPU, returning one batch per
+      variant on the variants output. The image output is the base render. Lens distortion and inpaint
+      settings of the variants are ignored, inpaint comes from the effects input. Needs the tensor sink.
+    - camera_motions: Render more cameras with these motions in the same session, sharing every texture
+      upload with the main motion. Each is returned as a separate batch on the cameras output.
+    - stereo_baseline: Render every camera as a stereo pair, the eyes this far apart horizontally. The
+      image output is the main camera's left eye, the cameras output starts with its right eye, then
+      has the left and right eyes of every camera motion. Warm start and loop detection are not used
+      with extra cameras. Their frames go to sinks like the main camera's, on disk next to it in
+      camera_1, camera_2, ... with the first frame returned as a preview, and count toward the memory plan.
+    - motion_blur_samples: Render this many sub-frames per output frame and average them in a float
+      framebuffer on the GPU, only the averaged frame is read back. 1 disables motion blur.
+    - motion_blur_shutter: Fraction of the frame interval the sub-frames span, from the frame's time on.
+    - antialiasing: Cheaper alternative to ssaa, which supersamples the whole frame. edge marches four
+      more sub-pixel rays only where the hit jumps between neighbouring pixels (depth, out of bounds and
+      inpaint edges), use it with ssaa 1. Not applied below intersection_scale 1.0 or with non-perspective projections.
+    - output_width, output_height: Output size, the textures are sampled at full resolution but only this
+      size is rasterized and read back. 0 follows the input, a single side keeps the input's aspect ratio.
+    - output_scale: Multiplies the output size.
+    - output_fit: With both sides set, fit shrinks the output to the input's aspect ratio inside the box,
+      fill renders the box exactly and crops the input to cover it.
+    - proxy_level: Also return a smaller copy of the main camera's frames on the proxy output, downsampled
+      from the same draw on the GPU, each level halves the size. 0 disables it.
+    - depth_scale: Downsample the depthmaps (after edge_fix) by this factor before uploading them, they are
+      smooth and read with bilinear filtering. The plan reports the upload saved and the depthmap's PSNR.
+    - crop_x, crop_y, crop_width, crop_height: Only rasterize and read back this window of the output frame
+      (pixels, from the top-left corner), the camera stays relative to the full frame. 0 width or height
+      renders the full frame. Vignette and lens distortion stay relative to the full frame too.
+    - crop_positions: Per-frame [x, y] corners of the window as a JSON list, overriding crop_x and crop_y.
+      Frames past the end of the list keep the last position.
+    - atlas_frames: Copy this many rendered frames into the tiles of one large texture on the GPU and read
+      them back in a single transfer, for small renders where per-frame readbacks dominate. Fewer tiles are
+      used when the atlas would exceed the context's largest texture. Ignored with extra cameras, auxiliary or proxy outputs.
+    - backend: opengl renders on the GPU. cpu renders the same ray march, inpaint, depth of field, vignette
+      and colors with NumPy on sink_workers threads, for hosts that can't create an OpenGL context. Much
+      slower, DOF is applied in screen space and lens distortion is skipped. Auxiliary outputs, effect
+      variants, extra cameras, motion blur and the proxy are OpenGL only.
+    - headless_backend: OpenGL context to render with. auto times a small render on EGL, X11 (GLX) and
+      Mesa's llvmpipe on first use and picks the fastest, the results are cached in
+      headless_backend.json in the nodes' cache directory (delete it to probe again). Pick one to force it.
+      The probe runs in the first OpenGL render, which waits up to 30 seconds per backend for it.
+      llvmpipe only counts as working when the context reports Mesa's llvmpipe renderer.
+    - tune_min_psnr, tune_min_ssim: When either is above 0, quality and ssaa are chosen automatically. A few
+      frames are rendered by the selected backend at quality 100 and ssaa 2, then at cheaper settings until every
+      frame is within this PSNR (dB) and SSIM of them. The plan reports the chosen settings, their error (also
+      on edges, edge_psnr) and that backend's time per frame.
+    - tune_frames: Number of frames, spread over the clip, the tuner renders at each setting.
+    - driver_shader_cache: Keep the Mesa and NVIDIA compiled program caches in the nodes' cache directory
+      (unless already configured). Only relocates the caches the drivers keep by default, and sets their
+      environment variables for the whole ComfyUI process. The plan compares each render's time to first
+      frame with the first render of the same program.
+    The plan output reports the estimated memory per stage and render time as JSON.
     """
 
     def __init__(self):
@@ -319,23 +1228,104 @@ class Depthflow:
         tiling_mode,
         edge_fix,
         effects=None,
+        loop_detection=True,
+        memory_budget_gb=0.0,
+        output_strategy="auto",
+        output_sink="tensor",
+        output_directory="depthflow",
+        sink_workers=4,
+        return_partial_on_cancel=False,
+        depth_pyramid=True,
+        warm_start=False,
+        intersection_scale=1.0,
+        mip_blur=True,
+        specialize_shader=True,
+        depth_gradient=True,
+        auxiliary_outputs=False,
+        effect_variants=None,
+        camera_motions=None,
+        stereo_baseline=0.0,
+        motion_blur_samples=1,
+        motion_blur_shutter=0.5,
+        antialiasing="none",
+        output_width=0,
+        output_height=0,
+        output_scale=1.0,
+        output_fit="fit",
+        proxy_level=0,
+        depth_scale=1.0,
+        crop_x=0,
+        crop_y=0,
+        crop_width=0,
+        crop_height=0,
+        crop_positions="",
+        atlas_frames=1,
+        backend="opengl",
+        headless_backend="auto",
+        tune_min_psnr=0.0,
+        tune_min_ssim=0.0,
+        tune_frames=3,
+        driver_shader_cache=False,
     ):
+        # Point the drivers' program caches at the nodes' cache directory, before any context
+        # exists. Process wide, so only on request
+        if driver_shader_cache:
+            enable_driver_shader_cache()
+
         # Create the scene
         state = {"invert": invert, "tiling_mode": tiling_mode}
-        scene = CustomDepthflowScene(
+        options = dict(
             state=state,
             effects=effects,
             progress_callback=self.update_progress,
+            interrupt_callback=comfy.model_management.processing_interrupted,
             num_frames=num_frames,
             input_fps=input_fps,
             output_fps=output_fps,
             animation_speed=animation_speed,
-            backend="headless",
         )
+        if backend == "cpu":
+            unsupported = [
+                name for name, used in (
+                    ("auxiliary_outputs", auxiliary_outputs),
+                    ("effect_variants", bool(effect_variants)),
+                    ("camera_motions", bool(camera_motions)),
+                    ("stereo_baseline", stereo_baseline > 0),
+                    ("motion_blur_samples", motion_blur_samples > 1),
+                    ("proxy_level", proxy_level > 0),
+                ) if used
+            ]
+            if unsupported:
+                raise ValueError(f"Not available on the cpu backend: {', '.join(unsupported)}")
+            scene = CpuDepthflowScene(**options, max_workers=sink_workers)
+        else:
+            # Create the context on the fastest headless backend of this machine
+            headless, headless_report = select_headless_backend(headless_backend)
+            with headless_environment(headless):
+                scene = CustomDepthflowScene(**options, backend="headless")
+            if headless_report:
+                scene.max_texture_size = min(scene.max_texture_size, headless_report["max_texture_size"])
 
-        # Fix: Disable upscaler to prevent incorrect resolution doubling
-        # The pypi depthflow package incorrectly defaults upscaler.scale to 2
-        scene.config.upscaler.scale = 1
+            # Fix: Disable upscaler to prevent incorrect resolution doubling
+            # The pypi depthflow package incorrectly defaults upscaler.scale to 2
+            scene.config.upscaler.scale = 1
+            scene.use_depth_pyramid = depth_pyramid
+            scene.use_warm_start = warm_start
+            scene.set_intersection_scale(intersection_scale)
+            scene.use_mip_blur = mip_blur
+            scene.use_depth_gradient = depth_gradient
+            scene.motion_blur_samples = motion_blur_samples
+            scene.motion_blur_shutter = motion_blur_shutter
+            scene.use_edge_antialias = (antialiasing == "edge")
+            scene.proxy_level = proxy_level
+            if effect_variants:
+                if output_sink != "tensor":
+                    raise ValueError("Effect variants need the frames in memory, use the tensor output_sink")
+                # Variants blur by the parallaxed depth from the auxiliary target
+                scene.post_effects = False
+                scene.enable_auxiliary_outputs()
+            elif auxiliary_outputs:
+                scene.enable_auxiliary_outputs()
 
         # Convert image and depthmap to numpy arrays
         if image.is_cuda:
@@ -393,6 +1383,14 @@ class Depthflow:
             # Convert back to numpy array
             depth_map = np.array(dilated_depth_maps)
 
+        # Smaller depth uploads, measuring what the bilinear reads lose on the first depthmap
+        depth_report = {}
+        if depth_scale < 1.0:
+            full_size = depth_map.shape[1] * depth_map.shape[2]
+            depth_report["depth_psnr"] = round(depth_scale_psnr(depth_map[0], depth_scale), 2)
+            depth_map = downsample_depth(depth_map, depth_scale)
+            depth_report["depth_upload_ratio"] = round(depth_map.shape[1] * depth_map.shape[2] / full_size, 4)
+
         # Determine the number of frames
         num_image_frames = image.shape[0]
         num_depth_frames = depth_map.shape[0]
@@ -415,15 +1413,34 @@ class Depthflow:
         # Get width and height of images
         height, width = image.shape[1], image.shape[2]
 
-        # Validate image dimensions against OpenGL texture limits
-        # Most OpenGL contexts have a maximum texture size of 16384
-        MAX_TEXTURE_SIZE = 16384
+        # Validate image dimensions against the context's texture limit
+        MAX_TEXTURE_SIZE = scene.max_texture_size
         if width > MAX_TEXTURE_SIZE or height > MAX_TEXTURE_SIZE:
             raise ValueError(
                 f"Image dimensions ({width}x{height}) exceed OpenGL maximum texture size ({MAX_TEXTURE_SIZE}). "
                 f"Please resize your input image to be at most {MAX_TEXTURE_SIZE}x{MAX_TEXTURE_SIZE} pixels."
             )
 
+        # Only the output size is rasterized and read back, the textures keep the input's
+        width, height, scene.fill_zoom = output_resolution(
+            width, height, output_width, output_height, output_scale, output_fit
+        )
+        if width > MAX_TEXTURE_SIZE or height > MAX_TEXTURE_SIZE:
+            raise ValueError(
+                f"Output dimensions ({width}x{height}) exceed OpenGL maximum texture size ({MAX_TEXTURE_SIZE})."
+            )
+
+        # Only the crop window is rasterized and read back, the camera keeps the full frame
+        crop = None
+        if crop_width and crop_height:
+            positions = parse_crop_positions(crop_positions) or [(crop_x, crop_y)]
+            views = [crop_view(x, y, crop_width, crop_height, width, height) for x, y in positions]
+            scene.view_scale = views[0][0]
+            scene.view_offsets = [offset for _, offset in views]
+            scene.view_aspect = width / height
+            crop = {"frame": [width, height], "size": [crop_width, crop_height], "positions": len(positions)}
+            width, height = crop_width, crop_height
+
         # Input the image and depthmap into the scene
         # Store the image and depth sequences in the scene for frame-by-frame processing
         print(f"DEBUG: depth_map shape: {depth_map.shape}, dtype: {depth_map.dtype}")
@@ -444,35 +1461,265 @@ class Depthflow:
 
         scene.custom_animation(motion)
 
+        # Extra cameras render every time step right after the main one, from the same uploads
+        if stereo_baseline > 0:
+            scene.camera_offset = -stereo_baseline / 2
+            scene.add_camera(offset=stereo_baseline / 2)
+        for camera_motion in camera_motions or []:
+            scene.add_camera(motion=camera_motion, offset=scene.camera_offset)
+            if stereo_baseline > 0:
+                scene.add_camera(motion=camera_motion, offset=stereo_baseline / 2)
+
+        # Small frames are drawn into the tiles of an atlas and read back together
+        if not (scene.cameras or (scene.auxiliary is not None) or proxy_level):
+            scene.atlas_frames = atlas_frames
+
         # Calculate the duration based on fps and num_frames
         if num_frames <= 0:
             raise ValueError("FPS and number of frames must be greater than 0")
         duration = float(num_frames) / input_fps
         total_frames = duration * output_fps
 
-        self.start_progress(total_frames, desc="Depthflow Rendering")
+        # Disk and encoder sinks stream frames out with constant memory. They start threads
+        # and processes, so they are only created right before rendering. Extra cameras
+        # write next to the main one, to camera_1, camera_2, ...
+        make_sink = None
+        if output_sink != "tensor":
+            directory = Path(folder_paths.get_output_directory()) / output_directory
+            directory = directory / time.strftime("%Y%m%d-%H%M%S")
+            camera_names = [f"camera_{index}" for index in range(1, len(scene.cameras) + 1)]
+            if output_sink == "ffmpeg":
+                EncoderPipeSink.validate_size(width, height)
+                make_sink = functools.partial(
+                    EncoderPipeSink, width=width, height=height, fps=output_fps, max_pending=8
+                )
+                sink_paths = [directory / f"{name}.mp4" for name in ["depthflow", *camera_names]]
+            else:
+                make_sink = functools.partial(
+                    SEQUENCE_SINKS[output_sink], max_workers=sink_workers, max_pending=2 * sink_workers
+                )
+                sink_paths = [directory, *(directory / name for name in camera_names)]
+        sink_reusable = make_sink.func.reusable if make_sink else scene.sink.reusable
 
-        # Render the output video
-        scene.main(
-            render=False,
-            output=None,
-            fps=output_fps,
-            time=duration,
-            speed=1.0,
-            quality=quality,
+        # Periodic or ping-pong motion over a still input repeats frames, so only
+        # render up to the last unique one and fill the rest by indexing
+        index_map = None
+        if (
+            loop_detection
+            and sink_reusable
+            and not scene.cameras
+            and motion_blur_samples == 1
+            and len(scene.view_offsets) == 1
+            and num_image_frames == 1
+            and num_depth_frames == 1
+        ):
+            index_map = frame_reuse_map(
+                scene.frame_signatures(max(1, round(total_frames)), output_fps, duration)
+            )
+            unique_frames = render_count(index_map)
+            if unique_frames < len(index_map):
+                print(
+                    f"Depthflow: {describe_reuse(index_map)} motion detected, "
+                    f"rendering {unique_frames} of {len(index_map)} frames"
+                )
+                scene.frame_limit = unique_frames
+                total_frames = unique_frames
+            else:
+                index_map = None
+
+        # Effect flags and loop bounds that never change over the clip are compiled into the
+        # shader as constants, the other effect values stay uniforms
+        specialized = False
+        if specialize_shader:
+            effects_per_frame = set(scene.frame_signatures(
+                max(1, round(total_frames)), output_fps, duration,
+                signature=lambda state: specialized_uniforms(scene.effect_uniforms(state)),
+            ))
+            if len(effects_per_frame) == 1:
+                scene.specialize_effects(effects_per_frame.pop())
+                specialized = True
+
+        # Search the cheapest quality and ssaa within the tolerance on a few frames, rendered and
+        # timed by the backend that renders the job
+        tuning = None
+        if (tune_min_psnr > 0) or (tune_min_ssim > 0):
+            indices = representative_frames(max(1, round(total_frames)), tune_frames)
+            if backend == "opengl":
+                scene.prepare_samples(width, height, duration)
+
+                def render_sample(sample_quality, sample_ssaa):
+                    return scene.render_samples(indices, output_fps, duration, sample_quality, sample_ssaa)
+            else:
+                images, depths, uniforms, offsets = scene.sample_frames(indices, output_fps, duration)
+
+                def render_sample(sample_quality, sample_ssaa):
+                    for frame_uniforms in uniforms:
+                        frame_uniforms["iQuality"] = sample_quality / 100
+                    return render_frames(
+                        images, depths, uniforms, width, height, max_workers=sink_workers,
+                        ssaa=sample_ssaa, view_scale=scene.view_scale, view_offsets=offsets,
+                        view_aspect=scene.view_aspect,
+                        repeat=(tiling_mode == "repeat"),
+                    )
+
+            tuning = tune_quality(render_sample, tune_min_psnr, tune_min_ssim)
+            quality, ssaa = tuning["quality"], tuning["ssaa"]
+
+        output_frames = max(1, round(duration * output_fps))
+        rendered_frames = scene.frame_limit or output_frames
+
+        # Float frames the other outputs hold next to the image, per output frame
+        extra_frame_bytes = 0
+        if scene.auxiliary is not None:
+            # RGBA readbacks, and the depth, mask and uv split from them
+            extra_frame_bytes += (4 + 7) * 4 * width * height
+        if effect_variants:
+            extra_frame_bytes += len(effect_variants) * 3 * 4 * width * height
+        if proxy_level:
+            # uint8 readbacks and their float output
+            proxy_width, proxy_height = proxy_resolution(width, height, proxy_level)
+            extra_frame_bytes += (1 + 4) * 3 * proxy_width * proxy_height
+
+        plan = plan_render(
+            width,
+            height,
+            rendered_frames,
+            output_frames,
+            input_frames=num_image_frames,
+            depth_frames=num_depth_frames,
             ssaa=ssaa,
-            scale=1.0,
-            width=width,
-            height=height,
-            ratio=None,
-            freewheel=True,
+            budget_gb=memory_budget_gb,
+            strategy=output_strategy,
+            pending_frames=make_sink.keywords["max_pending"] if make_sink else None,
+            input_size=(image.shape[2], image.shape[1]),
+            depth_size=(depth_map.shape[2], depth_map.shape[1]),
+            cameras=len(scene.cameras),
+            extra_frame_bytes=extra_frame_bytes,
         )
+        plan["shader"] = "specialized" if specialized else "generic"
+        plan["backend"] = backend
+        if backend == "opengl":
+            plan["headless_backend"] = headless or "default"
+        plan["resolution"] = [width, height]
+        plan.update(depth_report)
+        if crop is not None:
+            plan["crop"] = crop
+        if scene.atlas_frames > 1:
+            plan["atlas_frames"] = scene.atlas_frames
+        if tuning is not None:
+            plan["tuning"] = tuning
+        print(f"Depthflow: render plan {json.dumps(plan)}")
+        if plan["strategy"] == "stream":
+            scene.sink = PreallocatedTensorSink(output_frames, height, width)
+            for camera in scene.cameras:
+                camera["sink"] = PreallocatedTensorSink(output_frames, height, width)
 
-        video = scene.get_accumulated_frames()
+        self.start_progress(total_frames, desc="Depthflow Rendering")
+        started = scene.main_started = time.perf_counter()
+
+        # Render the output video
+        try:
+            if make_sink:
+                scene.sink = make_sink(sink_paths[0])
+                for camera, path in zip(scene.cameras, sink_paths[1:]):
+                    camera["sink"] = make_sink(path)
+            elif plan["strategy"] == "compressed":
+                scene.sink = CompressedTensorSink(max_workers=sink_workers, shape=(height, width, 3))
+                for camera in scene.cameras:
+                    camera["sink"] = CompressedTensorSink(max_workers=sink_workers, shape=(height, width, 3))
+            scene.main(
+                render=False,
+                output=None,
+                fps=output_fps,
+                time=duration,
+                speed=1.0,
+                quality=quality,
+                ssaa=ssaa,
+                scale=1.0,
+                width=width,
+                height=height,
+                ratio=width / height,
+                freewheel=True,
+            )
+            scene.flush_atlas()
+        except BaseException:
+            scene.teardown()
+            self.end_progress()
+            raise
+
+        elapsed = time.perf_counter() - started
+        plan["elapsed_seconds"] = round(elapsed, 3)
+        if scene.first_frame_seconds is not None:
+            plan["first_frame_seconds"] = round(scene.first_frame_seconds, 3)
+            renders, first_seconds = record_first_frame(scene.program_key(), scene.first_frame_seconds)
+            plan["program_renders"] = renders
+            plan["program_first_render_seconds"] = first_seconds
+
+        if scene.cancelled:
+            plan["cancelled_at_frame"] = scene.frame_count
+            if not (return_partial_on_cancel and scene.frame_count):
+                # Free everything right away, then let ComfyUI stop the prompt
+                scene.teardown()
+                self.end_progress()
+                comfy.model_management.throw_exception_if_processing_interrupted()
+            # Keep the workflow going with the frames rendered so far
+            print(f"Depthflow: render cancelled, returning {scene.frame_count} rendered frames")
+            comfy.model_management.interrupt_current_processing(False)
+            index_map = None
+        elif backend == "opengl":
+            # Every camera renders a frame (or its sub-frames) per time step
+            renders = scene.frame_count * (1 + len(scene.cameras)) * motion_blur_samples
+            record_throughput(width, height, ssaa, renders, elapsed)
+
+        result = scene.get_accumulated_frames(index_map)
+        if scene.auxiliary is not None:
+            auxiliary = scene.get_auxiliary_outputs(index_map)
+        else:
+            auxiliary = (
+                torch.zeros((1, height, width, 3)),
+                torch.zeros((1, height, width)),
+                torch.zeros((1, height, width, 3)),
+            )
+        if output_sink == "tensor":
+            video = result
+            if isinstance(scene.sink, CompressedTensorSink):
+                plan["codec"] = scene.sink.codec
+                plan["compression_ratio"] = round(scene.sink.ratio, 2)
+        else:
+            # Frames went to disk, return the first one as a preview
+            video = torch.from_numpy(scene.first_frame).unsqueeze(0).float() / 255.0
+            plan["output_directory"] = str(directory)
+            plan["output_files"] = len(result)
+        if proxy_level and scene.proxy_frames:
+            proxy = scene.get_proxy_output(index_map)
+        else:
+            proxy_width, proxy_height = proxy_resolution(width, height, proxy_level)
+            proxy = torch.zeros((1, proxy_height, proxy_width, 3))
+        cameras = [torch.zeros((1, height, width, 3))]
+        if scene.cameras:
+            cameras = [camera["sink"].close() for camera in scene.cameras]
+            plan["cameras"] = 1 + len(scene.cameras)
+            if output_sink != "tensor":
+                # Like the main camera, return each camera's first frame as a preview
+                plan["camera_files"] = [len(files) for files in cameras]
+                cameras = [
+                    torch.from_numpy(camera["first_frame"]).unsqueeze(0).float() / 255.0
+                    for camera in scene.cameras
+                ]
+
+        variants = [torch.zeros((1, height, width, 3))]
+        if effect_variants:
+            started = time.perf_counter()
+            depths = auxiliary[0][..., 0].numpy()
+            variants = [
+                torch.from_numpy(apply_variant(
+                    video.numpy(), depths, scene.variant_uniforms(variant, len(video)), sink_workers
+                ))
+                for variant in effect_variants
+            ]
+            plan["effect_variants"] = len(variants)
+            plan["variants_seconds"] = round(time.perf_counter() - started, 3)
         scene.clear_frames()
         self.end_progress()
 
-        # Normalize the video frames to [0, 1]
-        video = video.float() / 255.0
-
-        return (video,)
+        return (video, json.dumps(plan, indent=2), *auxiliary, variants, cameras, proxy)
@@ -0,0 +1,47 @@
+import torch
+
+from .utils.warp_utils import remap_frames
+
+
+class DepthflowRemap:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": ("IMAGE",),  # Color variants to warp
+                "uv": ("IMAGE",),  # Warp field from the Depthflow node's uv output
+                "tiling_mode": (["mirror", "repeat", "none"], {"default": "mirror"}),
+            },
+            "optional": {
+                "workers": ("INT", {"default": 4, "min": 1, "max": 32, "step": 1}),
+                "chunk_size": ("INT", {"default": 8, "min": 1, "max": 256, "step": 1}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE",)
+    RETURN_NAMES = ("image",)
+    FUNCTION = "apply_remap"
+    CATEGORY = "🌊 Depthflow"
+    DESCRIPTION = """
+    Depthflow Remap Node:
+    Applies a warp field rendered once by the Depthflow node (auxiliary_outputs, uv output) to other
+    images on the CPU, without running the ray march again. The warp only depends on the depthmap,
+    motion and render settings, so color variants (grades, stylized frames) of the same input can
+    reuse it.
+    - image: Images to warp, a single image is used for every frame.
+    - uv: The uv output of the Depthflow node, a single frame is used for every image.
+    - tiling_mode: Should match the Depthflow node's tiling mode.
+    - workers: Number of threads remapping frames.
+    - chunk_size: Frames remapped per task.
+    Inpainting and post effects are not applied, use the inpaint_mask output to find disocclusions.
+    """
+
+    def apply_remap(self, image, uv, tiling_mode, workers=4, chunk_size=8):
+        video = remap_frames(
+            image.cpu().numpy(),
+            uv.cpu().numpy(),
+            repeat=(tiling_mode == "repeat"),
+            chunk_size=chunk_size,
+            max_workers=workers,
+        )
+        return (torch.from_numpy(video),)
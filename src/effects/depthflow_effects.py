@@ -435,3 +435,31 @@ class DepthflowEffectColor(DepthflowEffects):
             }
         )
         return (effects,)
+
+
+class DepthflowEffectVariants:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "effects": ("DEPTHFLOW_EFFECTS",),
+            },
+            "optional": {
+                "variants": ("DEPTHFLOW_EFFECT_VARIANTS",),
+            },
+        }
+
+    RETURN_TYPES = ("DEPTHFLOW_EFFECT_VARIANTS",)
+    FUNCTION = "add_variant"
+    CATEGORY = "🌊 Depthflow/Effects"
+    DESCRIPTION = """
+    Depthflow Effect Variants Node:
+    Collects effects into a list of variants for the Depthflow node's effect_variants input, which
+    renders the parallax once and applies every variant over the same frames. Chain the nodes to add
+    more variants.
+    - effects: The effects of this variant.
+    - variants: Variants to append this one to.
+    """
+
+    def add_variant(self, effects, variants=None):
+        return (list(variants or []) + [effects],)
@@ -375,3 +375,30 @@ class DepthflowMotionArc(DepthflowMotion):
         )
         
         return (arc_component,)
+
+
+class DepthflowMotionVariants:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "motion": ("DEPTHFLOW_MOTION",),
+            },
+            "optional": {
+                "variants": ("DEPTHFLOW_MOTION_VARIANTS",),
+            },
+        }
+
+    RETURN_TYPES = ("DEPTHFLOW_MOTION_VARIANTS",)
+    FUNCTION = "add_variant"
+    CATEGORY = "🌊 Depthflow/Motion"
+    DESCRIPTION = """
+    Depthflow Motion Variants Node:
+    Collects motions for the Depthflow node's camera_motions input, which renders every motion in the
+    same session as extra cameras over the same image and depthmap. Chain the nodes to add more.
+    - motion: The motion of this camera.
+    - variants: Motions to append this one to.
+    """
+
+    def add_variant(self, motion, variants=None):
+        return (list(variants or []) + [motion],)
@@ -22,19 +22,107 @@ struct DepthFlow {
     vec2 center;
     vec2 origin;
     bool glued;
+    float hint;
     // Output
     float derivative;
     float steep;
     float value;
     vec3 normal;
     vec2 gluv;
+    float walk;
     bool oob;
 };
 
+// Hierarchical empty-space skipping over the (max, min) depth pyramid atlas. Returns the
+// walk up to which the ray is guaranteed to stay above the surface, walking cells of the
+// coarsest level it can and refining only where the ceiling dips below a cell's bound
+float DepthSkip(
+    vec3 start,
+    vec3 delta,
+    DepthFlow depth,
+    sampler2D depthmap,
+    sampler2D pyramid
+) {
+    // Texel coordinates of the ray are linear on the walk, texel = t0 + walk*td
+    vec2 size  = vec2(textureSize(depthmap, 0));
+    vec2 scale = vec2(size.y/size.x, 1.0);
+    vec2 t0 = gluv2stuv(start.xy*scale) * size;
+    vec2 td = (delta.xy*scale) * 0.5 * size;
+
+    // Row offsets of each level in the atlas, heights halve rounding up
+    int offsets[16];
+    int levels = 0;
+    ivec2 extent = ivec2(size);
+    for (int offset=0; levels<16 && max(extent.x, extent.y) > 1; levels++) {
+        extent = (extent + 1) / 2;
+        offsets[levels] = offset;
+        offset += extent.y;
+    }
+    if (levels == 0)
+        return 0.0;
+
+    float proven = 0.0;
+    float walk = 0.0;
+    int level = levels - 1;
+
+    for (int it=0; it<64; it++) {
+        if (walk > 1.0)
+            break;
+
+        // Mirrored or repeated texels outside the image aren't covered, march them normally
+        vec2 texel = t0 + walk*td;
+        if (any(lessThan(texel, vec2(0.0))) || any(greaterThanEqual(texel, size)))
+            break;
+
+        float cell  = exp2(float(level + 1));
+        ivec2 index = ivec2(floor(texel / cell));
+        vec2 bounds = texelFetch(pyramid, ivec2(index.x, offsets[level] + index.y), 0).rg;
+
+        // Highest surface within the cell, invert is linear so an extreme bounds it
+        vec2 surfaces = depth.height * mix(bounds, 1.0 - bounds, depth.invert);
+        float highest = max(surfaces.x, surfaces.y);
+
+        // Refine the cell when the ray is already below its highest point
+        if ((1.0 - (start.z + walk*delta.z)) < highest) {
+            if (level == 0) break;
+            level--;
+            continue;
+        }
+
+        // Walk where the ceiling reaches the highest point, and where the ray leaves the cell
+        float reach = (delta.z > 0.0) ? ((1.0 - start.z - highest) / delta.z) : 2.0;
+        vec2 lower = vec2(index) * cell;
+        vec2 exits = vec2(2.0);
+        if (td.x != 0.0) exits.x = ((td.x > 0.0 ? lower.x + cell : lower.x) - t0.x) / td.x;
+        if (td.y != 0.0) exits.y = ((td.y > 0.0 ? lower.y + cell : lower.y) - t0.y) / td.y;
+        float leave = min(exits.x, exits.y);
+
+        if (reach <= leave) {
+            proven = max(proven, reach);
+            walk = proven;
+            if (level == 0) break;
+            level--;
+        } else {
+            proven = max(proven, leave);
+            walk = proven + (1e-3 / max(length(td), 1.0));
+            level = min(level + 1, levels - 1);
+        }
+    }
+
+    return min(proven, 1.0);
+}
+
+// Probe steps between the samples re-checking a warm start's skipped span
+#define WARM_START_STRIDE 4.0
+
+// The ray of this pixel shifted by jitter gluv units, for sub-pixel samples. Region of interest
+// renders map the window's gluv into the full frame's by iViewScale and iViewOffset
 DepthFlow DepthMake(
     Camera camera,
     DepthFlow depth,
-    sampler2D depthmap
+    sampler2D depthmap,
+    sampler2D pyramid,
+    vec2 jitter
 ) {
     // Convert absolute values to relative values
     float rel_focus  = (depth.focus  * depth.height);
@@ -48,7 +136,18 @@ DepthFlow DepthMake(
     camera.focal_length = (1.0 - rel_focus);
     camera.plane_point  = vec3(0.0, 0.0, 1.0);
     camera              = CameraProject(camera);
-    depth.oob           = camera.out_of_bounds;
+
+    // CameraProject always reads the pixel's center of the whole screen, only perspective rays
+    // are jittered or windowed
+    bool windowed = (iViewScale != 1.0) || (iViewOffset != vec2(0.0));
+    if ((windowed || jitter != vec2(0.0)) && (camera.projection == CameraProjectionPerspective)) {
+        vec2 view = ((gluv + jitter)*iViewScale + iViewOffset);
+        camera.origin = CameraRayOrigin(camera, view);
+        camera.target = CameraRayTarget(camera, view);
+        camera.ray    = (camera.target - camera.origin);
+        camera        = CameraRay2D(camera);
+    }
+    depth.oob = camera.out_of_bounds;
 
     if (depth.oob)
         return depth;
@@ -70,6 +169,34 @@ DepthFlow DepthMake(
     float last_value = 0.0;
     float walk = 0.0;
 
+    // Skip the empty space in front of the surface, resuming on the forward probe grid.
+    // Every probe sample up to the resumed walk is proven outside the surface, so the
+    // march takes the same samples from there on and finds the same hit point (up to
+    // float rounding of the accumulated walk) with far fewer depthmap fetches
+    if (iDepthPyramid) {
+        vec3 start = mix(camera.origin, intersect, safe);
+        vec3 delta = (intersect - camera.origin) * (1.0 - safe);
+        walk = probe * floor(DepthSkip(start, delta, depth, depthmap, pyramid) / probe);
+    }
+
+    // Warm start shortly before the previous frame's hit. The skipped span is re-probed with
+    // one probe step (rays starting over the tallest surface), then WARM_START_STRIDE steps.
+    // A surface that moved in front of the hint stops it at the last outside sample, so only
+    // features thinner than the stride along the ray can be jumped over
+    if (depth.hint > 0.0) {
+        float begin = probe * floor(max(depth.hint - 2.0*probe, 0.0) / probe);
+        float stride = probe;
+        for (int it=0; it<1000 && walk < begin; it++) {
+            float next = min(walk + stride, begin);
+            stride = probe * WARM_START_STRIDE;
+            vec3 point = mix(camera.origin, intersect, mix(safe, 1.0, next));
+            float value = gtexture(depthmap, point.xy, depth.mirror).r;
+            if ((1.0 - point.z) < depth.height * mix(value, 1.0 - value, depth.invert))
+                break;
+            walk = next;
+        }
+    }
+
     /* Main loop: Find the intersection with the scene */
     for (int stage=0; stage<2; stage++) {
         bool FORWARD  = (stage == 0);
@@ -108,18 +235,33 @@ DepthFlow DepthMake(
 
     // The gradient is always normal to a surface; assume the change
     // of z is proportional to the maximum surface height
-    depth.normal = normalize(vec3(
-        (gtexture(depthmap, depth.gluv - vec2(quality, 0), depth.mirror).r - depth.value) / quality,
-        (gtexture(depthmap, depth.gluv - vec2(0, quality), depth.mirror).r - depth.value) / quality,
-        max(depth.height, quality)
-    ));
+    vec2 slope;
+    vec2 scale = vec2(textureSize(depthmap, 0));
+    scale = vec2(scale.y/scale.x, 1.0);
+
+    // Optimization: One fetch of the gradient precomputed per depth frame. Mirrored regions
+    // flip its sign, so those keep the finite differences
+    if (iDepthGradient && all(lessThanEqual(abs(depth.gluv*scale), vec2(1.0)))) {
+        slope = -gtexture(gradient, depth.gluv).rg;
+    } else {
+        slope = vec2(
+            (gtexture(depthmap, depth.gluv - vec2(quality, 0), depth.mirror).r - depth.value) / quality,
+            (gtexture(depthmap, depth.gluv - vec2(0, quality), depth.mirror).r - depth.value) / quality
+        );
+    }
+    depth.normal = normalize(vec3(slope, max(depth.height, quality)));
 
     // Heuristic to determine the perceptual steepness of the surface, 'gaps'
     depth.steep = depth.derivative * angle(depth.normal, vec3(0, 0, 1));
+    depth.walk  = clamp(walk, 0.0, 1.0);
 
     return depth;
 }
 
+DepthFlow DepthMake(Camera camera, DepthFlow depth, sampler2D depthmap, sampler2D pyramid) {
+    return DepthMake(camera, depth, depthmap, pyramid, vec2(0.0));
+}
+
 #define GetDepthFlow(name) \
     DepthFlow name; \
     { \
@@ -136,8 +278,10 @@ DepthFlow DepthMake(
         name.invert    = name##Invert; \
         name.quality   = iQuality; \
         name.glued     = true; \
+        name.hint      = 0.0; \
         name.value     = 0.0; \
         name.gluv      = vec2(0.0); \
+        name.walk      = 0.0; \
         name.oob       = false; \
     }
 #endif
@@ -145,15 +289,141 @@ DepthFlow DepthMake(
 /* ---------------------------------------------------------------------------------------------- */
 
 
-void main() {
-    GetCamera(iCamera);
-    GetDepthFlow(iDepth);
-    DepthFlow depthflow = DepthMake(iCamera, iDepth, depth);
-    fragColor = gtexture(image, depthflow.gluv, depthflow.mirror);
+#ifdef DEPTHFLOW_UPSAMPLE
+
+// Width of the depth similarity falloff when upsampling intersections
+#define DEPTH_UPSAMPLE_SIGMA 0.05
+
+// Joint bilateral upsampling of the reduced resolution intersections (gluv, value, steep).
+// The four nearest texels are weighted bilinearly and by how close their depth is to the
+// depth found at the interpolated hit, so depth edges don't blend foreground and background
+DepthFlow DepthUpsample(DepthFlow depth, sampler2D depthmap, sampler2D intersections) {
+    ivec2 size = textureSize(intersections, 0);
+    vec2 coord = stuv*vec2(size) - 0.5;
+    ivec2 base = ivec2(floor(coord));
+    vec2 fraction = coord - vec2(base);
+
+    vec4 texels[4];
+    float spatial[4];
+    float outside = 0.0;
+    vec2 guess = vec2(0.0);
+    float inside = 0.0;
+
+    for (int i=0; i<4; i++) {
+        ivec2 offset = ivec2(i & 1, i >> 1);
+        texels[i] = texelFetch(intersections, clamp(base + offset, ivec2(0), size - 1), 0);
+        spatial[i] = mix(1.0 - fraction.x, fraction.x, float(offset.x))
+                   * mix(1.0 - fraction.y, fraction.y, float(offset.y));
+
+        // Out of bounds texels are flagged with a negative depth value
+        if (texels[i].z < 0.0) {
+            outside += spatial[i];
+        } else {
+            guess  += spatial[i] * texels[i].xy;
+            inside += spatial[i];
+        }
+    }
+
+    depth.oob = (outside > 0.5);
+    if (depth.oob)
+        return depth;
+
+    float guide = gtexture(depthmap, guess/inside, depth.mirror).r;
+    vec4 result = vec4(0.0);
+    float total = 0.0;
+    float closest = 1e9;
+    vec4 nearest = texels[0];
+
+    for (int i=0; i<4; i++) {
+        if (texels[i].z < 0.0)
+            continue;
+        float distance = (texels[i].z - guide) / DEPTH_UPSAMPLE_SIGMA;
+        float weight = spatial[i] * exp(-distance*distance);
+        result += weight * texels[i];
+        total  += weight;
+        if (abs(distance) < closest) {
+            closest = abs(distance);
+            nearest = texels[i];
+        }
+    }
+
+    // No texel agrees with the guide, take the most similar one as is
+    result = (total > 1e-4) ? (result / total) : nearest;
+    depth.gluv  = result.xy;
+    depth.value = result.z;
+    depth.steep = result.w;
+    return depth;
+}
+
+#endif
+
+// Taps of the mip-based blurs, see utils/dof_utils.py for the reference implementation
+#define DOF_RINGS 3
+#define DOF_TAPS 8
+#define LENS_TAPS 8
+
+// Same as gtexture, at an explicit mip level
+vec4 gtextureLod(sampler2D image, vec2 gluv, bool mirror, float lod) {
+    if (mirror)
+        gluv = gluv_mirrored_repeat(gluv);
+    vec2 resolution = textureSize(image, 0);
+    vec2 scale = vec2(resolution.y/resolution.x, 1);
+    return textureLod(image, gluv2stuv(gluv*scale), lod);
+}
+
+// Depth of field from the mipmapped image. The brute force rings are uniform in radius,
+// so a few rings at their midpoints stand in for them, each tap reading the mip level whose
+// footprint covers the gap to its neighbours; the center keeps its brute force share
+vec4 DepthBlurMip(vec2 gluv, bool mirror, float intensity) {
+    float texels = 0.5 * float(textureSize(imageblur, 0).y);
+    float radius = intensity * texels;
+    vec4 rings = vec4(0.0);
+
+    for (int ring=0; ring<DOF_RINGS; ring++) {
+        float distance = radius * (float(ring) + 0.5) / float(DOF_RINGS);
+        float spacing  = max(TAU * distance / float(DOF_TAPS), radius / float(DOF_RINGS));
+        float lod      = log2(max(spacing, 1.0));
+        for (int tap=0; tap<DOF_TAPS; tap++) {
+            float angle = (float(tap) + 0.5*float(ring % 2)) * TAU / float(DOF_TAPS);
+            vec2 displacement = vec2(cos(angle), sin(angle)) * (distance / texels);
+            rings += gtextureLod(imageblur, gluv + displacement, mirror, lod);
+        }
+    }
+
+    float samples = float(iBlurDirections * iBlurQuality);
+    rings /= float(DOF_RINGS * DOF_TAPS);
+    return (gtexture(image, gluv, mirror) + samples*rings) / samples;
+}
+
+// Lens distortion from the mipmapped image, fewer taps along each channel's path at the
+// mip level spanning the skipped samples, centered like the brute force ones
+vec3 LensMip(vec2 gluv, bool mirror, vec2 delta) {
+    float texels = 0.5 * float(textureSize(imageblur, 0).y);
+    vec3 lod = log2(max(vec3(1, 2, 4) * length(delta) * texels / float(LENS_TAPS), 1.0));
+    vec3 color = vec3(0);
+
+    for (int tap=0; tap<LENS_TAPS; tap++) {
+        float i = (float(tap) + 0.5)/float(LENS_TAPS) - 0.5/float(iLensQuality);
+        color.r += gtextureLod(imageblur, gluv - (1*i*delta), mirror, lod.r).r;
+        color.g += gtextureLod(imageblur, gluv - (2*i*delta), mirror, lod.g).g;
+        color.b += gtextureLod(imageblur, gluv - (4*i*delta), mirror, lod.b).b;
+    }
+    return (color / float(LENS_TAPS));
+}
+
+// This pixel's agluv in the full frame, of which region of interest renders only draw a window
+vec2 ViewAgluv() {
+    if ((iViewScale == 1.0) && (iViewOffset == vec2(0.0)))
+        return agluv;
+    return ((gluv*iViewScale + iViewOffset) / vec2(iViewAspect, 1.0));
+}
+
+vec4 DepthColor(DepthFlow depthflow) {
+    vec4 fragColor = gtexture(image, depthflow.gluv, depthflow.mirror);
 
     if (depthflow.oob) {
         fragColor = vec4(vec3(0.0), 1);
-        return;
+        return fragColor;
     }
 
     /* --------------------------------------- */
@@ -161,31 +431,36 @@ void main() {
     // Inpaint masking
     if (iInpaint && depthflow.steep > iInpaintLimit) {
         fragColor = iInpaintColor;
-        return;
+        return fragColor;
     } else if (iInpaintBlack) {
         fragColor = vec4(0, 0, 0, 1);
-        return;
+        return fragColor;
     }
 
-    // Fixme: Ability to apply lens and blur on multi-pass (post-refactor and metaprograming overhaul)
-
     // Lens distortion (Mutually exclusive with blur)
     if (iLensEnable) {
 
         // Define the base 'velocity' (intensity) of the effect
-        float decay = pow(0.62*length(agluv), (10 - 9*iLensDecay));
-        vec2 delta = (0.5*iLensIntensity) * normalize(agluv) * decay;
+        vec2 view = ViewAgluv();
+        float decay = pow(0.62*length(view), (10 - 9*iLensDecay));
+        vec2 delta = (0.5*iLensIntensity) * normalize(view) * decay;
         vec3 color = vec3(0);
 
-        // Integrate the color along the path, different speeds per channel
-        for (float i=0; i<1; i+=(1.0/iLensQuality)) {
-            color.r += gtexture(image, depthflow.gluv - (1*i*delta), depthflow.mirror).r;
-            color.g += gtexture(image, depthflow.gluv - (2*i*delta), depthflow.mirror).g;
-            color.b += gtexture(image, depthflow.gluv - (4*i*delta), depthflow.mirror).b;
-        }
+        // Optimization: Few mip taps instead of many full resolution ones
+        if (iBlurMip && iLensQuality > LENS_TAPS) {
+            fragColor.rgb = LensMip(depthflow.gluv, depthflow.mirror, delta);
+        } else {
+
+            // Integrate the color along the path, different speeds per channel
+            for (float i=0; i<1; i+=(1.0/iLensQuality)) {
+                color.r += gtexture(image, depthflow.gluv - (1*i*delta), depthflow.mirror).r;
+                color.g += gtexture(image, depthflow.gluv - (2*i*delta), depthflow.mirror).g;
+                color.b += gtexture(image, depthflow.gluv - (4*i*delta), depthflow.mirror).b;
+            }
 
-        // Normalize the color, as it grew with integration
-        fragColor.rgb = (color / iLensQuality);
+            // Normalize the color, as it grew with integration
+            fragColor.rgb = (color / iLensQuality);
+        }
     }
 
     // Depth of Field (Mutually exclusive with lens distortion)
@@ -193,18 +468,24 @@ void main() {
         float intensity = iBlurIntensity * pow(smoothstep(iBlurStart, iBlurEnd, 1.0 - depthflow.value), iBlurExponent);
         vec4 color = fragColor;
 
-        for (float angle=0.0; angle<TAU; angle+=TAU/iBlurDirections) {
-            for (float walk=1.0/iBlurQuality; walk<=1.001; walk+=1.0/iBlurQuality) {
-                vec2 displacement = vec2(cos(angle), sin(angle)) * walk * intensity;
-                color += gtexture(image, depthflow.gluv + displacement, depthflow.mirror);
+        // Optimization: Few mip taps instead of directions x quality full resolution ones
+        if (iBlurMip) {
+            fragColor = DepthBlurMip(depthflow.gluv, depthflow.mirror, intensity);
+        } else {
+            for (float angle=0.0; angle<TAU; angle+=TAU/iBlurDirections) {
+                for (float walk=1.0/iBlurQuality; walk<=1.001; walk+=1.0/iBlurQuality) {
+                    vec2 displacement = vec2(cos(angle), sin(angle)) * walk * intensity;
+                    color += gtexture(image, depthflow.gluv + displacement, depthflow.mirror);
+                }
             }
+            fragColor = color / (iBlurDirections*iBlurQuality);
         }
-        fragColor = color / (iBlurDirections*iBlurQuality);
     }
 
     // Vignette post processing
     if (iVigEnable) {
-        vec2 away = astuv * (1.0 - astuv.yx);
+        vec2 view = gluv2stuv(ViewAgluv());
+        vec2 away = view * (1.0 - view.yx);
         float linear = iVigDecay * (away.x*away.y);
         fragColor.rgb *= clamp(pow(linear, iVigIntensity), 0.0, 1.0);
     }
@@ -239,4 +520,82 @@ void main() {
         luminance     = dot(fragColor.rgb, vec3(0.299, 0.587, 0.114));
         fragColor.rgb = mix(fragColor.rgb, vec3(luminance), iColorsGrayscale);
     }
+
+    return fragColor;
+}
+
+// Rotated grid sub-pixel offsets of the edge anti-aliasing, in pixels
+const vec2 ANTIALIAS_GRID[4] = vec2[4](
+    vec2( 0.125,  0.375), vec2(-0.375,  0.125),
+    vec2(-0.125, -0.375), vec2( 0.375, -0.125)
+);
+
+// Hits jumping across more source pixels than this between neighbours are edges
+#define ANTIALIAS_JUMP 2.0
+
+// Edge anti-aliasing, supersampling only where it matters at a fraction of SSAA's cost. On a
+// continuous surface the hit moves about a pixel per pixel, only the pixels where it jumps
+// (depth edges, out of bounds and inpaint borders) march four more rays and average them
+vec4 DepthAntialias(Camera camera, DepthFlow options, DepthFlow depthflow, vec4 color) {
+    float pixel = (2.0/iResolution.y);
+    vec2 hit = (depthflow.oob ? vec2(0.0) : depthflow.gluv);
+    bool edge = (length(fwidth(hit)) > ANTIALIAS_JUMP*pixel)
+        || (fwidth(float(depthflow.oob)) > 0.0)
+        || (fwidth(float(depthflow.steep > iInpaintLimit)) > 0.0);
+
+    if (!edge)
+        return color;
+
+    for (int i=0; i<4; i++) {
+        DepthFlow jittered = DepthMake(camera, options, depth, pyramid, ANTIALIAS_GRID[i]*pixel);
+        color += DepthColor(jittered);
+    }
+    return (color/5.0);
+}
+
+#if defined(DEPTHFLOW_AUXILIARY)
+// Second color attachment, written in the same draw as the color
+layout(location = 1) out vec4 fragAuxiliary;
+
+// Parallaxed depth, inpaint mask and the image coordinate (stuv) the pixel sampled
+vec4 DepthAuxiliary(DepthFlow depthflow) {
+    vec2 gluv = (depthflow.mirror ? gluv_mirrored_repeat(depthflow.gluv) : depthflow.gluv);
+    vec2 size = vec2(textureSize(image, 0));
+    vec2 stuv = gluv2stuv(gluv * vec2(size.y/size.x, 1.0));
+    bool hole = (depthflow.oob || depthflow.steep > iInpaintLimit);
+    return vec4(depthflow.value, float(hole), stuv);
+}
+#endif
+
+void main() {
+    GetCamera(iCamera);
+    GetDepthFlow(iDepth);
+
+    // Previous frame's hit of this pixel, kept in the alpha channel of the last render
+    if (iWarmStart)
+        iDepth.hint = texelFetch(warmstart, ivec2(gl_FragCoord.xy), 0).a;
+
+#if defined(DEPTHFLOW_INTERSECT)
+    // Reduced resolution pass, only store the intersection for the upsampling
+    DepthFlow depthflow = DepthMake(iCamera, iDepth, depth, pyramid);
+    fragColor = vec4(depthflow.gluv, (depthflow.oob ? -1.0 : depthflow.value), depthflow.steep);
+#else
+  #if defined(DEPTHFLOW_UPSAMPLE)
+    DepthFlow depthflow = DepthUpsample(iDepth, depth, iIntersect);
+  #else
+    DepthFlow depthflow = DepthMake(iCamera, iDepth, depth, pyramid);
+  #endif
+    fragColor = DepthColor(depthflow);
+  #if !defined(DEPTHFLOW_UPSAMPLE)
+    // Only perspective rays take the sub-pixel jitter, others would march the same ray again
+    if (iAntialias && (iCamera.projection == CameraProjectionPerspective))
+        fragColor = DepthAntialias(iCamera, iDepth, depthflow, fragColor);
+  #endif
+  #if defined(DEPTHFLOW_AUXILIARY)
+    fragAuxiliary = DepthAuxiliary(depthflow);
+  #endif
+
+    // The final pass forces an opaque alpha, so it's free to carry the hit for the next frame
+    fragColor.a = depthflow.walk;
+#endif
 }
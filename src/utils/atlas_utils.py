@@ -0,0 +1,32 @@
+import math
+
+import numpy as np
+
+
+def atlas_grid(count, width, height, max_size=16384):
+    """
+    Columns, rows and tile count of an atlas holding up to count width x height frames.
+
+    Tiles are laid out in a near square grid, with fewer tiles when the atlas would exceed
+    max_size texels on a side. Always holds at least one frame.
+    """
+    count = max(1, min(int(count), (max_size // width) * (max_size // height)))
+    columns = min(math.ceil(math.sqrt(count)), max_size // width)
+    rows = math.ceil(count / columns)
+    return columns, rows, count
+
+
+def tile_viewport(index, width, height, columns, rows):
+    """OpenGL viewport (bottom-left origin) of a tile, tiles fill rows from the top left."""
+    column, row = index % columns, index // columns
+    return (column * width, (rows - 1 - row) * height, width, height)
+
+
+def split_atlas(atlas, width, height, columns, count):
+    """Copies of the first count tiles of a top-down [H, W, C] atlas, in tile order."""
+    frames = []
+    for index in range(count):
+        column, row = index % columns, index // columns
+        tile = atlas[row * height:(row + 1) * height, column * width:(column + 1) * width]
+        frames.append(np.ascontiguousarray(tile))
+    return frames
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+
+# Channels of the shader's auxiliary color attachment
+AUXILIARY_CHANNELS = ("depth", "mask", "u", "v")
+
+
+def read_auxiliary(data, width, height, size=None):
+    """
+    Turn a raw float32 RGBA readback of the auxiliary target into a top-down [H, W, 4] frame.
+
+    The target is rendered at the SSAA resolution `size` (width, height), it is area
+    averaged down to the output resolution, so the mask becomes a coverage fraction.
+    """
+    size = size or (width, height)
+    frame = np.flipud(np.frombuffer(data, dtype=np.float32).reshape(size[1], size[0], 4))
+    if tuple(size) != (width, height):
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(frame)
+
+
+def split_auxiliary(frames, index_map=None):
+    """
+    Split auxiliary frames into the node's outputs, repeating frames from the index map.
+
+    Returns the parallaxed depth as an [N, H, W, 3] image, the inpaint mask as [N, H, W]
+    and the image coordinate each pixel sampled as an [N, H, W, 3] STMap (u right, v up,
+    in [0, 1] of the input image, blue unused).
+    """
+    frames = np.stack(list(frames))
+    if index_map is not None:
+        frames = frames[np.asarray(index_map)]
+    depth = np.repeat(frames[..., 0:1], 3, axis=-1)
+    mask = np.clip(frames[..., 1], 0.0, 1.0)
+    uv = np.concatenate([frames[..., 2:4], np.zeros_like(frames[..., 0:1])], axis=-1)
+    return depth, mask, uv
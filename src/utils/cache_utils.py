@@ -0,0 +1,39 @@
+import json
+import os
+from pathlib import Path
+
+
+def cache_directory():
+    """
+    Directory for files the nodes keep between runs (calibration data, caches).
+
+    Defaults to ~/.cache/comfyui-depthflow-nodes, override with DEPTHFLOW_NODES_CACHE.
+    """
+    path = os.environ.get("DEPTHFLOW_NODES_CACHE")
+    if path:
+        path = Path(path)
+    else:
+        path = Path.home() / ".cache" / "comfyui-depthflow-nodes"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def load_json(name, default=None):
+    """Load a JSON file from the cache directory, returning default if missing or corrupt."""
+    try:
+        with open(cache_directory() / name, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(name, data):
+    """Atomically write a JSON file to the cache directory. Failures are not fatal."""
+    path = cache_directory() / name
+    temp = path.with_suffix(path.suffix + ".tmp")
+    try:
+        with open(temp, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+        os.replace(temp, path)
+    except OSError as e:
+        print(f"Warning: Failed to write cache file '{path}': {e}")
@@ -0,0 +1,357 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .post_effects import apply_post_effects
+from .warp_utils import remap_frame
+
+# cv2.remap maps are limited to 32767 columns, points are sampled in rows of this many
+SAMPLE_ROW = 1024
+
+# Probe steps between the samples re-checking a warm start's skipped span, as in the shader
+WARM_START_STRIDE = 4
+
+
+def _triangle_wave(x, period):
+    """The shader's triangle_wave, used for the mirrored repeat of gluv coordinates."""
+    return 2.0 * np.abs(np.mod(2.0 * x / period - 0.5, 2.0) - 1.0) - 1.0
+
+
+def sample(texture, gluv, aspect, mirror=False, repeat=False):
+    """
+    Bilinear reads of a [H, W, C] float32 texture at [N, 2] gluv points, like gtexture.
+
+    `aspect` is the screen's aspect ratio, which the mirrored repeat of gluv tiles by.
+    Returns [N, C] values.
+    """
+    gluv = np.asarray(gluv, dtype=np.float32)
+    if mirror:
+        gluv = np.stack([
+            aspect * _triangle_wave(gluv[:, 0], 4.0 * aspect),
+            _triangle_wave(gluv[:, 1], 4.0),
+        ], axis=-1)
+    height, width = texture.shape[:2]
+    stuv = (gluv * np.array([height / width, 1.0], dtype=np.float32) + 1.0) / 2.0
+
+    count = len(stuv)
+    rows = max(1, -(-count // SAMPLE_ROW))
+    padded = np.zeros((rows * SAMPLE_ROW, 2), dtype=np.float32)
+    padded[:count] = stuv
+    values = remap_frame(texture, padded.reshape(rows, SAMPLE_ROW, 2), repeat)
+    return values.reshape(rows * SAMPLE_ROW, -1)[:count]
+
+
+def screen_gluv(width, height, view_scale=1.0, view_offset=(0.0, 0.0)):
+    """gluv of every pixel center of a top-down width x height frame as [H*W, 2], windowed like DepthMake."""
+    aspect = width / height
+    x = ((np.arange(width, dtype=np.float32) + 0.5) / width * 2.0 - 1.0) * aspect
+    y = 1.0 - (np.arange(height, dtype=np.float32) + 0.5) / height * 2.0
+    gluv = np.stack(np.meshgrid(x, y), axis=-1).reshape(-1, 2)
+    return gluv * view_scale + np.asarray(view_offset, dtype=np.float32)
+
+
+def depth_skip(start, delta, height, invert, levels, size):
+    """
+    The shader's DepthSkip for one ray: the walk up to which it is proven above the surface.
+
+    `levels` is build_depth_pyramid of the depthmap flipped to OpenGL's bottom-up rows, as
+    uploaded, and `size` the depthmap's (width, height). A reference of the shader's loop,
+    one ray at a time.
+    """
+    size = np.asarray(size, dtype=np.float64)
+    scale = np.array([size[1] / size[0], 1.0])
+    t0 = (np.asarray(start[:2]) * scale + 1.0) / 2.0 * size
+    td = (np.asarray(delta[:2]) * scale) * 0.5 * size
+    if not levels:
+        return 0.0
+
+    proven, walk, level = 0.0, 0.0, len(levels) - 1
+    for _ in range(64):
+        if walk > 1.0:
+            break
+        texel = t0 + walk * td
+        if (texel < 0.0).any() or (texel >= size).any():
+            break
+
+        cell = 2.0 ** (level + 1)
+        index = np.floor(texel / cell).astype(int)
+        bounds = levels[level][index[1], index[0]]
+        surfaces = height * (bounds + (1.0 - 2.0 * bounds) * invert)
+        highest = max(surfaces)
+
+        if (1.0 - (start[2] + walk * delta[2])) < highest:
+            if level == 0:
+                break
+            level -= 1
+            continue
+
+        reach = ((1.0 - start[2] - highest) / delta[2]) if delta[2] > 0.0 else 2.0
+        lower = index * cell
+        exits = [2.0, 2.0]
+        for axis in (0, 1):
+            if td[axis] != 0.0:
+                exits[axis] = ((lower[axis] + cell if td[axis] > 0.0 else lower[axis]) - t0[axis]) / td[axis]
+        leave = min(exits)
+
+        if reach <= leave:
+            proven = max(proven, reach)
+            walk = proven
+            if level == 0:
+                break
+            level -= 1
+        else:
+            proven = max(proven, leave)
+            walk = proven + 1e-3 / max(np.hypot(*td), 1.0)
+            level = min(level + 1, len(levels) - 1)
+
+    return min(proven, 1.0)
+
+
+def march(depth, gluv, uniforms, aspect, repeat=False, hint=None, pyramid=None):
+    """
+    The shader's DepthMake over [N, 2] screen gluv points, with the default camera.
+
+    Runs the same forward probe and backward refinement steps as the shader, for all
+    pixels at once, and returns a dict of [N] arrays: the sampled depth `value`, the
+    hit's image `gluv` [N, 2], the `steep` inpaint heuristic, the `oob` mask and the hit's
+    `walk` along the ray. `hint` optionally holds a previous frame's walks to warm start
+    from, re-probing the skipped span like the shader. With the depthmap's `pyramid` (see
+    depth_skip) the empty space is skipped first, ray by ray.
+    """
+    height = uniforms["iDepthHeight"]
+    invert = uniforms["iDepthInvert"]
+    mirror = bool(uniforms["iDepthMirror"])
+    zoom, isometric = uniforms["iDepthZoom"], uniforms["iDepthIsometric"]
+    position = np.asarray(uniforms["iDepthOffset"], dtype=np.float32)
+    rel_focus = uniforms["iDepthFocus"] * height
+    rel_steady = uniforms["iDepthSteady"] * height
+
+    # CameraProject and CameraRay2D onto the z=1 plane
+    origin = np.empty((len(gluv), 3), dtype=np.float32)
+    origin[:, :2] = position + gluv * (zoom * isometric)
+    origin[:, 2] = -uniforms["iDepthDolly"]
+    target = np.empty_like(origin)
+    target[:, :2] = position + gluv * zoom
+    target[:, 2] = 1.0 - rel_focus
+    ray = target - origin
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (1.0 - origin[:, 2]) / ray[:, 2]
+    oob = ~(t >= 0.0)
+    plane = origin[:, :2] + t[:, None] * ray[:, :2]
+
+    origin[:, :2] += np.asarray(uniforms["iDepthOrigin"], dtype=np.float32)
+    intersect = np.empty_like(origin)
+    intersect[:, :2] = np.asarray(uniforms["iDepthCenter"], dtype=np.float32) + plane
+    intersect[:, :2] -= position / (1.0 - rel_steady)
+    intersect[:, 2] = 1.0
+
+    quality = 1.0 / (200 + 1800 * uniforms["iQuality"])
+    probe = 1.0 / (50 + 70 * uniforms["iQuality"])
+    safe = 1.0 - height
+
+    def surface_at(index, walk):
+        point = origin[index] + (intersect[index] - origin[index]) * (safe + (1.0 - safe) * walk)[:, None]
+        value = sample(depth, point[:, :2], aspect, mirror, repeat)[:, 0]
+        surface = height * (value + (1.0 - 2.0 * value) * invert)
+        return point[:, :2], value, (1.0 - point[:, 2]) < surface
+
+    count = len(gluv)
+    walk = np.zeros(count, dtype=np.float32)
+    value = np.zeros(count, dtype=np.float32)
+    hit_gluv = np.zeros((count, 2), dtype=np.float32)
+
+    # Skip the empty space, resuming on the forward probe grid
+    if pyramid is not None:
+        size = (depth.shape[1], depth.shape[0])
+        for index in np.flatnonzero(~oob):
+            start = origin[index] + (intersect[index] - origin[index]) * safe
+            delta = (intersect[index] - origin[index]) * (1.0 - safe)
+            proven = depth_skip(start, delta, height, invert, pyramid, size)
+            walk[index] = probe * np.floor(proven / probe)
+
+    # Warm start: walk to the hint in strides, stopping before any sample inside the surface
+    if hint is not None:
+        begin = probe * np.floor(np.maximum(np.asarray(hint, dtype=np.float32) - 2.0 * probe, 0.0) / probe)
+        active = np.flatnonzero((~oob) & (np.asarray(hint) > 0.0) & (walk < begin))
+        stride = probe
+        while len(active):
+            next_walk = np.minimum(walk[active] + stride, begin[active])
+            stride = probe * WARM_START_STRIDE
+            _, _, inside = surface_at(active, next_walk)
+            active, next_walk = active[~inside], next_walk[~inside]
+            walk[active] = next_walk
+            active = active[walk[active] < begin[active]]
+
+    # Forward: probe steps until the first sample inside the surface, or past the end
+    active = np.flatnonzero(~oob)
+    while len(active):
+        walk[active] += probe
+        hit_gluv[active], value[active], inside = surface_at(active, walk[active])
+        active = active[~inside]
+        active = active[walk[active] <= 1.0]
+
+    # Backward: small steps until outside again, the derivative is taken over the last step
+    derivative = np.zeros(count, dtype=np.float32)
+    active = np.flatnonzero(~oob)
+    for _ in range(1000):
+        if not len(active):
+            break
+        last_value = value[active]
+        walk[active] -= quality
+        hit_gluv[active], value[active], inside = surface_at(active, walk[active])
+        outside = active[~inside]
+        derivative[outside] = (last_value[~inside] - value[outside]) / quality
+        active = active[inside]
+
+    # Normal from finite differences, steepness as in DepthMake
+    valid = np.flatnonzero(~oob)
+    slope = np.stack([
+        sample(depth, hit_gluv[valid] - (quality, 0.0), aspect, mirror, repeat)[:, 0] - value[valid],
+        sample(depth, hit_gluv[valid] - (0.0, quality), aspect, mirror, repeat)[:, 0] - value[valid],
+    ], axis=-1) / quality
+    normal_z = max(height, quality) / np.sqrt(np.sum(slope * slope, axis=-1) + max(height, quality) ** 2)
+    steep = np.zeros(count, dtype=np.float32)
+    steep[valid] = derivative[valid] * np.arccos(np.clip(normal_z, -1.0, 1.0))
+
+    return {"value": value, "gluv": hit_gluv, "steep": steep, "oob": oob, "walk": np.clip(walk, 0.0, 1.0)}
+
+
+# Width of the depth similarity falloff when upsampling intersections, as in the shader
+DEPTH_UPSAMPLE_SIGMA = 0.05
+
+
+def upsample_hits(hits, depth, width, height, aspect, mirror=False, repeat=False):
+    """
+    The shader's DepthUpsample: joint bilateral upsampling of reduced resolution hits.
+
+    `hits` is march's result over screen_gluv of a smaller frame with the same aspect
+    ratio, reshaped by the caller to [h, w] maps. Returns the dict march would, at width x
+    height, from the four nearest reduced hits weighted bilinearly and by how close their
+    depth is to the depth read at the interpolated hit.
+    """
+    small_height, small_width = hits["value"].shape
+    # The reduced intersections texture: gluv, value (negative when out of bounds), steep
+    texels = np.concatenate([
+        hits["gluv"],
+        np.where(hits["oob"], -1.0, hits["value"])[..., None],
+        hits["steep"][..., None],
+    ], axis=-1).astype(np.float32)
+
+    # Top-down texel coordinates of every full resolution pixel center in the reduced map
+    x = (np.arange(width, dtype=np.float32) + 0.5) / width * small_width - 0.5
+    y = (np.arange(height, dtype=np.float32) + 0.5) / height * small_height - 0.5
+    x, y = np.meshgrid(x, y)
+    base_x, base_y = np.floor(x).astype(int), np.floor(y).astype(int)
+    fraction_x, fraction_y = x - base_x, y - base_y
+
+    neighbours, spatial = [], []
+    for offset_y in (0, 1):
+        for offset_x in (0, 1):
+            rows = np.clip(base_y + offset_y, 0, small_height - 1)
+            columns = np.clip(base_x + offset_x, 0, small_width - 1)
+            neighbours.append(texels[rows, columns])
+            spatial.append(
+                (fraction_x if offset_x else 1.0 - fraction_x) * (fraction_y if offset_y else 1.0 - fraction_y)
+            )
+    neighbours, spatial = np.stack(neighbours), np.stack(spatial)
+
+    inside = neighbours[..., 2] >= 0.0
+    outside = np.sum(spatial * ~inside, axis=0)
+    weight = spatial * inside
+    guess = np.sum(weight[..., None] * neighbours[..., :2], axis=0) / np.maximum(np.sum(weight, axis=0), 1e-9)[..., None]
+    guide = sample(depth, guess.reshape(-1, 2), aspect, mirror, repeat)[:, 0].reshape(height, width)
+
+    distance = (neighbours[..., 2] - guide) / DEPTH_UPSAMPLE_SIGMA
+    similarity = spatial * np.exp(-distance * distance) * inside
+    total = np.sum(similarity, axis=0)
+    blended = np.sum(similarity[..., None] * neighbours, axis=0) / np.maximum(total, 1e-9)[..., None]
+
+    # No texel agrees with the guide, take the most similar one as is
+    closeness = np.where(inside, np.abs(distance), np.inf)
+    nearest = np.take_along_axis(neighbours, np.argmin(closeness, axis=0)[None, ..., None], axis=0)[0]
+    result = np.where((total > 1e-4)[..., None], blended, nearest)
+
+    oob = outside > 0.5
+    return {
+        "value": np.where(oob, 0.0, result[..., 2]).reshape(-1),
+        "gluv": result[..., :2].reshape(-1, 2),
+        "steep": np.where(oob, 0.0, result[..., 3]).reshape(-1),
+        "oob": oob.reshape(-1),
+    }
+
+
+def render_frame(
+    image,
+    depth,
+    uniforms,
+    width,
+    height,
+    ssaa=1.0,
+    view_scale=1.0,
+    view_offset=(0.0, 0.0),
+    view_aspect=None,
+    repeat=False,
+):
+    """
+    Render one frame of the parallax on the CPU, as a uint8 [height, width, 3] array.
+
+    `image` is the float32 [H, W, 3] input in [0, 1], `depth` its float32 [h, w] depthmap
+    and `uniforms` a dict of the scene's uniform values for this frame. Covers the ray
+    march, inpaint, depth of field, vignette and colors. DOF is applied in screen space
+    like the effect variants, lens distortion is not available. The view options render
+    a window of a frame with aspect ratio `view_aspect`, see screen_gluv.
+    """
+    render_width, render_height = max(1, round(width * ssaa)), max(1, round(height * ssaa))
+    aspect = render_width / render_height
+    gluv = screen_gluv(render_width, render_height, view_scale, view_offset)
+    hit = march(depth[..., None], gluv, uniforms, aspect, repeat)
+
+    mirror = bool(uniforms["iDepthMirror"])
+    color = sample(image, hit["gluv"], aspect, mirror, repeat)[:, :3]
+    shape = (render_height, render_width)
+    frame = color.reshape(*shape, 3)
+    post = tuple(("float", name, value) for name, value in uniforms.items())
+
+    # The vignette darkens the full frame's borders, not the window's
+    stuv = None
+    if view_aspect is not None:
+        window = gluv.reshape(*shape, 2)
+        stuv = ((window[0, :, 0] / view_aspect + 1.0) / 2.0, (window[:, 0, 1] + 1.0) / 2.0)
+    frame = apply_post_effects(frame, hit["value"].reshape(shape), post, stuv)
+
+    # Inpainted and out of bounds pixels skip the post effects in the shader
+    flat = frame.reshape(-1, 3)
+    inpaint = np.zeros(len(flat), dtype=bool)
+    if uniforms.get("iInpaint"):
+        inpaint = hit["steep"] > uniforms["iInpaintLimit"]
+        flat[inpaint] = np.asarray(uniforms["iInpaintColor"][:3], dtype=np.float32)
+    if uniforms.get("iInpaintBlack"):
+        flat[~inpaint] = 0.0
+    flat[hit["oob"]] = 0.0
+    frame = flat.reshape(*shape, 3)
+
+    if (render_width, render_height) != (width, height):
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    return (np.clip(frame, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def render_frames(images, depths, uniforms, width, height, max_workers=4, view_offsets=None, **options):
+    """
+    Render a batch of frames on a thread pool, returning uint8 [N, height, width, 3].
+
+    `images` and `depths` hold one input per frame, `uniforms` and the optional
+    `view_offsets` one entry per frame, the other options are render_frame's. cv2 releases
+    the GIL, so the frames render in parallel.
+    """
+    output = np.empty((len(uniforms), height, width, 3), dtype=np.uint8)
+
+    def work(index):
+        view_offset = view_offsets[index] if view_offsets else (0.0, 0.0)
+        output[index] = render_frame(
+            images[index], depths[index], uniforms[index], width, height, view_offset=view_offset, **options
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(work, range(len(uniforms))))
+    return output
@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+
+from .quality_metrics import psnr
+
+
+def _reduce(data, op):
+    """Halve a 2D array by combining 2x2 blocks with op, replicating the last row/column if odd."""
+    height, width = data.shape
+    if (height % 2) or (width % 2):
+        data = np.pad(data, ((0, height % 2), (0, width % 2)), mode="edge")
+    blocks = data.reshape(data.shape[0] // 2, 2, data.shape[1] // 2, 2)
+    return op.reduce(op.reduce(blocks, axis=3), axis=1)
+
+
+def _normalize(depth):
+    """First channel of a depthmap as float32, uint8 data is scaled to [0, 1]."""
+    depth = np.asarray(depth)
+    if depth.ndim == 3:
+        depth = depth[..., 0]
+    if depth.dtype == np.uint8:
+        return depth.astype(np.float32) / 255.0
+    return depth.astype(np.float32)
+
+
+def build_depth_pyramid(depth):
+    """
+    Build a conservative (max, min) pyramid of a depthmap.
+
+    Level n is a float32 [h, w, 2] array whose texel (y, x) bounds every bilinear
+    sample of the depthmap taken inside texels [y*2^(n+1), (y+1)*2^(n+1)) of the
+    full resolution map. Bilinear reads blend with the neighbouring texels, so the
+    map is widened by its 3x3 neighbourhood before reducing.
+
+    Accepts uint8 (normalized to [0, 1]) or float data, single or multi channel
+    (the first channel is used, like the shader's `.r`).
+    """
+    depth = _normalize(depth)
+
+    kernel = np.ones((3, 3), np.uint8)
+    high = cv2.dilate(depth, kernel, borderType=cv2.BORDER_REPLICATE)
+    low = cv2.erode(depth, kernel, borderType=cv2.BORDER_REPLICATE)
+
+    levels = []
+    while max(high.shape) > 1:
+        high = _reduce(high, np.maximum)
+        low = _reduce(low, np.minimum)
+        levels.append(np.stack([high, low], axis=-1))
+    return levels
+
+
+def depth_gradient(depth):
+    """
+    Gradient of a depthmap in the shader's gluv units, as a float32 [H, W, 2] array.
+
+    One texel spans 2/H gluv units on both axes (gtexture scales x by the aspect ratio),
+    so central texel differences are scaled by H/2. Rows are differentiated in the order
+    given, pass the map flipped to OpenGL's bottom-up order to match gluv's y axis.
+    """
+    depth = _normalize(depth)
+
+    texels_per_unit = depth.shape[0] / 2.0
+    dy, dx = np.gradient(depth) if min(depth.shape) > 1 else (np.zeros_like(depth),) * 2
+    return (np.stack([dx, dy], axis=-1) * texels_per_unit).astype(np.float32)
+
+
+def pack_depth_pyramid(levels):
+    """
+    Stack pyramid levels vertically into one atlas texture.
+
+    Returns the [H, W, 2] atlas and each level's row offset. Level heights halve
+    (rounding up) from the full resolution map, which the shader relies on to
+    recompute the offsets without extra uniforms.
+    """
+    if not levels:
+        return np.zeros((1, 1, 2), dtype=np.float32), []
+
+    width = levels[0].shape[1]
+    offsets = np.cumsum([0] + [level.shape[0] for level in levels[:-1]]).tolist()
+    atlas = np.zeros((sum(level.shape[0] for level in levels), width, 2), dtype=np.float32)
+    for offset, level in zip(offsets, levels):
+        atlas[offset:offset + level.shape[0], :level.shape[1]] = level
+    return atlas, offsets
+
+
+def downsample_depth(frames, scale):
+    """
+    Resize a batch of [N, H, W, C] depthmaps by scale before they are uploaded.
+
+    Depthmaps are smooth and read through bilinear filtering, so a smaller texture loses
+    little. Area averaging keeps the dtype and the channel axis, at least one texel per side.
+    """
+    frames = np.asarray(frames)
+    if scale >= 1.0:
+        return frames
+    height, width = frames.shape[1:3]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    resized = [cv2.resize(frame, size, interpolation=cv2.INTER_AREA) for frame in frames]
+    return np.stack(resized).reshape((len(frames), size[1], size[0], frames.shape[3]))
+
+
+def depth_scale_psnr(depth, scale):
+    """PSNR in dB of a depthmap downsampled by scale and read back bilinearly at full size."""
+    depth = _normalize(depth)
+    if scale >= 1.0:
+        return float("inf")
+    small = downsample_depth(depth[None, ..., None], scale)[0, ..., 0]
+    restored = cv2.resize(small, depth.shape[::-1], interpolation=cv2.INTER_LINEAR)
+    return psnr(restored, depth)
@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+
+# Taps of the mip-based blur, mirrored by the shader's DOF_RINGS and DOF_TAPS
+DOF_RINGS = 3
+DOF_TAPS = 8
+
+
+def mip_pyramid(image):
+    """
+    Mip chain of a float image like OpenGL's glGenerateMipmap (2x2 box filter).
+
+    Odd sizes replicate their last row/column before halving.
+    """
+    levels = [np.asarray(image, dtype=np.float32)]
+    while max(levels[-1].shape[:2]) > 1:
+        level = levels[-1]
+        height, width = level.shape[:2]
+        if (height % 2) or (width % 2):
+            pad = ((0, height % 2), (0, width % 2)) + ((0, 0),) * (level.ndim - 2)
+            level = np.pad(level, pad, mode="edge")
+        levels.append(cv2.resize(
+            level, (level.shape[1] // 2, level.shape[0] // 2), interpolation=cv2.INTER_AREA
+        ))
+    return levels
+
+
+def sample_bilinear(image, x, y):
+    """Bilinear samples at texel coordinates (texel centers at i + 0.5), clamped to the edge."""
+    return cv2.remap(
+        image, (x - 0.5).astype(np.float32), (y - 0.5).astype(np.float32),
+        interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE,
+    )
+
+
+def sample_trilinear(levels, x, y, lod):
+    """Samples at full resolution texel coordinates blending the two nearest mip levels."""
+    lod = np.clip(lod, 0, len(levels) - 1)
+    lower = np.floor(lod).astype(int)
+    result = np.zeros(x.shape + levels[0].shape[2:], dtype=np.float32)
+    for level in np.unique(np.concatenate([lower.ravel(), np.minimum(lower + 1, len(levels) - 1).ravel()])):
+        weight = np.clip(1.0 - np.abs(lod - level), 0.0, 1.0)
+        if not weight.any():
+            continue
+        scale = 2.0 ** level
+        samples = sample_bilinear(levels[level], x / scale, y / scale)
+        if samples.ndim > weight.ndim:
+            weight = weight[..., None]
+        result += weight * samples
+    return result
+
+
+def brute_force_dof(image, radius, directions, quality):
+    """
+    Reference of the shader's brute force DOF: the center plus `directions` x `quality`
+    samples on rings up to `radius` texels, normalized by directions x quality.
+    """
+    image = np.asarray(image, dtype=np.float32)
+    height, width = image.shape[:2]
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32) + 0.5
+    color = image.copy()
+    for angle in np.arange(directions) * (2 * np.pi / directions):
+        for step in range(1, quality + 1):
+            walk = step / quality
+            color += sample_bilinear(
+                image, x + np.cos(angle) * walk * radius, y + np.sin(angle) * walk * radius
+            )
+    return color / (directions * quality)
+
+
+def mip_dof(image, radius, directions, quality, levels=None):
+    """
+    Reference of the shader's mip-based DOF, approximating `brute_force_dof`.
+
+    The brute force rings are uniform in radius, so DOF_RINGS rings at their midpoints
+    with DOF_TAPS taps each stand in for them, every tap reading a mip level whose
+    footprint covers the gap to its neighbours. The center sample keeps its
+    1/(directions x quality) share, like the brute force normalization.
+    """
+    image = np.asarray(image, dtype=np.float32)
+    levels = levels or mip_pyramid(image)
+    height, width = image.shape[:2]
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32) + 0.5
+    radius = np.broadcast_to(np.asarray(radius, dtype=np.float32), (height, width))
+
+    rings = np.zeros_like(image)
+    for ring in range(DOF_RINGS):
+        distance = radius * (ring + 0.5) / DOF_RINGS
+        spacing = np.maximum(2 * np.pi * distance / DOF_TAPS, radius / DOF_RINGS)
+        lod = np.log2(np.maximum(spacing, 1.0))
+        for tap in range(DOF_TAPS):
+            angle = (tap + 0.5 * (ring % 2)) * (2 * np.pi / DOF_TAPS)
+            rings += sample_trilinear(
+                levels, x + np.cos(angle) * distance, y + np.sin(angle) * distance, lod
+            )
+    rings /= DOF_RINGS * DOF_TAPS
+
+    samples = directions * quality
+    return (image + samples * rings) / samples
@@ -0,0 +1,85 @@
+import moderngl
+import numpy as np
+
+VERTEX_SHADER = """
+#version 330
+in vec2 position;
+out vec2 uv;
+void main() {
+    uv = (position + 1.0) / 2.0;
+    gl_Position = vec4(position, 0.0, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D frame;
+uniform float weight;
+in vec2 uv;
+out vec4 color;
+void main() {
+    color = weight * texture(frame, uv);
+}
+"""
+
+
+class FrameAccumulator:
+    """
+    Weighted sum of several renders of a texture in a float32 framebuffer, on the GPU.
+
+    Renders are added with additive blending, so only the resolved result ever needs
+    to be read back.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.program = context.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        quad = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype=np.float32)
+        self.vbo = context.buffer(quad.tobytes())
+        self.vao = context.vertex_array(self.program, [(self.vbo, "2f", "position")])
+        self.texture = None
+        self.fbo = None
+
+    def reset(self, size):
+        """Clear the sum, reallocating it when the frame size changed"""
+        if (self.texture is None) or (self.texture.size != tuple(size)):
+            self._release_target()
+            self.texture = self.context.texture(tuple(size), 4, dtype="f4")
+            self.fbo = self.context.framebuffer(color_attachments=[self.texture])
+        self.fbo.clear()
+
+    def _draw(self, texture, weight, fbo):
+        texture.use(0)
+        self.program["frame"] = 0
+        self.program["weight"] = weight
+        fbo.use()
+        self.vao.render(moderngl.TRIANGLE_STRIP)
+
+    def add(self, texture, weight):
+        """Add a texture of the same size times weight to the sum"""
+        self.context.enable(moderngl.BLEND)
+        self.context.blend_func = (moderngl.ONE, moderngl.ONE)
+        try:
+            self._draw(texture, weight, self.fbo)
+        finally:
+            self.context.blend_func = moderngl.DEFAULT_BLENDING
+            self.context.disable(moderngl.BLEND)
+
+    def resolve(self, texture):
+        """Overwrite a texture of the same size with the sum"""
+        fbo = self.context.framebuffer(color_attachments=[texture])
+        try:
+            self._draw(self.texture, 1.0, fbo)
+        finally:
+            fbo.release()
+
+    def _release_target(self):
+        for resource in (self.fbo, self.texture):
+            if resource is not None:
+                resource.release()
+        self.texture = self.fbo = None
+
+    def release(self):
+        self._release_target()
+        for resource in (self.vao, self.vbo, self.program):
+            resource.release()
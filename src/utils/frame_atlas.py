@@ -0,0 +1,56 @@
+import moderngl
+import numpy as np
+
+from .atlas_utils import atlas_grid, split_atlas, tile_viewport
+from .frame_accumulator import FRAGMENT_SHADER, VERTEX_SHADER
+
+
+class FrameAtlas:
+    """
+    Collect several small frames into the tiles of one large texture, on the GPU.
+
+    Each frame is copied into its tile by a draw call as soon as it is rendered, and the
+    whole atlas is read back in a single transfer once full, replacing a synchronous
+    readback per frame.
+    """
+
+    def __init__(self, context, width, height, count, components=3, max_size=16384):
+        self.context = context
+        self.size = (width, height)
+        self.columns, self.rows, self.capacity = atlas_grid(count, width, height, max_size)
+        self.components = components
+        self.program = context.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        quad = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype=np.float32)
+        self.vbo = context.buffer(quad.tobytes())
+        self.vao = context.vertex_array(self.program, [(self.vbo, "2f", "position")])
+        self.texture = context.texture((self.columns * width, self.rows * height), components)
+        self.fbo = context.framebuffer(color_attachments=[self.texture])
+        self.count = 0
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def add(self, texture):
+        """Copy a frame of the atlas' tile size into the next free tile"""
+        texture.use(0)
+        self.program["frame"] = 0
+        self.program["weight"] = 1.0
+        self.fbo.use()
+        self.fbo.viewport = tile_viewport(self.count, *self.size, self.columns, self.rows)
+        self.vao.render(moderngl.TRIANGLE_STRIP)
+        self.count += 1
+
+    def read(self):
+        """Read back the collected frames as top-down uint8 [H, W, C] arrays and empty the atlas"""
+        width, height = self.texture.size
+        self.fbo.viewport = (0, 0, width, height)
+        data = self.fbo.read(components=self.components)
+        atlas = np.flipud(np.frombuffer(data, dtype=np.uint8).reshape(height, width, self.components))
+        frames = split_atlas(atlas, *self.size, self.columns, self.count)
+        self.count = 0
+        return frames
+
+    def release(self):
+        for resource in (self.fbo, self.texture, self.vao, self.vbo, self.program):
+            resource.release()
@@ -0,0 +1,247 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class FrameSink:
+    """
+    Receives rendered frames in render order.
+
+    Frames are uint8 numpy arrays of shape [H, W, C]. `close` is called once after
+    the last frame and returns the sink's result; `index_map` (see loop_utils)
+    lists, for every output frame, which rendered frame it repeats.
+    """
+
+    # Whether close() can expand an index map after the fact
+    reusable = True
+
+    # Frames the sink may hold at once, used by the render planner
+    pending_frames = 0
+
+    def write(self, frame):
+        raise NotImplementedError
+
+    def close(self, index_map=None):
+        return None
+
+    def abort(self):
+        """Stop as soon as possible and release resources, discarding the result."""
+        self.close()
+
+
+class ThreadedFileSink(FrameSink):
+    """
+    Writes each frame to its own file from a bounded thread pool.
+
+    At most `max_pending` frames are queued; `write` blocks when the writers fall
+    behind, so memory stays constant while encoding overlaps rendering.
+    """
+
+    extension = None
+
+    def __init__(self, directory, prefix="frame", max_workers=4, max_pending=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_workers = max(1, max_workers)
+        self.pending_frames = max_pending or 2 * self.max_workers
+        self._slots = threading.BoundedSemaphore(self.pending_frames)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="DepthflowSink"
+        )
+        self._futures = []
+        self.paths = []
+
+    def path(self, index):
+        return self.directory / f"{self.prefix}_{index:05d}.{self.extension}"
+
+    def save(self, path, frame):
+        raise NotImplementedError
+
+    def _save(self, path, frame):
+        try:
+            self.save(path, frame)
+        finally:
+            self._slots.release()
+
+    def write(self, frame):
+        self._slots.acquire()
+        path = self.path(len(self.paths))
+        self.paths.append(path)
+        self._futures.append(self._executor.submit(self._save, path, frame))
+
+    def _wait(self):
+        self._executor.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+        self._futures.clear()
+
+    def close(self, index_map=None):
+        self._wait()
+        if index_map is None:
+            return list(self.paths)
+
+        # Repeated frames become copies of the rendered file
+        paths = []
+        for index, source in enumerate(index_map):
+            path = self.path(index)
+            if index != source:
+                shutil.copyfile(self.paths[source], path)
+            paths.append(path)
+        return paths
+
+    def abort(self):
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._futures.clear()
+
+
+class PngSequenceSink(ThreadedFileSink):
+    """PNG image sequence, OpenCV releases the GIL while encoding"""
+
+    extension = "png"
+
+    def __init__(self, directory, compression=3, **kwargs):
+        super().__init__(directory, **kwargs)
+        self.compression = compression
+
+    def save(self, path, frame):
+        if not cv2.imwrite(
+            str(path),
+            cv2.cvtColor(frame, cv2.COLOR_RGB2BGR),
+            [cv2.IMWRITE_PNG_COMPRESSION, self.compression],
+        ):
+            raise RuntimeError(f"Failed to write frame to '{path}'")
+
+
+class ExrSequenceSink(ThreadedFileSink):
+    """Half float OpenEXR sequence, needs OpenCV with OPENCV_IO_ENABLE_OPENEXR=1"""
+
+    extension = "exr"
+
+    def save(self, path, frame):
+        data = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR).astype(np.float32) / 255.0
+        if not cv2.imwrite(
+            str(path), data, [cv2.IMWRITE_EXR_TYPE, cv2.IMWRITE_EXR_TYPE_HALF]
+        ):
+            raise RuntimeError(
+                f"Failed to write EXR frame to '{path}', make sure OpenCV has OpenEXR "
+                "enabled (set OPENCV_IO_ENABLE_OPENEXR=1 before starting ComfyUI)"
+            )
+
+
+class NpySequenceSink(ThreadedFileSink):
+    """Raw uint8 .npy arrays, the fastest to write and load back"""
+
+    extension = "npy"
+
+    def save(self, path, frame):
+        np.save(path, frame)
+
+
+class EncoderPipeSink(FrameSink):
+    """
+    Pipes raw RGB frames into an external encoder (FFmpeg) process.
+
+    Frames are handed to a writer thread through a bounded queue so encoding
+    overlaps rendering. Repeated frames can't be inserted after the fact.
+    """
+
+    reusable = False
+
+    @staticmethod
+    def validate_size(width, height):
+        """Raise a ValueError for frame sizes the yuv420p output can't hold (odd sides)."""
+        if (width % 2) or (height % 2):
+            raise ValueError(
+                f"The ffmpeg sink encodes yuv420p, which needs even frame sides, got {width}x{height}"
+            )
+
+    def __init__(
+        self,
+        path,
+        width,
+        height,
+        fps,
+        channels=3,
+        codec="libx264",
+        crf=18,
+        max_pending=8,
+        executable=None,
+    ):
+        executable = executable or shutil.which("ffmpeg")
+        if executable is None:
+            raise RuntimeError("No FFmpeg executable found on PATH for the encoder sink")
+        self.validate_size(width, height)
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pending_frames = max_pending
+        self.process = subprocess.Popen(
+            [
+                executable, "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "rawvideo",
+                "-pix_fmt", "rgb24" if channels == 3 else "rgba",
+                "-s", f"{width}x{height}",
+                "-r", str(fps),
+                "-i", "-",
+                "-c:v", codec,
+                "-crf", str(crf),
+                "-pix_fmt", "yuv420p",
+                str(self.path),
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._pipe, name="DepthflowEncoder", daemon=True)
+        self._thread.start()
+
+    def _pipe(self):
+        while (frame := self._queue.get()) is not None:
+            if self._error is not None:
+                continue
+            try:
+                self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+            except (BrokenPipeError, OSError) as e:
+                self._error = e
+
+    def write(self, frame):
+        if self._error is not None:
+            raise RuntimeError(f"Encoder process failed: {self._error}")
+        self._queue.put(frame)
+
+    def close(self, index_map=None):
+        self._queue.put(None)
+        self._thread.join()
+        self.process.stdin.close()
+        stderr = self.process.stderr.read().decode(errors="replace")
+        if self.process.wait() != 0 or self._error is not None:
+            raise RuntimeError(f"Encoder process failed: {stderr.strip() or self._error}")
+        return [self.path]
+
+    def abort(self):
+        self._error = self._error or RuntimeError("aborted")
+        self._queue.put(None)
+        self._thread.join()
+        self.process.kill()
+        self.process.wait()
+        if self.path.exists():
+            os.remove(self.path)
+
+
+# Name used on the node -> sink class writing one file per frame
+SEQUENCE_SINKS = {
+    "png": PngSequenceSink,
+    "exr": ExrSequenceSink,
+    "npy": NpySequenceSink,
+}
@@ -0,0 +1,119 @@
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .frame_sinks import FrameSink
+
+# Lossless codecs as (compress, decompress) pairs, all of them release the GIL
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+
+try:
+    import zstandard
+
+    CODECS["zstd"] = (
+        lambda data: zstandard.ZstdCompressor(level=1).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+
+    CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+
+
+def default_codec():
+    """Fastest available codec, optional packages are preferred over zlib."""
+    for name in ("lz4", "zstd", "zlib"):
+        if name in CODECS:
+            return name
+
+
+class CompressedFrameStore(FrameSink):
+    """
+    Keeps rendered frames losslessly compressed in RAM.
+
+    Frames are compressed on a bounded thread pool while rendering continues, and
+    decompressed all at once into the final float array by `close`. `shape` optionally
+    fixes the (height, width, channels) of the frames ahead of the first one.
+    """
+
+    def __init__(self, codec="auto", max_workers=4, max_pending=None, shape=None):
+        self.codec = default_codec() if codec == "auto" else codec
+        if self.codec not in CODECS:
+            raise ValueError(f"Unknown or unavailable frame codec: {codec}")
+        self._compress, self._decompress = CODECS[self.codec]
+        self.max_workers = max(1, max_workers)
+        self.pending_frames = max_pending or 2 * self.max_workers
+        self._slots = threading.BoundedSemaphore(self.pending_frames)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="DepthflowStore"
+        )
+        self._frames = []
+        self.shape = None if shape is None else tuple(shape)
+        self.raw_bytes = 0
+
+    def _compress_frame(self, frame):
+        try:
+            return self._compress(frame.tobytes())
+        finally:
+            self._slots.release()
+
+    def write(self, frame):
+        frame = np.ascontiguousarray(frame)
+        if self.shape is None:
+            self.shape = frame.shape
+        elif frame.shape != self.shape:
+            raise ValueError(f"Frame shape changed from {self.shape} to {frame.shape}")
+        self._slots.acquire()
+        self.raw_bytes += frame.nbytes
+        self._frames.append(self._executor.submit(self._compress_frame, frame))
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def compressed_bytes(self):
+        return sum(len(future.result()) for future in self._frames)
+
+    @property
+    def compression_ratio(self):
+        compressed = self.compressed_bytes
+        return (self.raw_bytes / compressed) if compressed else 0.0
+
+    def frame(self, index):
+        """Decompress a single rendered frame as uint8."""
+        data = self._decompress(self._frames[index].result())
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.shape)
+
+    def _unpack_into(self, output, index, source):
+        np.divide(self.frame(source), 255.0, out=output[index], dtype=np.float32)
+
+    def close(self, index_map=None):
+        """
+        Decompress every output frame in parallel into one float32 [0, 1] array.
+
+        A store closed before its first frame, like a render cancelled right away, gives
+        an empty [0, H, W, C] array.
+        """
+        index_map = list(range(len(self))) if index_map is None else list(index_map)
+        output = np.empty((len(index_map), *(self.shape or (0, 0, 0))), dtype=np.float32)
+        list(self._executor.map(
+            lambda item: self._unpack_into(output, *item), enumerate(index_map)
+        ))
+        self.release()
+        return output
+
+    def release(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._frames.clear()
+
+    def abort(self):
+        self.release()
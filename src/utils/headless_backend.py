@@ -0,0 +1,189 @@
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+
+from .cache_utils import load_json, save_json
+
+BACKEND_FILE = "headless_backend.json"
+
+# Headless OpenGL backends the probe tries, with the environment each one needs and the
+# renderer name it must report, if any
+#  - egl: EGL context on the GPU driver, shaderflow's default on Linux
+#  - x11: GLX context, needs a display
+#  - llvmpipe: Mesa's software rasterizer through EGL, on all cores. Under glvnd the EGL
+#    vendor library can still pick the GPU driver, which ignores LIBGL_ALWAYS_SOFTWARE
+HEADLESS_BACKENDS = {
+    "egl": {"moderngl": "egl", "environment": {"WINDOW_EGL": "1"}},
+    "x11": {"moderngl": None, "environment": {"WINDOW_EGL": "0"}},
+    "llvmpipe": {
+        "moderngl": "egl",
+        "environment": {
+            "WINDOW_EGL": "1",
+            "LIBGL_ALWAYS_SOFTWARE": "1",
+            "LP_NUM_THREADS": str(os.cpu_count() or 1),
+        },
+        "renderer": "llvmpipe",
+    },
+}
+
+# Size and work of the probe's calibration render, about a 540p Depthflow frame
+PROBE_WIDTH, PROBE_HEIGHT = 960, 540
+PROBE_STEPS = 96
+PROBE_SECONDS = 0.5
+PROBE_TIMEOUT = 30
+
+PROBE_SCRIPT = """
+import json, sys, time
+import moderngl
+import numpy as np
+
+backend, width, height, steps, seconds = json.loads(sys.argv[1])
+ctx = moderngl.create_context(standalone=True, **({"backend": backend} if backend else {}))
+program = ctx.program(
+    vertex_shader='''#version 330
+    in vec2 position; out vec2 uv;
+    void main() { uv = position * 0.5 + 0.5; gl_Position = vec4(position, 0.0, 1.0); }''',
+    fragment_shader='''#version 330
+    uniform sampler2D image; uniform float time; in vec2 uv; out vec4 color;
+    void main() {
+        vec4 total = vec4(0.0);
+        for (int i = 0; i < %d; i++) {
+            total += texture(image, uv + vec2(float(i) / %d.0, time) * 0.01);
+        }
+        color = total / %d.0;
+    }''' % (steps, steps, steps),
+)
+quad = ctx.buffer(np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype=np.float32).tobytes())
+vao = ctx.vertex_array(program, [(quad, "2f", "position")])
+image = ctx.texture((1024, 1024), 3, np.random.default_rng(0).integers(0, 256, (1024, 1024, 3), dtype=np.uint8).tobytes())
+image.use(0)
+fbo = ctx.simple_framebuffer((width, height), components=3)
+fbo.use()
+
+def frame(index):
+    program["time"] = index / 60.0
+    vao.render(moderngl.TRIANGLE_STRIP)
+    return fbo.read(components=3)
+
+frame(0)
+frames, started = 0, time.perf_counter()
+while (time.perf_counter() - started) < seconds:
+    frames += 1
+    frame(frames)
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "renderer": ctx.info.get("GL_RENDERER", ""),
+    "version": ctx.info.get("GL_VERSION", ""),
+    "max_texture_size": ctx.info.get("GL_MAX_TEXTURE_SIZE", 0),
+    "max_samples": ctx.info.get("GL_MAX_SAMPLES", 0),
+    "frames_per_second": frames / elapsed,
+}))
+"""
+
+
+def probe_backend(name, timeout=PROBE_TIMEOUT):
+    """
+    Time the calibration render on one headless backend, in a separate process.
+
+    A fresh process gets the backend's environment before any driver loads, and a broken
+    driver can't take ComfyUI down with it. Returns the context's capabilities and
+    frames_per_second, or None when the backend doesn't work here.
+    """
+    backend = HEADLESS_BACKENDS[name]
+    environment = {**os.environ, **backend["environment"]}
+    arguments = json.dumps([backend["moderngl"], PROBE_WIDTH, PROBE_HEIGHT, PROBE_STEPS, PROBE_SECONDS])
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE_SCRIPT, arguments],
+            env=environment,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return None
+    report["frames_per_second"] = round(report["frames_per_second"], 2)
+    return report
+
+
+def machine_key():
+    """What the cached probe results depend on: the host, the Python install and whether a display exists."""
+    return f"{platform.node()}|{sys.executable}|{'display' if os.environ.get('DISPLAY') else 'none'}"
+
+
+def fastest_backend(results):
+    """Name of the working backend with the highest frame rate, None if none works."""
+    working = {name: report for name, report in results.items() if report}
+    if not working:
+        return None
+    return max(working, key=lambda name: working[name]["frames_per_second"])
+
+
+def expected_renderer(name, report):
+    """The probe's report, or None when the backend rendered on another renderer than it names."""
+    renderer = HEADLESS_BACKENDS[name].get("renderer")
+    if report and renderer and (renderer not in report.get("renderer", "").lower()):
+        return None
+    return report
+
+
+_probe_lock = threading.Lock()
+
+
+def select_headless_backend(force="auto", probe=probe_backend):
+    """
+    Pick the headless backend for the OpenGL scenes, probing every backend on first use.
+
+    Probing runs a render of up to PROBE_TIMEOUT seconds per backend, so the first OpenGL
+    render on a machine waits for it, concurrent calls wait for one probe. The probe results are cached per machine in the
+    cache directory, delete the file to probe again. `force` picks a backend by name instead
+    of the fastest one. Returns the name, None when no backend worked (shaderflow's default
+    is kept), and the chosen backend's report.
+    """
+    with _probe_lock:
+        cache = load_json(BACKEND_FILE, default={})
+        key = machine_key()
+        if cache.get("machine") != key:
+            results = {name: expected_renderer(name, probe(name)) for name in HEADLESS_BACKENDS}
+            cache = {"machine": key, "results": results, "fastest": fastest_backend(results)}
+            save_json(BACKEND_FILE, cache)
+
+    if force == "auto":
+        name = cache["fastest"]
+    elif force in HEADLESS_BACKENDS:
+        name = force
+    else:
+        raise ValueError(f"Unknown headless backend '{force}', options are {['auto', *HEADLESS_BACKENDS]}")
+    return name, (cache["results"].get(name) if name else None)
+
+
+@contextlib.contextmanager
+def headless_environment(name):
+    """
+    Set the environment shaderflow and the drivers read while creating a headless context.
+
+    Create the scene inside the block, the variables are restored when it exits so other
+    OpenGL users in the process aren't affected. Drivers read some of them only once per
+    process, so switching between EGL drivers takes a restart to apply. None changes nothing.
+    """
+    variables = HEADLESS_BACKENDS[name]["environment"] if name else {}
+    replaced = {variable: os.environ.get(variable) for variable in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for variable, value in replaced.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def flatten_values(data):
+    """
+    Flatten a nested structure of dicts, lists and scalars into a tuple of floats.
+
+    Used to turn a dumped scene state into a comparable per-frame signature.
+    Non-numeric leaves (strings, None) are skipped.
+    """
+    values = []
+
+    def walk(item):
+        if isinstance(item, dict):
+            for key in sorted(item):
+                walk(item[key])
+        elif isinstance(item, (list, tuple)):
+            for part in item:
+                walk(part)
+        elif isinstance(item, (bool, int, float, np.integer, np.floating)):
+            values.append(float(item))
+
+    walk(data)
+    return tuple(values)
+
+
+def frame_reuse_map(signatures, tolerance=1e-6):
+    """
+    Map every frame to the earliest frame with an equivalent signature.
+
+    Frames whose signatures land in the same tolerance bin are considered identical,
+    so only the frames up to the highest mapped index need to be rendered. A missed
+    match (e.g. values straddling a bin edge) only costs an extra rendered frame.
+
+    Returns a list where index_map[i] <= i is the frame to reuse for frame i.
+    """
+    if len(signatures) == 0:
+        return []
+
+    signatures = np.asarray(signatures, dtype=np.float64)
+    if signatures.ndim == 1:
+        signatures = signatures[:, None]
+
+    keys = np.round(signatures / tolerance).astype(np.int64)
+    first_seen = {}
+    index_map = []
+    for index, key in enumerate(map(bytes, keys)):
+        index_map.append(first_seen.setdefault(key, index))
+    return index_map
+
+
+def render_count(index_map):
+    """Number of leading frames that must be rendered to fill the whole index map."""
+    if not index_map:
+        return 0
+    return max(index_map) + 1
+
+
+def describe_reuse(index_map):
+    """
+    Classify the repetition found in an index map.
+
+    Returns one of "periodic", "ping-pong", "partial" or "none".
+    """
+    count = render_count(index_map)
+    total = len(index_map)
+    if count >= total:
+        return "none"
+    if all(index_map[i] == i % count for i in range(total)):
+        return "periodic"
+    if all(index_map[i] == min(i, total - 1 - i) for i in range(total)):
+        return "ping-pong"
+    return "partial"
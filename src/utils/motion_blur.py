@@ -0,0 +1,10 @@
+def subframe_offsets(samples, shutter):
+    """
+    Time offsets of the motion blur sub-frames, as fractions of the frame interval.
+
+    The shutter opens at the frame's own time and stays open for `shutter` of the
+    interval, sampled evenly. A single sample (or a closed shutter) is the frame itself.
+    """
+    samples = max(1, int(samples))
+    shutter = min(max(float(shutter), 0.0), 1.0)
+    return [shutter * index / samples for index in range(samples)]
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .dof_utils import mip_dof
+
+
+def _smoothstep(edge0, edge1, x):
+    """GLSL's smoothstep, a step function at edge0 when both edges are equal."""
+    if edge0 == edge1:
+        return (x >= edge0).astype(np.float32)
+    t = np.clip((x - edge0) / (edge1 - edge0), 0.0, 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+
+def blur_frame(frame, depth, uniforms):
+    """Depth of field over a rendered frame, blurring by the parallaxed depth like DepthBlurMip."""
+    intensity = uniforms["iBlurIntensity"] * np.power(
+        _smoothstep(uniforms["iBlurStart"], uniforms["iBlurEnd"], 1.0 - depth),
+        uniforms["iBlurExponent"],
+    )
+    # Displacements are in gluv units, one unit spans half the frame height
+    radius = intensity * (0.5 * frame.shape[0])
+    return mip_dof(frame, radius, uniforms["iBlurDirections"], uniforms["iBlurQuality"])
+
+
+def vignette_frame(frame, uniforms, stuv=None):
+    """
+    Darken the frame's borders like the shader's vignette.
+
+    `stuv` optionally gives the (columns, rows) coordinates in [0, 1] of a window's pixels
+    in the full frame, whose borders are darkened instead of the window's.
+    """
+    height, width = frame.shape[:2]
+    if stuv is None:
+        x = (np.arange(width, dtype=np.float32) + 0.5) / width
+        y = (np.arange(height, dtype=np.float32) + 0.5) / height
+    else:
+        x, y = (np.asarray(axis, dtype=np.float32) for axis in stuv)
+    linear = uniforms["iVigDecay"] * np.outer(y * (1.0 - y), x * (1.0 - x))
+    return frame * np.clip(np.power(linear, uniforms["iVigIntensity"]), 0.0, 1.0)[..., None]
+
+
+def color_frame(frame, uniforms):
+    """The shader's color adjustments, each skipped at its neutral value."""
+    weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    if uniforms["iColorsSaturation"] != 1.0:
+        hsv = cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_RGB2HSV)
+        hsv[..., 1] = np.clip(hsv[..., 1] * uniforms["iColorsSaturation"], 0.0, 1.0)
+        frame = cv2.cvtColor(hsv, cv2.COLOR_HSV2RGB)
+    if uniforms["iColorsContrast"] != 1.0:
+        frame = np.clip((frame - 0.5) * uniforms["iColorsContrast"] + 0.5, 0.0, 1.0)
+    if uniforms["iColorsBrightness"] != 1.0:
+        frame = np.clip(frame * uniforms["iColorsBrightness"], 0.0, 1.0)
+    if uniforms["iColorsGamma"] != 1.0:
+        frame = np.power(np.maximum(frame, 0.0), 1.0 / uniforms["iColorsGamma"])
+    if uniforms["iColorsSepia"] != 0.0:
+        luminance = (frame @ weights)[..., None]
+        sepia = luminance * np.array([1.2, 1.0, 0.8], dtype=np.float32)
+        frame = frame + (sepia - frame) * uniforms["iColorsSepia"]
+    if uniforms["iColorsGrayscale"] != 0.0:
+        luminance = (frame @ weights)[..., None]
+        frame = frame + (luminance - frame) * uniforms["iColorsGrayscale"]
+    return frame
+
+
+def apply_post_effects(frame, depth, uniforms, stuv=None):
+    """
+    Apply the post effects of a set of effect uniforms to a frame rendered without them.
+
+    `frame` is a float32 [H, W, 3] image in [0, 1], `depth` the parallaxed depth of each
+    pixel as [H, W], and `uniforms` (type, name, value) tuples like the scene's effect
+    uniforms. The blur works in screen space over the rendered frame rather than the
+    source image, so it is softer than the shader's around depth edges. `stuv` places
+    a window in the full frame for the vignette, see vignette_frame.
+    """
+    uniforms = {name: value for _, name, value in uniforms}
+    frame = np.asarray(frame, dtype=np.float32)
+    if uniforms.get("iBlurEnable"):
+        frame = blur_frame(frame, np.asarray(depth, dtype=np.float32), uniforms)
+    if uniforms.get("iVigEnable"):
+        frame = vignette_frame(frame, uniforms, stuv)
+    if "iColorsSaturation" in uniforms:
+        frame = color_frame(frame, uniforms)
+    return frame.astype(np.float32)
+
+
+def apply_variant(frames, depths, uniforms, max_workers=4):
+    """
+    Apply per-frame effect uniforms to a batch of frames rendered without post effects.
+
+    Frames are processed on a thread pool into a new float32 [N, H, W, 3] array, the
+    base frames are left untouched so every variant starts from the same render.
+    """
+    output = np.empty(np.shape(frames), dtype=np.float32)
+
+    def work(index):
+        output[index] = apply_post_effects(frames[index], depths[index], uniforms[index])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(work, range(len(frames))))
+    return output
@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+
+def _as_float(frame):
+    """Frames as float32 in [0, 1], uint8 frames are rescaled."""
+    frame = np.asarray(frame)
+    if frame.dtype == np.uint8:
+        return frame.astype(np.float32) / 255.0
+    return frame.astype(np.float32)
+
+
+def _gray(frame):
+    return frame @ np.array([0.299, 0.587, 0.114], dtype=np.float32) if frame.ndim == 3 else frame
+
+
+def psnr(frame, reference, mask=None):
+    """Peak signal to noise ratio in dB over the (masked) pixels, inf when they are equal."""
+    error = np.square(_as_float(frame) - _as_float(reference))
+    if error.ndim == 3:
+        error = error.mean(axis=2)
+    if mask is not None:
+        error = error[np.asarray(mask, dtype=bool)]
+    mse = float(error.mean()) if error.size else 0.0
+    return float("inf") if mse == 0.0 else float(10.0 * np.log10(1.0 / mse))
+
+
+def ssim_map(frame, reference):
+    """Per-pixel structural similarity of the luminance, with the usual 11x11 gaussian window."""
+    a, b = _gray(_as_float(frame)), _gray(_as_float(reference))
+    c1, c2 = 0.01 ** 2, 0.03 ** 2
+
+    def blur(x):
+        return cv2.GaussianBlur(x, (11, 11), 1.5)
+
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a * mu_a
+    var_b = blur(b * b) - mu_b * mu_b
+    covariance = blur(a * b) - mu_a * mu_b
+    return ((2 * mu_a * mu_b + c1) * (2 * covariance + c2)) / (
+        (mu_a * mu_a + mu_b * mu_b + c1) * (var_a + var_b + c2)
+    )
+
+
+def ssim(frame, reference, mask=None):
+    """Mean structural similarity over the (masked) pixels."""
+    values = ssim_map(frame, reference)
+    if mask is not None:
+        values = values[np.asarray(mask, dtype=bool)]
+    return float(values.mean()) if values.size else 1.0
+
+
+def edge_mask(reference, threshold=0.1, dilate=1):
+    """Pixels next to a luminance step larger than threshold, where aliasing shows."""
+    gray = _gray(_as_float(reference))
+    steps = np.zeros(gray.shape, dtype=bool)
+    steps[:, 1:] |= np.abs(np.diff(gray, axis=1)) > threshold
+    steps[1:, :] |= np.abs(np.diff(gray, axis=0)) > threshold
+    if dilate:
+        kernel = np.ones((2 * dilate + 1, 2 * dilate + 1), dtype=np.uint8)
+        steps = cv2.dilate(steps.astype(np.uint8), kernel).astype(bool)
+    return steps
+
+
+def ssaa_equivalence(frame, reference, baseline=None, threshold=0.1):
+    """
+    How close a frame gets to a supersampled reference of the same view, mostly on edges.
+
+    `reference` is the frame rendered with SSAA (downsampled to the same size) and
+    `baseline` optionally the same frame without any anti-aliasing. Returns PSNR and SSIM
+    over the whole frame and over the edge pixels, and with a baseline the fraction of the
+    baseline's edge error that was removed (1.0 matches SSAA, 0.0 is no better than none).
+    """
+    mask = edge_mask(reference, threshold)
+    report = {
+        "psnr": psnr(frame, reference),
+        "ssim": ssim(frame, reference),
+        "edge_psnr": psnr(frame, reference, mask),
+        "edge_ssim": ssim(frame, reference, mask),
+        "edge_fraction": float(mask.mean()),
+    }
+    if baseline is not None:
+        def edge_error(x):
+            error = np.square(_as_float(x) - _as_float(reference))
+            error = error.mean(axis=2) if error.ndim == 3 else error
+            return float(error[mask].mean()) if mask.any() else 0.0
+
+        before = edge_error(baseline)
+        report["edge_error_removed"] = 1.0 if before == 0.0 else float(1.0 - edge_error(frame) / before)
+    return report
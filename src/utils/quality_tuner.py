@@ -0,0 +1,85 @@
+import time
+
+from .quality_metrics import psnr, ssaa_equivalence, ssim
+
+# Settings the tuner searches, quality on the node's 1-100 scale
+QUALITY_STEPS = (10, 25, 50, 75, 100)
+SSAA_STEPS = (1.0, 1.5, 2.0)
+
+# Setting the candidates are compared against
+REFERENCE_SETTINGS = (100, 2.0)
+
+
+def march_cost(quality, ssaa):
+    """
+    Relative cost of a render setting: ray march steps per pixel times the pixels.
+
+    At most 50-120 forward probe steps, then about one probe step of 200-2000 times
+    smaller backward steps, both growing with quality. Pixels grow with the square of ssaa.
+    """
+    quality = quality / 100
+    probes = 50 + 70 * quality
+    return ssaa * ssaa * (probes + (200 + 1800 * quality) / probes)
+
+
+def candidate_settings(qualities=QUALITY_STEPS, ssaas=SSAA_STEPS, reference=REFERENCE_SETTINGS):
+    """Every (quality, ssaa) pair cheaper than the reference, from the cheapest."""
+    candidates = [
+        (quality, ssaa) for quality in qualities for ssaa in ssaas
+        if march_cost(quality, ssaa) < march_cost(*reference)
+    ]
+    return sorted(candidates, key=lambda settings: march_cost(*settings))
+
+
+def representative_frames(total, count=3):
+    """Indices of count frames spread over a clip of total frames, at the middle of equal parts."""
+    count = max(1, min(count, total))
+    return sorted({int((part + 0.5) * total / count) for part in range(count)})
+
+
+def tune_quality(render, min_psnr=40.0, min_ssim=0.0, reference=REFERENCE_SETTINGS, candidates=None):
+    """
+    Find the cheapest quality and ssaa whose frames stay within an error tolerance.
+
+    `render(quality, ssaa)` renders the same few frames of a job at a setting. The
+    reference setting is rendered first, then candidates from the cheapest by march_cost,
+    until one has every frame at least min_psnr dB and min_ssim from the reference. Returns
+    the chosen setting with its worst frame's error, also over the reference's edges where
+    aliasing shows, its measured seconds per frame and the reference's time. The reference is
+    chosen when nothing cheaper passes.
+    """
+    def timed(quality, ssaa):
+        started = time.perf_counter()
+        frames = render(quality, ssaa)
+        return frames, (time.perf_counter() - started) / len(frames)
+
+    reference_frames, reference_seconds = timed(*reference)
+    result = {
+        "quality": reference[0],
+        "ssaa": reference[1],
+        "psnr": float("inf"),
+        "ssim": 1.0,
+        "edge_psnr": float("inf"),
+        "seconds_per_frame": round(reference_seconds, 4),
+        "reference_seconds_per_frame": round(reference_seconds, 4),
+        "evaluated": 0,
+    }
+
+    for quality, ssaa in (candidate_settings(reference=reference) if candidates is None else candidates):
+        frames, seconds = timed(quality, ssaa)
+        result["evaluated"] += 1
+        worst_psnr = min(psnr(frame, target) for frame, target in zip(frames, reference_frames))
+        worst_ssim = min(ssim(frame, target) for frame, target in zip(frames, reference_frames))
+        if (worst_psnr >= min_psnr) and (worst_ssim >= min_ssim):
+            result.update(
+                quality=quality,
+                ssaa=ssaa,
+                psnr=round(worst_psnr, 2),
+                ssim=round(worst_ssim, 4),
+                edge_psnr=round(min(
+                    ssaa_equivalence(frame, target)["edge_psnr"] for frame, target in zip(frames, reference_frames)
+                ), 2),
+                seconds_per_frame=round(seconds, 4),
+            )
+            break
+    return result
@@ -0,0 +1,212 @@
+import os
+
+from .cache_utils import load_json, save_json
+
+THROUGHPUT_FILE = "render_throughput.json"
+
+# In-memory output strategies, from fastest to most memory efficient
+#  - stack: accumulate uint8 frames, stack them, then convert to float
+#  - stream: write each frame straight into a preallocated float output
+# Frames sent to disk or an encoder use the "sink" strategy instead
+AUTO_STRATEGIES = ["stack", "stream"]
+
+# Opt-in strategies, never picked by "auto"
+#  - compressed: keep frames losslessly compressed while rendering, decompress once
+#    at the end. Holds the least memory during the render, but the float output
+#    still dominates the peak, so "stream" always has the lower peak estimate
+STRATEGIES = AUTO_STRATEGIES + ["compressed"]
+
+# Assumed compression ratio when planning before any frame was rendered
+DEFAULT_COMPRESSION_RATIO = 2.0
+
+GIB = 1024 ** 3
+
+
+def available_memory():
+    """
+    Available physical memory in bytes, or None when it can't be determined.
+
+    Reads MemAvailable, which counts the reclaimable page cache, where the kernel
+    provides it. Free pages alone are a small fraction of that on a long running host.
+    """
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_stages(
+    strategy,
+    width,
+    height,
+    rendered_frames,
+    output_frames,
+    input_frames=1,
+    depth_frames=1,
+    channels=3,
+    pending_frames=0,
+    compression_ratio=DEFAULT_COMPRESSION_RATIO,
+    input_size=None,
+    depth_size=None,
+    cameras=0,
+    extra_frame_bytes=0,
+):
+    """
+    Estimate the host memory held at each stage of a render, in bytes.
+
+    Every stage includes the uint8 input and depth frames, which stay resident
+    for the whole render, sized by `input_size` and `depth_size` (width, height),
+    the output size when not given. The "sink" strategy only holds `pending_frames` queued
+    frames plus the one being read back, the "compressed" strategy additionally
+    keeps every rendered frame at `compression_ratio` times smaller. Each of the
+    `cameras` extra cameras holds the same output frames again in its own sink, and
+    `extra_frame_bytes` per output frame are held by other outputs (auxiliary frames,
+    effect variants, proxy) at every stage.
+    """
+    frame = width * height * channels
+    input_width, input_height = input_size or (width, height)
+    depth_width, depth_height = depth_size or (input_width, input_height)
+    inputs = (
+        input_frames * input_width * input_height + depth_frames * depth_width * depth_height
+    ) * channels
+
+    if strategy == "stack":
+        stages = {
+            "render": rendered_frames * frame,
+            "stack": 2 * rendered_frames * frame,
+            "float": output_frames * frame + 4 * output_frames * frame,
+        }
+        if output_frames != rendered_frames:
+            stages["reuse"] = rendered_frames * frame + output_frames * frame
+    elif strategy == "stream":
+        stages = {
+            "render": 4 * output_frames * frame + frame,
+        }
+    elif strategy == "compressed":
+        compressed = int(rendered_frames * frame / max(compression_ratio, 1.0))
+        stages = {
+            "render": compressed + (pending_frames + 1) * frame,
+            "decompress": compressed + 4 * output_frames * frame,
+        }
+    elif strategy == "sink":
+        stages = {
+            "render": (pending_frames + 1) * frame,
+        }
+    else:
+        raise ValueError(f"Unknown output strategy: {strategy}")
+
+    extra = output_frames * extra_frame_bytes
+    return {name: inputs + (1 + cameras) * size + extra for name, size in stages.items()}
+
+
+def estimate_seconds(width, height, ssaa, rendered_frames):
+    """Estimated render time from the locally calibrated throughput, or None if uncalibrated."""
+    calibration = load_json(THROUGHPUT_FILE, default={})
+    pixels_per_second = calibration.get("pixels_per_second")
+    if not pixels_per_second:
+        return None
+    pixels = width * height * max(ssaa, 1.0) ** 2
+    return rendered_frames * pixels / pixels_per_second
+
+
+def record_throughput(width, height, ssaa, rendered_frames, seconds, weight=0.3):
+    """Fold a measured render into the calibrated throughput (exponential moving average)."""
+    if seconds <= 0 or rendered_frames <= 0:
+        return
+    measured = rendered_frames * width * height * max(ssaa, 1.0) ** 2 / seconds
+    calibration = load_json(THROUGHPUT_FILE, default={})
+    previous = calibration.get("pixels_per_second")
+    if previous:
+        measured = (1 - weight) * previous + weight * measured
+    save_json(THROUGHPUT_FILE, {
+        "pixels_per_second": measured,
+        "samples": calibration.get("samples", 0) + 1,
+    })
+
+
+def plan_render(
+    width,
+    height,
+    rendered_frames,
+    output_frames,
+    input_frames=1,
+    depth_frames=1,
+    ssaa=1.0,
+    budget_gb=0.0,
+    strategy="auto",
+    pending_frames=None,
+    compression_ratio=DEFAULT_COMPRESSION_RATIO,
+    input_size=None,
+    depth_size=None,
+    cameras=0,
+    extra_frame_bytes=0,
+):
+    """
+    Pick an output strategy whose estimated peak memory fits the budget.
+
+    With strategy "auto" the fastest strategy that fits is chosen. When a forced
+    strategy or none of them fits, a ValueError describes the estimate. A budget of
+    zero compares against the currently available physical memory and only warns
+    instead, keeping the lowest peak strategy. Passing `pending_frames` plans for a
+    disk/encoder sink instead of an in-memory output, `cameras` counts the extra
+    cameras rendered alongside the main one and `extra_frame_bytes` the memory other
+    outputs hold per output frame.
+    """
+    if budget_gb > 0:
+        budget = int(budget_gb * GIB)
+    else:
+        budget = available_memory()
+
+    if pending_frames is not None:
+        candidates = ["sink"]
+    elif strategy == "auto":
+        candidates = AUTO_STRATEGIES
+    else:
+        candidates = [strategy]
+
+    plans = []
+    for name in candidates:
+        stages = estimate_stages(
+            name, width, height, rendered_frames, output_frames,
+            input_frames=input_frames, depth_frames=depth_frames,
+            pending_frames=pending_frames or 0,
+            compression_ratio=compression_ratio,
+            input_size=input_size,
+            depth_size=depth_size,
+            cameras=cameras,
+            extra_frame_bytes=extra_frame_bytes,
+        )
+        plans.append({
+            "strategy": name,
+            "width": width,
+            "height": height,
+            "rendered_frames": rendered_frames,
+            "output_frames": output_frames,
+            "stages_gb": {k: round(v / GIB, 3) for k, v in stages.items()},
+            "peak_gb": round(max(stages.values()) / GIB, 3),
+            "budget_gb": None if budget is None else round(budget / GIB, 3),
+            "estimated_seconds": estimate_seconds(width, height, ssaa, (1 + cameras) * rendered_frames),
+        })
+
+    for plan in plans:
+        if budget is None or plan["peak_gb"] * GIB <= budget:
+            return plan
+
+    best = min(plans, key=lambda plan: plan["peak_gb"])
+    message = (
+        f"Depthflow render needs about {best['peak_gb']:.2f} GB of host memory "
+        f"({best['strategy']} strategy, {output_frames} frames at {width}x{height} "
+        f"for {1 + cameras} camera{'s' if cameras else ''}), "
+        f"exceeding the {'budget' if budget_gb > 0 else 'available memory'} of {budget / GIB:.2f} GB."
+    )
+    if budget_gb > 0:
+        raise ValueError(f"{message} Reduce the resolution or number of frames, or raise memory_budget_gb.")
+    print(f"Warning: {message} Set memory_budget_gb to refuse such renders.")
+    return best
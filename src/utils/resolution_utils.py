@@ -0,0 +1,74 @@
+import json
+
+FIT_MODES = ["fit", "fill"]
+
+
+def output_resolution(width, height, output_width=0, output_height=0, scale=1.0, fit="fit"):
+    """
+    Render size of a width x height input for the requested output size, and the zoom to apply.
+
+    Zero output sides follow the input, a single given side keeps the input's aspect ratio,
+    and scale multiplies the result. With both sides given, "fit" shrinks the frame to the
+    input's aspect ratio inside that box, while "fill" renders the box exactly and covers it
+    with the input, cropping what overflows. Narrower boxes crop the sides for free, wider
+    ones need the returned zoom (below 1.0 zooms in) to crop the top and bottom.
+    """
+    aspect = width / height
+    if output_width and output_height:
+        box = (output_width, output_height)
+    elif output_width:
+        box = (output_width, output_width / aspect)
+    elif output_height:
+        box = (output_height * aspect, output_height)
+    else:
+        box = (width, height)
+    box = (box[0] * scale, box[1] * scale)
+
+    if fit == "fill":
+        size = box
+    else:
+        factor = min(box[0] / width, box[1] / height)
+        size = (width * factor, height * factor)
+
+    render_width, render_height = (max(1, round(side)) for side in size)
+    zoom = min(1.0, aspect * render_height / render_width) if fit == "fill" else 1.0
+    return render_width, render_height, zoom
+
+
+def proxy_resolution(width, height, level):
+    """Size of a frame's mipmap level, each level halves both sides (rounding down)."""
+    return max(1, width >> level), max(1, height >> level)
+
+
+def crop_view(x, y, crop_width, crop_height, width, height):
+    """
+    Scale and offset mapping a crop window's gluv coordinates into the full frame's.
+
+    The window's top-left corner is at pixel (x, y) of the width x height frame. gluv spans
+    2/height units per pixel with y up, so the window's gluv (2/crop_height per pixel) are
+    scaled by crop_height/height, then moved to the window's center.
+    """
+    if (crop_width <= 0) or (crop_height <= 0):
+        raise ValueError(f"Crop size must be positive, got {crop_width}x{crop_height}")
+    if (x < 0) or (y < 0) or (x + crop_width > width) or (y + crop_height > height):
+        raise ValueError(
+            f"Crop window {crop_width}x{crop_height} at ({x}, {y}) is outside the {width}x{height} frame"
+        )
+    scale = crop_height / height
+    offset = ((2 * x + crop_width - width) / height, (height - 2 * y - crop_height) / height)
+    return scale, offset
+
+
+def parse_crop_positions(text):
+    """
+    Per-frame top-left corners of a crop window from a JSON list of [x, y] pairs.
+
+    An empty string means a static window. Frames past the end of the list keep the last
+    position.
+    """
+    if not text.strip():
+        return []
+    positions = json.loads(text)
+    if (not isinstance(positions, list)) or any(len(position) != 2 for position in positions):
+        raise ValueError("Crop positions must be a JSON list of [x, y] pairs")
+    return [(int(x), int(y)) for x, y in positions]
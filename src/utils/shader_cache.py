@@ -0,0 +1,69 @@
+import hashlib
+import os
+
+from .cache_utils import cache_directory, load_json, save_json
+
+PROGRAMS_FILE = "shader_programs.json"
+
+# Programs whose timings are kept, the least recently rendered ones are dropped first
+MAX_PROGRAMS = 64
+
+# Environment variables enabling each driver's own on-disk cache of compiled programs
+#  - Mesa (llvmpipe, radeonsi, iris, ...) keys entries by source, driver build and GPU
+#  - NVIDIA keys them by source and driver version
+DRIVER_CACHE_VARIABLES = {
+    "MESA_SHADER_CACHE_DIR": "mesa",
+    "__GL_SHADER_DISK_CACHE_PATH": "nvidia",
+}
+
+
+def enable_driver_shader_cache():
+    """
+    Point the OpenGL drivers' program binary caches at the nodes' cache directory.
+
+    Both drivers cache compiled programs by default already, this only relocates their
+    caches next to the nodes' other files, nothing is stored or loaded by the nodes. Must run before the OpenGL context is created, and changes the environment of the
+    whole process, so it's opt-in. Variables the user already set are left alone.
+    Returns the variables that were set.
+    """
+    configured = {}
+    for variable, name in DRIVER_CACHE_VARIABLES.items():
+        if variable in os.environ:
+            continue
+        path = cache_directory() / "shaders" / name
+        path.mkdir(parents=True, exist_ok=True)
+        os.environ[variable] = configured[variable] = str(path)
+    if "__GL_SHADER_DISK_CACHE" not in os.environ:
+        os.environ["__GL_SHADER_DISK_CACHE"] = configured["__GL_SHADER_DISK_CACHE"] = "1"
+    return configured
+
+
+def program_key(source, renderer=""):
+    """Key of a compiled program: hash of its final source, specialization defines included, and driver string."""
+    digest = hashlib.sha256()
+    for part in (source, renderer):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def record_first_frame(key, seconds):
+    """
+    Record the time to first frame (compile, link and first render) for a program key.
+
+    Returns how many renders used this program so far, this one included, and the time
+    to first frame of the first of them. Whether the driver served a cached binary
+    isn't observable from here, only these timings are. Keeps the MAX_PROGRAMS most
+    recently rendered programs.
+    """
+    programs = load_json(PROGRAMS_FILE, default={})
+    previous = programs.pop(key, None) or {}
+    programs[key] = {
+        "first_frame_seconds": round(seconds, 4),
+        "first_render_seconds": previous.get("first_render_seconds", round(seconds, 4)),
+        "renders": previous.get("renders", 0) + 1,
+    }
+    for stale in list(programs)[:-MAX_PROGRAMS]:
+        del programs[stale]
+    save_json(PROGRAMS_FILE, programs)
+    return programs[key]["renders"], programs[key]["first_render_seconds"]
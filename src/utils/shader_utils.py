@@ -0,0 +1,41 @@
+# Uniform types specialization bakes: the effects' enable flags and loop bounds. Continuous
+# parameters stay uniforms, so tweaking them keeps the same program source
+SPECIALIZED_TYPES = ("bool", "int")
+
+
+def glsl_literal(type, value):
+    """Format a uniform value as a GLSL constant expression of the given type."""
+    if type == "bool":
+        return "true" if value else "false"
+    if type == "int":
+        return str(int(value))
+    if type == "float":
+        text = f"{float(value):.9g}"
+        if not any(char in text for char in ".en"):
+            text += ".0"
+        return f"({text})" if text.startswith("-") else text
+    if type.startswith("vec"):
+        return f"{type}({', '.join(glsl_literal('float', part) for part in value)})"
+    raise ValueError(f"Can't specialize a uniform of type {type}")
+
+
+def specialized_uniforms(uniforms):
+    """The enable flags and loop bounds among (type, name, value) uniforms."""
+    return tuple(uniform for uniform in uniforms if uniform[0] in SPECIALIZED_TYPES)
+
+
+def specialization_defines(uniforms):
+    """
+    Defines replacing the enable flags and loop bounds with their constant values.
+
+    Shaderflow declares uniforms before the shader content, so a define with the same
+    name turns every later use into a constant the compiler can fold, dropping disabled
+    branches and unrolling loops with now constant bounds. Setting a uniform the compiler
+    optimized away is ignored. Other uniforms are left out, see SPECIALIZED_TYPES.
+    """
+    return tuple(f"{name} {glsl_literal(type, value)}" for type, name, value in specialized_uniforms(uniforms))
+
+
+def specialize_source(source, defines=()):
+    """Prepend `#define` lines to a shader source."""
+    return "".join(f"#define {define}\n" for define in defines) + source
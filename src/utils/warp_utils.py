@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+def uv_maps(uv, width, height):
+    """
+    Pixel coordinate maps for cv2.remap from a uv warp field (u right, v up, in [0, 1]).
+
+    The maps address an image of the given size, so a warp rendered at one resolution
+    applies to images of another with the same aspect ratio.
+    """
+    uv = np.asarray(uv, dtype=np.float32)
+    map_x = uv[..., 0] * width - 0.5
+    map_y = (1.0 - uv[..., 1]) * height - 0.5
+    return map_x, map_y
+
+
+def remap_frame(image, uv, repeat=False, dst=None):
+    """Sample an image at a single frame's warp field, bilinear like the shader's texture reads."""
+    height, width = image.shape[:2]
+    map_x, map_y = uv_maps(uv, width, height)
+    result = cv2.remap(
+        image, map_x, map_y,
+        interpolation=cv2.INTER_LINEAR,
+        borderMode=(cv2.BORDER_WRAP if repeat else cv2.BORDER_REPLICATE),
+    )
+    if result.ndim < image.ndim:
+        result = result[..., None]
+    if dst is None:
+        return result
+    dst[...] = result
+    return dst
+
+
+def remap_frames(images, uv, repeat=False, chunk_size=8, max_workers=4):
+    """
+    Apply per-frame warp fields to a batch of images without rendering.
+
+    A single image or warp frame is broadcast over the other batch. Chunks of frames are
+    remapped on a thread pool (OpenCV releases the GIL) straight into a preallocated
+    float32 [N, H, W, C] array at the warp field's resolution.
+    """
+    images = np.asarray(images, dtype=np.float32)
+    uv = np.asarray(uv, dtype=np.float32)
+    if images.ndim == 3:
+        images = images[None]
+    if uv.ndim == 3:
+        uv = uv[None]
+
+    count = max(len(images), len(uv))
+    for name, batch in (("images", images), ("uv", uv)):
+        if len(batch) not in (1, count):
+            raise ValueError(f"Cannot broadcast {len(batch)} {name} frames to {count} frames")
+
+    output = np.empty((count, *uv.shape[1:3], images.shape[-1]), dtype=np.float32)
+
+    def work(start):
+        for index in range(start, min(start + chunk_size, count)):
+            remap_frame(
+                images[min(index, len(images) - 1)],
+                uv[min(index, len(uv) - 1)],
+                repeat=repeat,
+                dst=output[index],
+            )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(work, range(0, count, max(1, chunk_size))))
+    return output
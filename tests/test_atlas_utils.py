@@ -0,0 +1,41 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.atlas_utils import atlas_grid, split_atlas, tile_viewport
+
+
+class TestAtlasUtils(unittest.TestCase):
+
+    def test_grid(self):
+        """Test the near square layout and the size limit."""
+        self.assertEqual(atlas_grid(16, 256, 256), (4, 4, 16))
+        self.assertEqual(atlas_grid(5, 256, 256), (3, 2, 5))
+        self.assertEqual(atlas_grid(64, 4096, 4096), (4, 4, 16))
+        self.assertEqual(atlas_grid(8, 10000, 10000), (1, 1, 1))
+
+    def test_round_trip(self):
+        """Test that tiles drawn at their viewports come back in order from the flipped readback."""
+        width, height, count = 4, 3, 5
+        columns, rows, count = atlas_grid(count, width, height)
+        frames = np.random.default_rng(0).integers(0, 256, (count, height, width, 3), dtype=np.uint8)
+
+        # OpenGL's bottom-up framebuffer, each frame uploaded flipped like the final pass
+        framebuffer = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+        for index, frame in enumerate(frames):
+            x, y, w, h = tile_viewport(index, width, height, columns, rows)
+            framebuffer[y:y + h, x:x + w] = np.flipud(frame)
+
+        tiles = split_atlas(np.flipud(framebuffer), width, height, columns, count)
+        self.assertEqual(len(tiles), count)
+        for tile, frame in zip(tiles, frames):
+            np.testing.assert_array_equal(tile, frame)
+
+
+if __name__ == "__main__":
+    unittest.main()
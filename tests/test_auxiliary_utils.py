@@ -0,0 +1,37 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.auxiliary_utils import read_auxiliary, split_auxiliary
+
+
+class TestAuxiliaryUtils(unittest.TestCase):
+
+    def test_read_flips_and_downsamples(self):
+        """Test that readbacks are flipped top-down and area averaged from the SSAA size."""
+        frame = np.zeros((4, 6, 4), dtype=np.float32)
+        frame[0:2, :, 1] = 1.0  # Bottom rows in OpenGL order are masked
+        result = read_auxiliary(frame.tobytes(), 3, 2, size=(6, 4))
+        self.assertEqual(result.shape, (2, 3, 4))
+        np.testing.assert_allclose(result[1, :, 1], 1.0)
+        np.testing.assert_allclose(result[0, :, 1], 0.0)
+
+    def test_split_outputs(self):
+        """Test that frames split into depth, mask and uv outputs, following the index map."""
+        frames = [np.full((2, 3, 4), index, dtype=np.float32) / 4 for index in range(2)]
+        depth, mask, uv = split_auxiliary(frames, index_map=[0, 1, 0])
+        self.assertEqual(depth.shape, (3, 2, 3, 3))
+        self.assertEqual(mask.shape, (3, 2, 3))
+        self.assertEqual(uv.shape, (3, 2, 3, 3))
+        np.testing.assert_array_equal(depth[2], depth[0])
+        np.testing.assert_allclose(uv[1, ..., :2], 0.25)
+        np.testing.assert_allclose(uv[..., 2], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.cpu_renderer import (
+    depth_skip,
+    march,
+    render_frame,
+    render_frames,
+    sample,
+    screen_gluv,
+    upsample_hits,
+)
+from utils.depth_pyramid import build_depth_pyramid
+from utils.resolution_utils import crop_view
+
+
+def uniforms(**values):
+    """Depth state uniforms of a still camera, with overrides."""
+    defaults = {
+        "iDepthHeight": 0.0, "iDepthSteady": 0.0, "iDepthFocus": 0.0, "iDepthInvert": 0.0,
+        "iDepthZoom": 1.0, "iDepthIsometric": 0.0, "iDepthDolly": 0.0, "iDepthOffset": (0.0, 0.0),
+        "iDepthCenter": (0.0, 0.0), "iDepthOrigin": (0.0, 0.0), "iDepthMirror": True, "iQuality": 0.5,
+        "iInpaint": False, "iInpaintBlack": False, "iInpaintLimit": 1.0, "iInpaintColor": (0.0, 1.0, 0.0, 1.0),
+    }
+    defaults.update(values)
+    return defaults
+
+
+class TestCpuRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.image = np.random.default_rng(0).random((48, 64, 3)).astype(np.float32)
+
+    def test_flat_scene_is_identity(self):
+        """Test that a zero height scene samples every pixel at its own center."""
+        depth = np.full((48, 64), 0.5, dtype=np.float32)
+        frame = render_frame(self.image, depth, uniforms(), 64, 48)
+        expected = (self.image * 255.0 + 0.5).astype(np.uint8)
+        self.assertLessEqual(np.abs(frame.astype(int) - expected).max(), 1)
+
+    def test_constant_depth_scales_the_view(self):
+        """Test that the march hits a constant depth where the perspective ray predicts."""
+        depth = np.full((48, 64, 1), 0.5, dtype=np.float32)
+        gluv = screen_gluv(64, 48)
+        hit = march(depth, gluv, uniforms(iDepthHeight=0.4), 64 / 48)
+        # The surface is at z = 1 - 0.4*0.5, the ray from the origin reaches it at 0.8 gluv
+        np.testing.assert_allclose(hit["gluv"], gluv * 0.8, atol=1e-3)
+        self.assertFalse(hit["oob"].any())
+
+    def test_mirror(self):
+        """Test that mirrored reads reflect past the image's edge."""
+        aspect = 64 / 48
+        inside = sample(self.image, [[aspect - 0.1, 0.0]], aspect, mirror=True)
+        outside = sample(self.image, [[aspect + 0.1, 0.0]], aspect, mirror=True)
+        np.testing.assert_allclose(inside, outside, atol=1e-5)
+
+    def test_inpaint_on_depth_steps(self):
+        """Test that an offset camera uncovers the steep side of a depth step and inpaints it."""
+        depth = np.zeros((48, 64), dtype=np.float32)
+        depth[:, 32:] = 1.0
+        state = uniforms(iDepthHeight=0.5, iDepthOffset=(-0.3, 0.0), iInpaint=True, iInpaintLimit=0.1)
+        frame = render_frame(self.image, depth, state, 64, 48)
+        green = np.all(frame == (0, 255, 0), axis=-1)
+        self.assertTrue(green.any())
+        self.assertLess(green.mean(), 0.5)
+
+    def test_warm_start_finds_moving_foreground(self):
+        """Test that a foreground moving in front of last frame's hits is hit like without the hint."""
+        def foreground(shift):
+            depth = np.zeros((48, 64, 1), dtype=np.float32)
+            depth[12:36, 20 + shift:36 + shift] = 0.6
+            return depth
+
+        gluv = screen_gluv(64, 48)
+        for offset in ((0.3, 0.0), (0.0, 0.2), (-0.2, 0.1)):
+            state = uniforms(iDepthHeight=0.5, iDepthOffset=offset)
+            previous = march(foreground(0), gluv, state, 64 / 48)
+            full = march(foreground(10), gluv, state, 64 / 48)
+            warm = march(foreground(10), gluv, state, 64 / 48, hint=previous["walk"])
+            self.assertTrue((previous["walk"] > full["walk"] + 0.1).any())
+            np.testing.assert_allclose(warm["gluv"], full["gluv"], atol=1e-4)
+            np.testing.assert_allclose(warm["value"], full["value"], atol=1e-4)
+
+    def smooth_depth(self):
+        depth = cv2.GaussianBlur(np.random.default_rng(2).random((48, 64)).astype(np.float32), (0, 0), 4)
+        depth = (depth - depth.min()) / (depth.max() - depth.min())
+        depth[:, 40:] = np.maximum(depth[:, 40:], 0.9)
+        return depth
+
+    def test_depth_skip_is_conservative(self):
+        """Test that the skipped walk stays above the surface and skips most of the empty space."""
+        depth = self.smooth_depth()
+        pyramid = build_depth_pyramid(np.flipud(depth))
+        height, aspect = 0.4, 64 / 48
+        safe = 1.0 - height
+        skipped = []
+        for x, y in np.random.default_rng(3).uniform(-0.9, 0.9, (64, 2)) * (aspect, 1.0):
+            # A perspective ray from the camera at the origin to (x, y) on the z=1 plane
+            origin, intersect = np.zeros(3), np.array([x, y, 1.0])
+            start = origin + (intersect - origin) * safe
+            delta = (intersect - origin) * (1.0 - safe)
+            proven = depth_skip(start, delta, height, 0.0, pyramid, (64, 48))
+            skipped.append(proven)
+            for walk in np.linspace(0.0, proven, 32):
+                point = start + delta * walk
+                value = sample(depth[..., None], point[None, :2], aspect)[0, 0]
+                self.assertGreaterEqual(1.0 - point[2], height * value - 1e-5)
+        self.assertGreater(np.mean(skipped), 0.1)
+
+    def test_depth_skip_keeps_hits(self):
+        """Test that skipping empty space finds the same hits as the full march."""
+        depth = self.smooth_depth()[..., None]
+        pyramid = build_depth_pyramid(np.flipud(depth[..., 0]))
+        gluv = screen_gluv(64, 48)
+        for offset in ((0.3, 0.0), (0.0, -0.2)):
+            state = uniforms(iDepthHeight=0.4, iDepthOffset=offset)
+            full = march(depth, gluv, state, 64 / 48)
+            skipped = march(depth, gluv, state, 64 / 48, pyramid=pyramid)
+            np.testing.assert_allclose(skipped["gluv"], full["gluv"], atol=1e-4)
+            np.testing.assert_allclose(skipped["value"], full["value"], atol=1e-4)
+
+    def test_upsampled_hits_keep_depth_edges(self):
+        """Test that half resolution hits upsample to the full ones without blending across edges."""
+        depth = np.zeros((48, 64, 1), dtype=np.float32)
+        depth[:, 30:] = 0.6
+        state = uniforms(iDepthHeight=0.5, iDepthOffset=(0.2, 0.1))
+        full = march(depth, screen_gluv(64, 48), state, 64 / 48)
+        small = march(depth, screen_gluv(32, 24), state, 64 / 48)
+        small = {name: value.reshape(24, 32, *value.shape[1:]) for name, value in small.items()}
+        upsampled = upsample_hits(small, depth, 64, 48, 64 / 48)
+        np.testing.assert_allclose(upsampled["value"], full["value"], atol=1e-3)
+        np.testing.assert_allclose(upsampled["gluv"], full["gluv"], atol=0.05)
+        # Plain bilinear upsampling blends the two sides of the step
+        bilinear = cv2.resize(small["value"], (64, 48), interpolation=cv2.INTER_LINEAR).reshape(-1)
+        self.assertGreater(np.abs(bilinear - full["value"]).max(), 0.1)
+
+    def test_crop_matches_full_frame(self):
+        """Test that a cropped render with a vignette is the same window of the full render."""
+        depth = np.full((48, 64), 0.5, dtype=np.float32)
+        state = uniforms(iVigEnable=True, iVigDecay=20.0, iVigIntensity=0.5)
+        full = render_frame(self.image, depth, state, 64, 48)
+        scale, offset = crop_view(8, 16, 32, 24, 64, 48)
+        window = render_frame(
+            self.image, depth, state, 32, 24, view_scale=scale, view_offset=offset, view_aspect=64 / 48
+        )
+        self.assertLessEqual(np.abs(window.astype(int) - full[16:40, 8:40]).max(), 1)
+
+    def test_batch_matches_single_frames(self):
+        """Test that batched rendering gives the same frames as one at a time."""
+        depth = np.random.default_rng(1).random((48, 64)).astype(np.float32)
+        states = [uniforms(iDepthHeight=0.3, iDepthOffset=(x, 0.0)) for x in (0.0, 0.1, 0.2)]
+        frames = render_frames([self.image] * 3, [depth] * 3, states, 32, 24, max_workers=3)
+        for frame, state in zip(frames, states):
+            np.testing.assert_array_equal(frame, render_frame(self.image, depth, state, 32, 24))
+
+
+if __name__ == "__main__":
+    unittest.main()
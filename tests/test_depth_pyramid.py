@@ -0,0 +1,115 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.depth_pyramid import (
+    build_depth_pyramid,
+    depth_gradient,
+    depth_scale_psnr,
+    downsample_depth,
+    pack_depth_pyramid,
+)
+
+
+def bilinear(depth, x, y):
+    """Sample like OpenGL's linear filter with clamp to edge, in texel coordinates."""
+    height, width = depth.shape
+    x, y = x - 0.5, y - 0.5
+    x0, y0 = int(np.floor(x)), int(np.floor(y))
+    fx, fy = x - x0, y - y0
+    def texel(i, j):
+        return depth[min(max(j, 0), height - 1), min(max(i, 0), width - 1)]
+    top = texel(x0, y0) * (1 - fx) + texel(x0 + 1, y0) * fx
+    bottom = texel(x0, y0 + 1) * (1 - fx) + texel(x0 + 1, y0 + 1) * fx
+    return top * (1 - fy) + bottom * fy
+
+
+class TestDepthPyramid(unittest.TestCase):
+
+    def test_level_shapes(self):
+        """Test that odd sizes halve rounding up down to a single texel."""
+        levels = build_depth_pyramid(np.zeros((37, 50), dtype=np.uint8))
+        shapes = [level.shape[:2] for level in levels]
+        self.assertEqual(shapes[0], (19, 25))
+        self.assertEqual(shapes[-1], (1, 1))
+        self.assertEqual(levels[0].dtype, np.float32)
+
+    def test_bounds_are_conservative(self):
+        """Test that every bilinear sample lies within its cell's (max, min) bounds."""
+        rng = np.random.default_rng(0)
+        depth = rng.integers(0, 256, (23, 31), dtype=np.uint8)
+        levels = build_depth_pyramid(depth)
+        normalized = depth.astype(np.float32) / 255.0
+        for x, y in rng.uniform(0, 1, (500, 2)) * (31, 23):
+            value = bilinear(normalized, x, y)
+            for n, level in enumerate(levels):
+                cell = 2 ** (n + 1)
+                high, low = level[int(y // cell), int(x // cell)]
+                self.assertLessEqual(value, high + 1e-6)
+                self.assertGreaterEqual(value, low - 1e-6)
+
+    def test_atlas_offsets(self):
+        """Test that levels are stacked at their row offsets."""
+        levels = build_depth_pyramid(np.random.default_rng(1).random((16, 10)))
+        atlas, offsets = pack_depth_pyramid(levels)
+        self.assertEqual(atlas.shape, (sum(level.shape[0] for level in levels), 5, 2))
+        for offset, level in zip(offsets, levels):
+            np.testing.assert_array_equal(
+                atlas[offset:offset + level.shape[0], :level.shape[1]], level
+            )
+
+    def test_gradient_units(self):
+        """Test that a linear ramp has a constant gradient in gluv units."""
+        ramp = np.tile(np.linspace(0, 1, 64, dtype=np.float32), (32, 1))
+        gradient = depth_gradient(ramp)
+        self.assertEqual(gradient.shape, (32, 64, 2))
+        np.testing.assert_allclose(gradient[..., 0], (1 / 63) * 32 / 2, rtol=1e-5)
+        np.testing.assert_allclose(gradient[..., 1], 0, atol=1e-6)
+
+    def test_gradient_matches_finite_differences(self):
+        """Test that normals from the gradient match the shader's finite differences."""
+        height, width, quality, surface = 96, 128, 0.005, 0.3
+        y, x = np.mgrid[0:height, 0:width] / height
+        depth = (0.5 + 0.25*np.sin(6*x) * np.cos(5*y)).astype(np.float32)
+        gradient = depth_gradient(depth)
+        step = quality * height / 2
+        rng = np.random.default_rng(2)
+        for x, y in rng.uniform(0, 1, (300, 2)) * (width - 8, height - 8) + 4:
+            value = bilinear(depth, x, y)
+            expected = np.array([
+                (bilinear(depth, x - step, y) - value) / quality,
+                (bilinear(depth, x, y - step) - value) / quality,
+                surface,
+            ])
+            actual = np.array([
+                -bilinear(gradient[..., 0], x, y),
+                -bilinear(gradient[..., 1], x, y),
+                surface,
+            ])
+            cosine = expected @ actual / np.linalg.norm(expected) / np.linalg.norm(actual)
+            self.assertLess(np.degrees(np.arccos(min(cosine, 1.0))), 3.0)
+
+    def test_downsample_depth(self):
+        """Test that downsampled depth keeps the dtype and channel axis of the batch."""
+        frames = np.random.default_rng(0).integers(0, 256, (2, 64, 96, 1), dtype=np.uint8)
+        small = downsample_depth(frames, 0.5)
+        self.assertEqual((small.shape, small.dtype), ((2, 32, 48, 1), np.uint8))
+        self.assertIs(downsample_depth(frames, 1.0), frames)
+
+    def test_smooth_depth_survives_downsampling(self):
+        """Test that a smooth depthmap loses less than a noisy one, and more at smaller scales."""
+        y, x = np.mgrid[0:128, 0:128] / 128.0
+        smooth = (0.5 + 0.5 * np.sin(3 * x) * np.cos(2 * y)).astype(np.float32)
+        noisy = np.random.default_rng(0).random((128, 128)).astype(np.float32)
+        self.assertGreater(depth_scale_psnr(smooth, 0.5), 40.0)
+        self.assertGreater(depth_scale_psnr(smooth, 0.5), depth_scale_psnr(smooth, 0.25))
+        self.assertGreater(depth_scale_psnr(smooth, 0.5), depth_scale_psnr(noisy, 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
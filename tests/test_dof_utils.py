@@ -0,0 +1,58 @@
+import unittest
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.dof_utils import brute_force_dof, mip_dof, mip_pyramid
+
+
+def psnr(a, b):
+    return 10 * np.log10(1.0 / np.mean((a - b) ** 2))
+
+
+def make_image(height=96, width=128):
+    rng = np.random.default_rng(0)
+    image = cv2.GaussianBlur(rng.random((height, width, 3)).astype(np.float32), (0, 0), 3)
+    image = np.clip(image * 2, 0, 1)
+    image[30:60, 40:90] = (0.9, 0.2, 0.1)
+    return image
+
+
+class TestDofUtils(unittest.TestCase):
+
+    def test_mip_pyramid(self):
+        """Test that mip levels halve rounding up and keep the mean of even images."""
+        image = make_image(64, 96)
+        levels = mip_pyramid(image)
+        self.assertEqual(levels[1].shape, (32, 48, 3))
+        self.assertEqual(levels[-1].shape[:2], (1, 1))
+        np.testing.assert_allclose(levels[1].mean(), image.mean(), atol=1e-5)
+        self.assertEqual(mip_pyramid(np.zeros((5, 7)))[1].shape, (3, 4))
+
+    def test_matches_brute_force(self):
+        """Test that the mip DOF stays within 35 dB PSNR of the brute force DOF."""
+        image = make_image()
+        for radius in (2, 8, 24):
+            for directions, quality in ((16, 8), (32, 16)):
+                with self.subTest(radius=radius, directions=directions, quality=quality):
+                    reference = brute_force_dof(image, radius, directions, quality)
+                    self.assertGreater(psnr(reference, mip_dof(image, radius, directions, quality)), 35)
+
+    def test_per_pixel_radius(self):
+        """Test that in-focus pixels match the brute force exactly, like a depth driven intensity."""
+        image = make_image()
+        radius = np.zeros(image.shape[:2], dtype=np.float32)
+        radius[:, 64:] = 10
+        blurred = mip_dof(image, radius, 16, 8)
+        reference = brute_force_dof(image, 0, 16, 8)
+        np.testing.assert_allclose(blurred[:, :32], reference[:, :32], atol=1e-5)
+        self.assertGreater(np.abs(blurred[:, 80:] - reference[:, 80:]).mean(), 1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.frame_sinks import EncoderPipeSink, NpySequenceSink, PngSequenceSink
+
+
+def make_frames(count, height=8, width=12):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+class TestFrameSinks(unittest.TestCase):
+
+    def test_npy_sequence(self):
+        """Test that frames are written in order by the thread pool."""
+        frames = make_frames(10)
+        with tempfile.TemporaryDirectory() as directory:
+            sink = NpySequenceSink(directory, max_workers=3, max_pending=2)
+            for frame in frames:
+                sink.write(frame)
+            paths = sink.close()
+            self.assertEqual(len(paths), 10)
+            for path, frame in zip(paths, frames):
+                np.testing.assert_array_equal(np.load(path), frame)
+
+    def test_png_sequence_roundtrip(self):
+        """Test that PNG frames keep their RGB channel order."""
+        import cv2
+
+        frames = make_frames(3)
+        with tempfile.TemporaryDirectory() as directory:
+            sink = PngSequenceSink(directory, max_workers=2)
+            for frame in frames:
+                sink.write(frame)
+            paths = sink.close()
+            for path, frame in zip(paths, frames):
+                loaded = cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2RGB)
+                np.testing.assert_array_equal(loaded, frame)
+
+    def test_index_map_expansion(self):
+        """Test that repeated frames are filled in as copies of rendered files."""
+        frames = make_frames(3)
+        with tempfile.TemporaryDirectory() as directory:
+            sink = NpySequenceSink(directory)
+            for frame in frames:
+                sink.write(frame)
+            paths = sink.close(index_map=[0, 1, 2, 1, 0])
+            self.assertEqual(len(paths), 5)
+            np.testing.assert_array_equal(np.load(paths[3]), frames[1])
+            np.testing.assert_array_equal(np.load(paths[4]), frames[0])
+
+    def test_encoder_needs_even_sides(self):
+        """Test that odd frame sizes are refused before any encoder process starts."""
+        EncoderPipeSink.validate_size(640, 360)
+        with self.assertRaises(ValueError):
+            EncoderPipeSink.validate_size(641, 360)
+        with self.assertRaises(ValueError):
+            EncoderPipeSink("unused.mp4", 640, 361, 30, executable="/nonexistent/ffmpeg")
+
+
+if __name__ == "__main__":
+    unittest.main()
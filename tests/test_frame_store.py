@@ -0,0 +1,69 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.frame_store import CODECS, CompressedFrameStore
+from utils.render_plan import estimate_stages
+
+
+def make_frames(count, height, width):
+    """Smooth gradients, which compress well like most rendered frames."""
+    y, x = np.mgrid[0:height, 0:width]
+    return [
+        np.stack([(x + i) % 256, (y * 2) % 256, np.full_like(x, i)], axis=-1).astype(np.uint8)
+        for i in range(count)
+    ]
+
+
+class TestFrameStore(unittest.TestCase):
+
+    def test_lossless_roundtrip(self):
+        """Test that every available codec restores frames exactly."""
+        frames = make_frames(6, 16, 24)
+        for codec in CODECS:
+            store = CompressedFrameStore(codec=codec, max_workers=3, max_pending=2)
+            for frame in frames:
+                store.write(frame)
+            self.assertGreater(store.compression_ratio, 1.0)
+            for index, frame in enumerate(frames):
+                np.testing.assert_array_equal(store.frame(index), frame)
+            output = store.close()
+            self.assertEqual(output.dtype, np.float32)
+            np.testing.assert_allclose(output, np.stack(frames) / 255.0, atol=1e-6)
+
+    def test_index_map(self):
+        """Test that the final array follows the index map."""
+        frames = make_frames(3, 16, 24)
+        store = CompressedFrameStore(codec="zlib")
+        for frame in frames:
+            store.write(frame)
+        output = store.close([0, 1, 2, 1, 0])
+        self.assertEqual(len(output), 5)
+        np.testing.assert_allclose(output[3], frames[1] / 255.0, atol=1e-6)
+        np.testing.assert_allclose(output[4], frames[0] / 255.0, atol=1e-6)
+
+    def test_empty_store(self):
+        """Test that a store closed before its first frame gives an empty batch of its shape."""
+        store = CompressedFrameStore(codec="zlib", shape=(16, 24, 3))
+        output = store.close()
+        self.assertEqual((output.shape, output.dtype), ((0, 16, 24, 3), np.float32))
+
+    def test_unknown_codec(self):
+        """Test that an unavailable codec is rejected."""
+        with self.assertRaises(ValueError):
+            CompressedFrameStore(codec="nope")
+
+    def test_compressed_render_stage(self):
+        """Test that compressed frames hold less memory while rendering than a stack."""
+        stack = estimate_stages("stack", 640, 360, 100, 100)
+        compressed = estimate_stages("compressed", 640, 360, 100, 100, compression_ratio=4.0)
+        self.assertLess(compressed["render"], stack["render"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.headless_backend import fastest_backend, headless_environment, select_headless_backend
+
+
+class TestHeadlessBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.environ = mock.patch.dict(os.environ, {"DEPTHFLOW_NODES_CACHE": self.cache.name})
+        self.environ.start()
+        self.probed = []
+        self.renderers = {"egl": "NVIDIA GeForce RTX 4090/PCIe/SSE2", "llvmpipe": "llvmpipe (LLVM 15.0.7, 256 bits)"}
+
+    def tearDown(self):
+        self.environ.stop()
+        self.cache.cleanup()
+
+    def probe(self, name):
+        self.probed.append(name)
+        rates = {"egl": 120.0, "llvmpipe": 15.0}
+        if name not in rates:
+            return None
+        return {"renderer": self.renderers[name], "frames_per_second": rates[name], "max_texture_size": 8192}
+
+    def test_fastest_backend(self):
+        """Test that the fastest working backend wins and failures are skipped."""
+        self.assertEqual(fastest_backend({"egl": None, "llvmpipe": {"frames_per_second": 3.0}}), "llvmpipe")
+        self.assertIsNone(fastest_backend({"egl": None, "x11": None}))
+
+    def test_probe_is_cached(self):
+        """Test that backends are probed once, then read from the cache."""
+        name, report = select_headless_backend(probe=self.probe)
+        self.assertEqual(name, "egl")
+        self.assertEqual(report["max_texture_size"], 8192)
+        count = len(self.probed)
+        self.assertEqual(select_headless_backend(probe=self.probe)[0], "egl")
+        self.assertEqual(len(self.probed), count)
+
+    def test_force_backend(self):
+        """Test that a forced backend is used even if slower, and unknown names raise."""
+        name, report = select_headless_backend("llvmpipe", probe=self.probe)
+        self.assertEqual(name, "llvmpipe")
+        self.assertEqual(report["frames_per_second"], 15.0)
+        self.assertIsNone(select_headless_backend("x11", probe=self.probe)[1])
+        with self.assertRaises(ValueError):
+            select_headless_backend("osmesa", probe=self.probe)
+
+    def test_llvmpipe_needs_its_renderer(self):
+        """Test that llvmpipe landing on the GPU driver is not cached as working."""
+        self.renderers["llvmpipe"] = self.renderers["egl"]
+        self.assertIsNone(select_headless_backend("llvmpipe", probe=self.probe)[1])
+        self.assertEqual(select_headless_backend(probe=self.probe)[0], "egl")
+
+    def test_environment_is_restored(self):
+        """Test that the backend's variables only apply while the context is created."""
+        os.environ.pop("LIBGL_ALWAYS_SOFTWARE", None)
+        os.environ["WINDOW_EGL"] = "custom"
+        with headless_environment("llvmpipe"):
+            self.assertEqual(os.environ["LIBGL_ALWAYS_SOFTWARE"], "1")
+            self.assertEqual(os.environ["WINDOW_EGL"], "1")
+        self.assertNotIn("LIBGL_ALWAYS_SOFTWARE", os.environ)
+        self.assertEqual(os.environ["WINDOW_EGL"], "custom")
+        with self.assertRaises(RuntimeError):
+            with headless_environment("x11"):
+                raise RuntimeError("context creation failed")
+        self.assertEqual(os.environ["WINDOW_EGL"], "custom")
+        with headless_environment(None):
+            self.assertEqual(os.environ["WINDOW_EGL"], "custom")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.loop_utils import describe_reuse, flatten_values, frame_reuse_map, render_count
+
+
+class TestLoopUtils(unittest.TestCase):
+
+    def test_flatten_values(self):
+        """Test flattening a nested state dump into floats."""
+        state = {"height": 0.2, "mirror": True, "blur": {"enable": False, "quality": 4}, "name": "x"}
+        self.assertEqual(flatten_values(state), (0.0, 4.0, 0.2, 1.0))
+
+    def test_periodic_motion(self):
+        """Test that two cycles of a motion only render the first one."""
+        signatures = [(0.0, 1.0), (1.0, 0.0), (0.0, -1.0), (-1.0, 0.0)] * 2
+        index_map = frame_reuse_map(signatures)
+        self.assertEqual(index_map, [0, 1, 2, 3, 0, 1, 2, 3])
+        self.assertEqual(render_count(index_map), 4)
+        self.assertEqual(describe_reuse(index_map), "periodic")
+
+    def test_ping_pong_motion(self):
+        """Test that a time-symmetric motion only renders its first half."""
+        signatures = [(0.0,), (0.5,), (1.0,), (0.5,), (0.0,)]
+        index_map = frame_reuse_map(signatures)
+        self.assertEqual(index_map, [0, 1, 2, 1, 0])
+        self.assertEqual(render_count(index_map), 3)
+        self.assertEqual(describe_reuse(index_map), "ping-pong")
+
+    def test_tolerance(self):
+        """Test that floating point noise below the tolerance is ignored."""
+        signatures = [(0.0, 1.0), (1.0, 0.0), (1e-12, 1.0 - 1e-12)]
+        self.assertEqual(frame_reuse_map(signatures), [0, 1, 0])
+        self.assertEqual(frame_reuse_map(signatures, tolerance=1e-15), [0, 1, 2])
+
+    def test_no_repetition(self):
+        """Test that a non-repeating motion renders every frame."""
+        index_map = frame_reuse_map([(float(i),) for i in range(5)])
+        self.assertEqual(render_count(index_map), 5)
+        self.assertEqual(describe_reuse(index_map), "none")
+        self.assertEqual(frame_reuse_map([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
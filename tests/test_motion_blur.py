@@ -0,0 +1,26 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.motion_blur import subframe_offsets
+
+
+class TestMotionBlur(unittest.TestCase):
+
+    def test_offsets_span_the_shutter(self):
+        """Test that sub-frames start at the frame and evenly sample the open shutter."""
+        self.assertEqual(subframe_offsets(4, 0.5), [0.0, 0.125, 0.25, 0.375])
+        self.assertEqual(subframe_offsets(2, 1.0), [0.0, 0.5])
+
+    def test_degenerate_settings(self):
+        """Test that one sample or a closed shutter render the frame's own time."""
+        self.assertEqual(subframe_offsets(1, 0.5), [0.0])
+        self.assertEqual(subframe_offsets(0, 0.5), [0.0])
+        self.assertEqual(subframe_offsets(3, -1.0), [0.0, 0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
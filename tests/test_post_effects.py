@@ -0,0 +1,74 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.post_effects import apply_post_effects, apply_variant
+
+
+def uniforms(**values):
+    """Effect uniforms at their neutral values, with overrides."""
+    defaults = {
+        "iBlurEnable": False, "iBlurIntensity": 0.01, "iBlurStart": 0.6, "iBlurEnd": 1.0,
+        "iBlurExponent": 2.0, "iBlurQuality": 4, "iBlurDirections": 16,
+        "iVigEnable": False, "iVigIntensity": 0.2, "iVigDecay": 20.0,
+        "iColorsSaturation": 1.0, "iColorsContrast": 1.0, "iColorsBrightness": 1.0,
+        "iColorsGamma": 1.0, "iColorsGrayscale": 0.0, "iColorsSepia": 0.0,
+    }
+    defaults.update(values)
+    return tuple(("float", name, value) for name, value in defaults.items())
+
+
+class TestPostEffects(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = np.random.default_rng(0).random((24, 32, 3)).astype(np.float32)
+        self.depth = np.zeros((24, 32), dtype=np.float32)
+
+    def test_neutral_is_identity(self):
+        """Test that neutral effects leave the frame unchanged."""
+        result = apply_post_effects(self.frame, self.depth, uniforms())
+        np.testing.assert_allclose(result, self.frame, atol=1e-6)
+
+    def test_vignette(self):
+        """Test that the vignette matches the shader's formula and darkens the corners."""
+        result = apply_post_effects(self.frame, self.depth, uniforms(iVigEnable=True))
+        x, y = 0.5 / 32, 0.5 / 24
+        factor = min((20.0 * x * (1 - x) * y * (1 - y)) ** 0.2, 1.0)
+        np.testing.assert_allclose(result[0, 0], self.frame[0, 0] * factor, rtol=1e-5)
+        np.testing.assert_allclose(result[12, 16], self.frame[12, 16], rtol=1e-5)
+
+    def test_colors(self):
+        """Test that zero saturation gives gray pixels and grayscale uses the shader's weights."""
+        gray = apply_post_effects(self.frame, self.depth, uniforms(iColorsSaturation=0.0))
+        np.testing.assert_allclose(gray[..., 0], gray[..., 1], atol=1e-5)
+        np.testing.assert_allclose(gray[..., 1], gray[..., 2], atol=1e-5)
+        luminance = apply_post_effects(self.frame, self.depth, uniforms(iColorsGrayscale=1.0))
+        np.testing.assert_allclose(luminance[..., 0], self.frame @ [0.299, 0.587, 0.114], atol=1e-5)
+
+    def test_blur_follows_depth(self):
+        """Test that the depth of field only blurs pixels past the start distance."""
+        depth = np.ones_like(self.depth)
+        depth[:, 16:] = 0.0
+        result = apply_post_effects(self.frame, depth, uniforms(iBlurEnable=True, iBlurIntensity=0.2))
+        sharp = apply_post_effects(self.frame, depth, uniforms(iBlurEnable=True, iBlurIntensity=0.0))
+        np.testing.assert_allclose(result[:, :8], sharp[:, :8], atol=1e-5)
+        self.assertLess(result[:, 24:].std(), sharp[:, 24:].std())
+
+    def test_variant_per_frame(self):
+        """Test that each frame of a variant gets its own uniforms and the base is kept."""
+        frames = np.stack([self.frame] * 3)
+        base = frames.copy()
+        per_frame = [uniforms(iColorsBrightness=scale) for scale in (1.0, 0.5, 0.25)]
+        result = apply_variant(frames, np.stack([self.depth] * 3), per_frame, max_workers=2)
+        np.testing.assert_array_equal(frames, base)
+        for index, scale in enumerate((1.0, 0.5, 0.25)):
+            np.testing.assert_allclose(result[index], self.frame * scale, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
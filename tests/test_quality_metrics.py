@@ -0,0 +1,51 @@
+import unittest
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.quality_metrics import edge_mask, psnr, ssaa_equivalence, ssim
+
+
+def disk(size, scale):
+    """A bright disk on black, point sampled at scale times the size."""
+    y, x = np.mgrid[0:size * scale, 0:size * scale] + 0.5
+    center = size * scale / 2
+    inside = np.hypot(x - center, y - center) < 0.3 * size * scale
+    return np.repeat(inside[..., None], 3, axis=2).astype(np.float32)
+
+
+class TestQualityMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.reference = cv2.resize(disk(48, 4), (48, 48), interpolation=cv2.INTER_AREA)
+        self.aliased = disk(48, 1)
+
+    def test_identical(self):
+        """Test that a frame equal to the reference is a perfect match."""
+        self.assertEqual(psnr(self.reference, self.reference), float("inf"))
+        self.assertAlmostEqual(ssim(self.reference, self.reference), 1.0, places=5)
+
+    def test_edges_only(self):
+        """Test that the edge mask follows the disk's outline and the error lives there."""
+        mask = edge_mask(self.reference)
+        self.assertFalse(mask[24, 24] or mask[0, 0])
+        self.assertTrue(mask.any())
+        report = ssaa_equivalence(self.aliased, self.reference)
+        self.assertLess(report["edge_psnr"], report["psnr"])
+        self.assertLess(report["edge_fraction"], 0.5)
+
+    def test_error_removed(self):
+        """Test that the edge error removed goes from the baseline to the reference."""
+        halfway = (self.aliased + self.reference) / 2
+        self.assertAlmostEqual(ssaa_equivalence(self.reference, self.reference, self.aliased)["edge_error_removed"], 1.0)
+        self.assertAlmostEqual(ssaa_equivalence(self.aliased, self.reference, self.aliased)["edge_error_removed"], 0.0)
+        self.assertAlmostEqual(ssaa_equivalence(halfway, self.reference, self.aliased)["edge_error_removed"], 0.75, places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
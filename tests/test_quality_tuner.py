@@ -0,0 +1,65 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.quality_tuner import (
+    candidate_settings,
+    march_cost,
+    representative_frames,
+    tune_quality,
+)
+
+
+class TestQualityTuner(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = np.random.default_rng(0).uniform(0.2, 0.8, (2, 32, 48, 3)).astype(np.float32)
+        self.rendered = []
+
+    def render(self, quality, ssaa):
+        """Frames whose error shrinks as the settings get more expensive."""
+        self.rendered.append((quality, ssaa))
+        error = 0.0 if (quality, ssaa) == (100, 2.0) else 0.5 / march_cost(quality, ssaa)
+        return list(self.frames + error)
+
+    def test_candidates_are_cheaper(self):
+        """Test that candidates come cheapest first and all cost less than the reference."""
+        candidates = candidate_settings()
+        costs = [march_cost(*settings) for settings in candidates]
+        self.assertEqual(candidates[0], (10, 1.0))
+        self.assertEqual(costs, sorted(costs))
+        self.assertNotIn((100, 2.0), candidates)
+        self.assertLess(max(costs), march_cost(100, 2.0))
+        self.assertGreater(march_cost(50, 1.0), march_cost(25, 1.0))
+
+    def test_representative_frames(self):
+        """Test that frames are spread over the clip and never repeat."""
+        self.assertEqual(representative_frames(90, 3), [15, 45, 75])
+        self.assertEqual(representative_frames(2, 5), [0, 1])
+        self.assertEqual(representative_frames(1), [0])
+
+    def test_cheapest_within_tolerance(self):
+        """Test that the first candidate within the tolerance is chosen and the search stops there."""
+        result = tune_quality(self.render, min_psnr=50.0)
+        self.assertGreaterEqual(result["psnr"], 50.0)
+        self.assertLess(result["edge_psnr"], float("inf"))
+        self.assertEqual(self.rendered[0], (100, 2.0))
+        self.assertEqual(self.rendered[-1], (result["quality"], result["ssaa"]))
+        self.assertEqual(result["evaluated"], len(self.rendered) - 1)
+        for settings in self.rendered[1:-1]:
+            self.assertLess(march_cost(*settings), march_cost(result["quality"], result["ssaa"]))
+
+    def test_falls_back_to_reference(self):
+        """Test that the reference setting is kept when no candidate is close enough."""
+        result = tune_quality(self.render, min_psnr=200.0)
+        self.assertEqual((result["quality"], result["ssaa"]), (100, 2.0))
+        self.assertEqual(result["evaluated"], len(candidate_settings()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.render_plan import GIB, estimate_seconds, estimate_stages, plan_render, record_throughput
+
+
+class TestRenderPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.previous = os.environ.get("DEPTHFLOW_NODES_CACHE")
+        os.environ["DEPTHFLOW_NODES_CACHE"] = self.cache.name
+
+    def tearDown(self):
+        if self.previous is None:
+            del os.environ["DEPTHFLOW_NODES_CACHE"]
+        else:
+            os.environ["DEPTHFLOW_NODES_CACHE"] = self.previous
+        self.cache.cleanup()
+
+    def test_stage_estimates(self):
+        """Test the memory held at each stage of both strategies."""
+        frame = 100 * 100 * 3
+        stack = estimate_stages("stack", 100, 100, 10, 10)
+        self.assertEqual(stack["stack"], 2 * frame + 20 * frame)
+        self.assertEqual(stack["float"], 2 * frame + 50 * frame)
+        self.assertNotIn("reuse", stack)
+        stream = estimate_stages("stream", 100, 100, 10, 10)
+        self.assertEqual(stream["render"], 2 * frame + 41 * frame)
+        self.assertIn("reuse", estimate_stages("stack", 100, 100, 5, 10))
+        with self.assertRaises(ValueError):
+            estimate_stages("unknown", 100, 100, 10, 10)
+
+    def test_strategy_selection(self):
+        """Test switching to the streaming strategy and refusing over budget."""
+        frame = 1920 * 1080 * 3
+        stack_peak = max(estimate_stages("stack", 1920, 1080, 100, 100).values())
+        stream_peak = max(estimate_stages("stream", 1920, 1080, 100, 100).values())
+        self.assertLess(stream_peak, stack_peak)
+
+        plan = plan_render(1920, 1080, 100, 100, budget_gb=stack_peak / GIB + 0.01)
+        self.assertEqual(plan["strategy"], "stack")
+        plan = plan_render(1920, 1080, 100, 100, budget_gb=stream_peak / GIB + 0.01)
+        self.assertEqual(plan["strategy"], "stream")
+        with self.assertRaises(ValueError):
+            plan_render(1920, 1080, 100, 100, budget_gb=(stream_peak - frame) / GIB)
+        with self.assertRaises(ValueError):
+            plan_render(1920, 1080, 100, 100, budget_gb=stream_peak / GIB + 0.01, strategy="stack")
+
+    def test_input_sizes(self):
+        """Test that the resident inputs are sized by their own dimensions, not the output's."""
+        frame = 100 * 100 * 3
+        stages = estimate_stages("stream", 100, 100, 10, 10, input_size=(200, 100), depth_size=(50, 50))
+        self.assertEqual(stages["render"], 2 * frame + frame // 4 + 41 * frame)
+
+    def test_extra_cameras(self):
+        """Test that every extra camera holds its own output frames, and the inputs only once."""
+        frame = 100 * 100 * 3
+        stages = estimate_stages("sink", 100, 100, 10, 10, pending_frames=8, cameras=2)
+        self.assertEqual(stages["render"], 2 * frame + 3 * 9 * frame)
+        single_peak = max(estimate_stages("stream", 1920, 1080, 100, 100).values())
+        with self.assertRaises(ValueError):
+            plan_render(1920, 1080, 100, 100, budget_gb=single_peak / GIB + 0.01, cameras=1)
+
+    def test_extra_frame_bytes(self):
+        """Test that memory held by other outputs counts per output frame at every stage."""
+        plain = estimate_stages("stack", 100, 100, 5, 10)
+        extra = estimate_stages("stack", 100, 100, 5, 10, extra_frame_bytes=1000)
+        for name, size in plain.items():
+            self.assertEqual(extra[name], size + 10 * 1000)
+
+    def test_available_memory_only_warns(self):
+        """Test that a zero budget picks the lowest peak instead of refusing the render."""
+        with mock.patch("utils.render_plan.available_memory", return_value=1):
+            plan = plan_render(1920, 1080, 100, 100, strategy="stack")
+        self.assertEqual(plan["strategy"], "stack")
+        self.assertEqual(plan["budget_gb"], 0.0)
+
+    def test_throughput_calibration(self):
+        """Test that render time estimates come from recorded renders."""
+        self.assertIsNone(estimate_seconds(100, 100, 1.0, 10))
+        record_throughput(100, 100, 1.0, 10, seconds=1.0)
+        self.assertAlmostEqual(estimate_seconds(100, 100, 1.0, 20), 2.0)
+        self.assertAlmostEqual(estimate_seconds(100, 100, 2.0, 10), 4.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
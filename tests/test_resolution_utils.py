@@ -0,0 +1,68 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.resolution_utils import crop_view, output_resolution, parse_crop_positions, proxy_resolution
+
+
+class TestResolutionUtils(unittest.TestCase):
+
+    def test_defaults_follow_input(self):
+        """Test that no output size renders at the input size, optionally scaled."""
+        self.assertEqual(output_resolution(3840, 2160), (3840, 2160, 1.0))
+        self.assertEqual(output_resolution(3840, 2160, scale=0.5), (1920, 1080, 1.0))
+
+    def test_single_side_keeps_aspect(self):
+        """Test that a single output side keeps the input's aspect ratio."""
+        self.assertEqual(output_resolution(3840, 2160, output_width=1280), (1280, 720, 1.0))
+        self.assertEqual(output_resolution(3840, 2160, output_height=720, fit="fill"), (1280, 720, 1.0))
+
+    def test_fit(self):
+        """Test that fit shrinks to the input's aspect ratio inside the box."""
+        self.assertEqual(output_resolution(3840, 2160, 1024, 1024), (1024, 576, 1.0))
+        self.assertEqual(output_resolution(1000, 2000, 1280, 720), (360, 720, 1.0))
+
+    def test_fill(self):
+        """Test that fill renders the box, zooming in only when the box is wider than the input."""
+        self.assertEqual(output_resolution(3840, 2160, 1024, 1024, fit="fill"), (1024, 1024, 1.0))
+        width, height, zoom = output_resolution(1000, 1000, 1280, 720, fit="fill")
+        self.assertEqual((width, height), (1280, 720))
+        self.assertAlmostEqual(zoom, 720 / 1280)
+
+    def test_proxy(self):
+        """Test the size of mipmap levels."""
+        self.assertEqual(proxy_resolution(1920, 1080, 0), (1920, 1080))
+        self.assertEqual(proxy_resolution(1920, 1080, 2), (480, 270))
+        self.assertEqual(proxy_resolution(3, 2, 4), (1, 1))
+
+
+    def test_crop_view(self):
+        """Test that the crop window's corners land on the full frame's gluv."""
+        width, height = 1920, 1080
+        x, y, crop_width, crop_height = 1200, 100, 600, 800
+        scale, offset = crop_view(x, y, crop_width, crop_height, width, height)
+
+        def gluv(px, py, w, h):
+            return ((2 * px - w) / h, (h - 2 * py) / h)
+
+        for corner in ((0, 0), (crop_width, crop_height), (crop_width, 0)):
+            local = gluv(*corner, crop_width, crop_height)
+            full = gluv(x + corner[0], y + corner[1], width, height)
+            self.assertAlmostEqual(local[0] * scale + offset[0], full[0])
+            self.assertAlmostEqual(local[1] * scale + offset[1], full[1])
+        self.assertEqual(crop_view(0, 0, width, height, width, height), (1.0, (0.0, 0.0)))
+
+    def test_crop_validation(self):
+        """Test that windows outside the frame and malformed positions are rejected."""
+        with self.assertRaises(ValueError):
+            crop_view(1500, 0, 600, 800, 1920, 1080)
+        with self.assertRaises(ValueError):
+            parse_crop_positions("[[1, 2, 3]]")
+        self.assertEqual(parse_crop_positions(" "), [])
+        self.assertEqual(parse_crop_positions("[[0, 0], [10.0, 20]]"), [(0, 0), (10, 20)])
+
+if __name__ == "__main__":
+    unittest.main()
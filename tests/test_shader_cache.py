@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.shader_cache import MAX_PROGRAMS, enable_driver_shader_cache, program_key, record_first_frame
+
+
+class TestShaderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.environ = mock.patch.dict(os.environ, {"DEPTHFLOW_NODES_CACHE": self.cache.name})
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        self.cache.cleanup()
+
+    def test_program_key(self):
+        """Test that the key changes with the source, its defines included, and the driver."""
+        source = "#define iBlurEnable false\nvoid main() {}"
+        key = program_key(source, "llvmpipe")
+        self.assertEqual(key, program_key(source, "llvmpipe"))
+        self.assertNotEqual(key, program_key(source.replace("false", "true"), "llvmpipe"))
+        self.assertNotEqual(key, program_key(source, "radeonsi"))
+
+    def test_first_frame_records(self):
+        """Test that renders of a program are counted and keep the first render's timing."""
+        self.assertEqual(record_first_frame("abc", 2.0), (1, 2.0))
+        self.assertEqual(record_first_frame("abc", 0.5), (2, 2.0))
+        self.assertEqual(record_first_frame("def", 0.7), (1, 0.7))
+
+    def test_records_are_capped(self):
+        """Test that the least recently rendered programs are dropped past the cap."""
+        record_first_frame("first", 1.0)
+        for index in range(MAX_PROGRAMS - 1):
+            record_first_frame(f"program {index}", 1.0)
+        record_first_frame("first", 0.5)
+        record_first_frame("last", 1.0)
+        self.assertEqual(record_first_frame("first", 0.5), (3, 1.0))
+        self.assertEqual(record_first_frame("program 0", 1.0), (1, 1.0))
+
+    def test_driver_variables(self):
+        """Test that cache locations are set without overriding the user's."""
+        os.environ.pop("MESA_SHADER_CACHE_DIR", None)
+        os.environ["__GL_SHADER_DISK_CACHE_PATH"] = "/custom"
+        configured = enable_driver_shader_cache()
+        self.assertTrue(Path(os.environ["MESA_SHADER_CACHE_DIR"]).is_dir())
+        self.assertIn("MESA_SHADER_CACHE_DIR", configured)
+        self.assertEqual(os.environ["__GL_SHADER_DISK_CACHE_PATH"], "/custom")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.shader_utils import glsl_literal, specialization_defines, specialize_source
+
+
+class TestShaderUtils(unittest.TestCase):
+
+    def test_glsl_literals(self):
+        """Test that values are formatted as typed GLSL constants."""
+        self.assertEqual(glsl_literal("bool", True), "true")
+        self.assertEqual(glsl_literal("int", 8.0), "8")
+        self.assertEqual(glsl_literal("float", 1), "1.0")
+        self.assertEqual(glsl_literal("float", -0.25), "(-0.25)")
+        self.assertEqual(glsl_literal("float", 1e-7), "1e-07")
+        self.assertEqual(glsl_literal("vec2", (0.5, 1)), "vec2(0.5, 1.0)")
+        with self.assertRaises(ValueError):
+            glsl_literal("sampler2D", None)
+
+    def test_specialized_source(self):
+        """Test that only flags and loop bounds become defines, prepended to the source."""
+        defines = specialization_defines([
+            ("bool", "iBlurEnable", False), ("float", "iBlurIntensity", 0.5), ("int", "iBlurQuality", 4),
+        ])
+        self.assertEqual(defines, ("iBlurEnable false", "iBlurQuality 4"))
+        source = specialize_source("void main() {}", defines)
+        self.assertTrue(source.startswith("#define iBlurEnable false\n#define iBlurQuality 4\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.warp_utils import remap_frames
+
+
+def identity_uv(height, width, shift=0.0):
+    """Warp field sampling every pixel's own center, moved right by shift pixels."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    return np.stack([(x + 0.5 + shift) / width, 1.0 - (y + 0.5) / height], axis=-1)
+
+
+class TestWarpUtils(unittest.TestCase):
+
+    def test_identity_and_shift(self):
+        """Test that an identity warp returns the image and a shifted one moves it."""
+        image = np.random.default_rng(0).random((12, 16, 3)).astype(np.float32)
+        np.testing.assert_allclose(remap_frames(image, identity_uv(12, 16))[0], image, atol=1e-5)
+        shifted = remap_frames(image, identity_uv(12, 16, shift=1.0))[0]
+        np.testing.assert_allclose(shifted[:, :-1], image[:, 1:], atol=1e-5)
+
+    def test_broadcast_and_chunks(self):
+        """Test that one image is warped by every frame of a field, in chunks."""
+        image = np.random.default_rng(1).random((8, 8, 4)).astype(np.float32)
+        uv = np.stack([identity_uv(8, 8, shift) for shift in range(5)])
+        result = remap_frames(image, uv, chunk_size=2, max_workers=3)
+        self.assertEqual(result.shape, (5, 8, 8, 4))
+        for index in range(5):
+            np.testing.assert_allclose(result[index], remap_frames(image, uv[index])[0])
+
+    def test_mismatched_batches(self):
+        """Test that batches that can't broadcast are rejected."""
+        with self.assertRaises(ValueError):
+            remap_frames(np.zeros((2, 4, 4, 3)), np.zeros((3, 4, 4, 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()